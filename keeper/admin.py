@@ -1,6 +1,19 @@
 from django.contrib import admin
-
-from .models import Accession, File
+from django.contrib.admin.views.main import ORDER_VAR
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from .bagit import bag_zip
+from .exports import export_zip
+from .history import change_status, record_status_change, time_in_status
+from .jobs import queue_stats
+from .models import Accession, File, Job, StatusChange
+from .pagination import EstimatedCountPaginator, KeysetChangeList
+from .search import search
+from .utils import streaming_content
 
 
 # Override admin site attributes
@@ -17,6 +30,15 @@ class FileInline(admin.TabularInline):
     fields = ['clickable_thumb', 'file_download_element', 'file_description']
 
 
+class AccessionChangeList(KeysetChangeList):
+
+    def get_ordering(self, request, queryset):
+        # Search results come best match first unless staff sort by a column
+        if 'search_rank' in queryset.query.annotations and ORDER_VAR not in self.params:
+            return ['-search_rank', '-pk']
+        return super().get_ordering(request, queryset)
+
+
 @admin.register(Accession)
 class AccessionAdmin(admin.ModelAdmin):
 
@@ -37,16 +59,57 @@ class AccessionAdmin(admin.ModelAdmin):
 
     inlines = [FileInline]
 
-    list_display = ('id', 'date_submitted', 'full_name', 'accession_status')
+    list_display = ('id', 'date_submitted', 'full_name', 'accession_status', 'file_count', 'total_size')
 
-    ordering = ['-id']
+    # Newest first, paged by seeking through the keeper_acc_submitted index
+    ordering = ['-date_submitted', '-id']
+
+    paginator = EstimatedCountPaginator
+
+    # Counting every accession again for the search box total would double the cost of counting
+    show_full_result_count = False
+
+    # Searched through the full-text index by get_search_results
+    search_fields = ['search_document__text']
 
     actions = ['update_status_new', 'update_status_review', 'update_status_accepted',
-               'update_status_rejected']
+               'update_status_rejected', 'export_accessions', 'export_bags']
+
+    def get_queryset(self, request):
+        # Counted and summed in the changelist query itself, not per row. As subqueries rather
+        # than a join they are only run for the rows shown, and left out of counting the rows
+        files = File.objects.filter(accession=OuterRef('pk')).order_by().values('accession')
+        return super().get_queryset(request).annotate(
+            file_count=Coalesce(Subquery(files.annotate(count=Count('pk')).values('count')), 0),
+            total_size=Subquery(files.annotate(total=Sum('size')).values('total')),
+        )
+
+    def get_changelist(self, request, **kwargs):
+        return AccessionChangeList
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'accession_status' in form.changed_data:
+            record_status_change(obj, form.initial['accession_status'], request.user)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search(queryset, search_term), False
+
+    def file_count(self, obj):
+        return obj.file_count
+    file_count.short_description = 'Files'
+    file_count.admin_order_field = 'file_count'
+
+    def total_size(self, obj):
+        return filesizeformat(obj.total_size or 0)
+    total_size.short_description = 'Size'
+    total_size.admin_order_field = 'total_size'
 
     def update_status(self, request, queryset, new_status):
         new_status_desc = [item[1] for item in Accession.STATUS_CHOICES if item[0] == new_status][0]
-        rows_updated = queryset.update(accession_status=new_status)
+        rows_updated = change_status(queryset, new_status, request.user)
         if rows_updated == 1:
             message_bit = "1 accession was"
         else:
@@ -70,3 +133,76 @@ class AccessionAdmin(admin.ModelAdmin):
     def update_status_rejected(self, request, queryset):
         self.update_status(request, queryset, Accession.REJECTED)
     update_status_rejected.short_description = "Update status: Rejected"
+
+    def export_response(self, request, archive):
+        response = StreamingHttpResponse(streaming_content(request, archive), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename=accessions-{}.zip'.format(
+            timezone.localtime().strftime('%Y%m%d-%H%M%S'))
+        return response
+
+    def export_accessions(self, request, queryset):
+        # Each accession gets a folder holding what its own zip download would
+        return self.export_response(request, export_zip(queryset))
+    export_accessions.short_description = "Download selected accessions as one zip"
+
+    def export_bags(self, request, queryset):
+        return self.export_response(request, bag_zip(queryset))
+    export_bags.short_description = "Download selected accessions as BagIt bags"
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+
+    # Not the keeper change form, which links to the accession zip download
+    change_form_template = 'admin/change_form.html'
+
+    list_display = ('id', 'task', 'status', 'attempts', 'date_created', 'run_after', 'date_finished', 'worker')
+
+    list_filter = ('status', 'task')
+
+    readonly_fields = ['task', 'arguments', 'status', 'attempts', 'max_attempts', 'run_after', 'lease_expires',
+                       'worker', 'last_error', 'date_created', 'date_started', 'date_finished']
+
+    ordering = ['-id']
+
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {**(extra_context or {}), 'queue_stats': queue_stats()}
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def retry_jobs(self, request, queryset):
+        rows_updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_after=timezone.now(), date_finished=None)
+        self.message_user(request, "{} jobs queued to run again".format(rows_updated))
+    retry_jobs.short_description = "Run selected jobs again"
+
+
+@admin.register(StatusChange)
+class StatusChangeAdmin(admin.ModelAdmin):
+
+    change_form_template = 'admin/change_form.html'
+
+    list_display = ('date_changed', 'accession', 'old_status', 'new_status', 'user')
+
+    # "Past 7 days" and the like are answered from the date_changed index
+    list_filter = ('date_changed', 'new_status', 'old_status')
+
+    list_select_related = ('accession', 'user')
+
+    # History is only ever added to, by changing accessions
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {**(extra_context or {}), 'time_in_status': time_in_status()}
+        return super().changelist_view(request, extra_context=extra_context)
@@ -1,40 +1,120 @@
-import os
+import re
 
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.views import redirect_to_login
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse, Http404
+from django.shortcuts import get_object_or_404
+
+from .bagit import accession_bag
+from .exports import accession_tar, accession_zip
 from .models import File
-from zipfile import ZIP_DEFLATED
-import zipstream
+from .thumbnails import make_thumbnail
+from .utils import streaming_content
 
-from django.contrib.auth.decorators import login_required
-from django.http import StreamingHttpResponse, Http404
-from django.conf import settings
 
-from .utils import generate_data_file
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
 
 
-# Zip the files in admin for download
-# Solution from: http://stackoverflow.com/questions/12881294/django-create-a-zip-of-multiple-files-and-make-it-downloadable
-# and: https://github.com/allanlei/python-zipstream
-@login_required
-def zip_files(request, app, model, pk):
-    z = zipstream.ZipFile(mode='w', compression=ZIP_DEFLATED)
+def parse_range(header, size):
+    """Return the inclusive (start, end) of a single byte range, or None to send the whole body.
 
-    path = os.path.join(settings.MEDIA_ROOT, 'uploads', pk)
-    queried_files = File.objects.filter(accession=pk)
+    Raises ValueError if the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    # Multiple ranges are answered with the whole body, which RFC 9110 allows
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+
+    if first == '':
+        suffix_length = int(last)
+        if suffix_length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - suffix_length, 0), size - 1
+
+    start = int(first)
+    if last != '' and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError('Range starts after the end of the body')
+    return start, size - 1 if last == '' else min(int(last), size - 1)
+
+
+def archive_response(request, archive, filename, content_type='application/zip'):
+    """Stream an archive, or the part of it asked for with a Range header."""
+    if archive.size is None:
+        # A compressed archive's length is only known once it has been written
+        response = StreamingHttpResponse(streaming_content(request, archive), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename={}'.format(filename)
+        return response
+
+    byte_range = None
+    # A range only applies to the archive the client already has part of
+    if 'Range' in request.headers and request.headers.get('If-Range', archive.etag) == archive.etag:
+        try:
+            byte_range = parse_range(request.headers['Range'], archive.size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(archive.size)
+            return response
+
+    start, end = byte_range or (0, archive.size - 1)
+    response = StreamingHttpResponse(streaming_content(request, archive.iter_range(start, end)),
+                                     status=206 if byte_range else 200, content_type=content_type)
+    if byte_range:
+        response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, archive.size)
+    response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = archive.etag
+    response['Content-Disposition'] = 'attachment; filename={}'.format(filename)
+    return response
 
-    if len(queried_files) == 0:
-        raise Http404
 
-    filenames = [(str(f), f.file_description) for f in queried_files]
+# Zip the files in admin for download. Files that are already compressed are
+# stored as they are; when nothing needs deflating, or the archive is cached,
+# its length is known up front and interrupted downloads can resume.
+async def zip_files(request, app, model, pk):
+    # login_required does not support async views before Django 5
+    if not await sync_to_async(lambda: request.user.is_authenticated)():
+        return redirect_to_login(request.get_full_path())
 
-    zip_filename = "{}.zip".format(pk)
+    archive = await sync_to_async(accession_zip)(app, model, pk)
 
-    for this_file in filenames:
-        full_path = os.path.join(path, this_file[0])
-        zip_path = os.path.join(pk, this_file[0])
-        z.write(full_path, zip_path)
+    # The zip is streamed without holding a worker thread for the whole download
+    return archive_response(request, archive, "{}.zip".format(pk))
 
-    z.write(os.path.join(path, 'metadata.txt'), generate_data_file(app, model, pk, path, filenames))
 
-    response = StreamingHttpResponse(z, content_type='application/zip')
-    response['Content-Disposition'] = 'attachment; filename={}'.format(zip_filename)
+# The accession as a BagIt bag, zipped, for preservation systems
+async def bag_files(request, app, model, pk):
+    if not await sync_to_async(lambda: request.user.is_authenticated)():
+        return redirect_to_login(request.get_full_path())
+
+    archive = await sync_to_async(accession_bag)(pk)
+    return archive_response(request, archive, "accession-{}.zip".format(pk))
+
+
+# The accession as a tar, for transfers between machines: files are sent as
+# they are on disk, so this is far cheaper than a zip. With zst the tar is
+# compressed with Zstandard, which is still much faster than deflate.
+async def tar_files(request, app, model, pk, zstd):
+    if not await sync_to_async(lambda: request.user.is_authenticated)():
+        return redirect_to_login(request.get_full_path())
+
+    archive = await sync_to_async(accession_tar)(pk, zstd=bool(zstd))
+    if zstd:
+        return archive_response(request, archive, "{}.tar.zst".format(pk), content_type='application/zstd')
+    return archive_response(request, archive, "{}.tar".format(pk), content_type='application/x-tar')
+
+
+# Thumbnail URLs change with the source file, so a thumbnail never needs revalidating
+@staff_member_required
+def thumbnail(request, pk):
+    uploaded_file = get_object_or_404(File, pk=pk)
+    path = make_thumbnail(uploaded_file)
+    if path is None:
+        raise Http404
+
+    response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
     return response
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class KeeperConfig(AppConfig):
+    name = 'keeper'
+
+    def ready(self):
+        from . import signals  # noqa: F401
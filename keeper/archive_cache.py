@@ -0,0 +1,144 @@
+import glob
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+
+from .archives import ARCHIVE_READ_SIZE
+from .models import Accession, File
+
+
+# Kept in private storage beside uploads/ and blobs/
+ARCHIVE_CACHE_LOCATION = 'archive-cache'
+
+
+def cache_dir():
+    return File._meta.get_field('file').storage.path(ARCHIVE_CACHE_LOCATION)
+
+
+def cache_path(accession_pk, fingerprint):
+    return os.path.join(cache_dir(), '{}-{}.zip'.format(accession_pk, fingerprint))
+
+
+def archive_fingerprint(accession, files):
+    """A digest of everything an accession's archive is built from.
+
+    Any change to the accession, to its files or to how archives are
+    compressed gives a different fingerprint, so a cached archive is never
+    served after the accession it was built from has changed.
+    """
+    values = [settings.ZIP_COMPRESSION, settings.ZIP_COMPRESSION_LEVEL]
+    values += [getattr(accession, field.attname) for field in Accession._meta.concrete_fields]
+    for uploaded_file in files:
+        stat = os.stat(uploaded_file.file.path)
+        values += [uploaded_file.pk, uploaded_file.file.name, uploaded_file.file_description,
+                   uploaded_file.content_type, uploaded_file.sha256, uploaded_file.crc32,
+                   uploaded_file.date_file_submitted, stat.st_size, stat.st_mtime_ns]
+    return hashlib.sha256(repr(values).encode()).hexdigest()
+
+
+class CachedArchive:
+    """A finished archive read back from the cache.
+
+    The file is only opened once the download starts, so a response that is
+    never sent holds nothing open, and stays open until it ends so that
+    pruning the cache meanwhile does not cut the download short.
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.etag = '"{}"'.format(fingerprint)
+
+    def iter_range(self, start=0, end=None):
+        end = self.size - 1 if end is None else end
+        with open(self.path, 'rb') as archive_file:
+            archive_file.seek(start)
+            length = end - start + 1
+            while length > 0:
+                data = archive_file.read(min(ARCHIVE_READ_SIZE, length))
+                if not data:
+                    break
+                length -= len(data)
+                yield data
+
+
+def cached_archive(accession_pk, fingerprint):
+    """The cached archive for this fingerprint, or None if it has not been built."""
+    path = cache_path(accession_pk, fingerprint)
+    try:
+        # The modification time orders archives by last use when pruning
+        os.utime(path)
+        return CachedArchive(path, fingerprint)
+    except FileNotFoundError:
+        return None
+
+
+class CacheWriter:
+    """An archive that saves itself to the cache as it is read.
+
+    It is only kept once all of it has been written, so a download that is
+    cut short leaves nothing behind.
+    """
+    size = None
+    etag = None
+
+    def __init__(self, archive, accession_pk, fingerprint):
+        self.archive = archive
+        self.accession_pk = accession_pk
+        self.fingerprint = fingerprint
+
+    def __iter__(self):
+        path = cache_path(self.accession_pk, self.fingerprint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+        try:
+            with open(temporary_path, 'wb') as f:
+                for data in self.archive:
+                    f.write(data)
+                    yield data
+            os.replace(temporary_path, path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+        remove_cached_archives(self.accession_pk, keep=path)
+        prune_cache()
+
+
+def remove_cached_archives(accession_pk, keep=None):
+    for path in glob.glob(os.path.join(cache_dir(), '{}-*.zip'.format(accession_pk))):
+        if path != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def prune_cache(max_size=None):
+    """Remove the least recently used archives until the cache fits in max_size bytes.
+
+    Returns the number of archives removed.
+    """
+    max_size = settings.ARCHIVE_CACHE_MAX_SIZE if max_size is None else max_size
+    archives = []
+    for path in glob.glob(os.path.join(cache_dir(), '*.zip')):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        archives.append((stat.st_mtime_ns, stat.st_size, path))
+
+    total = sum(size for _, size, _ in archives)
+    removed = 0
+    for _, size, path in sorted(archives):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,436 @@
+import hashlib
+import os
+import struct
+import tarfile
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import zstandard
+from django.utils import timezone
+
+
+# Sizes and offsets from this value up are written to zip64 extra fields
+ZIP64_LIMIT = 0xFFFFFFFF
+# Member counts from this value up need the zip64 end of central directory record
+ZIP64_COUNT_LIMIT = 0xFFFF
+# Placed in the 32 and 16 bit fields whose value is in a zip64 record instead
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP64_COUNT_MARKER = 0xFFFF
+
+# Size of the reads used to copy member data into the archive
+ARCHIVE_READ_SIZE = 1024 * 1024  # 1 MB
+
+STORED = 0
+DEFLATED = 8
+# Names are always written as UTF-8
+UTF8_FLAG = 0x800
+# The CRC-32 and sizes follow the member data instead of being in its local header
+DATA_DESCRIPTOR_FLAG = 0x08
+# Made by version 4.5 on Unix
+VERSION_MADE_BY = (3 << 8) | 45
+# rw-r--r-- regular file
+EXTERNAL_ATTRIBUTES = 0o100644 << 16
+
+# Types that are already compressed, so deflating them costs CPU and saves almost nothing
+STORED_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp', 'video/', 'audio/mpeg', 'audio/mp4',
+                'audio/ogg', 'audio/flac', 'audio/aac', 'audio/webm', 'application/zip', 'application/gzip')
+# Types that reliably get smaller
+DEFLATED_TYPES = ('text/', 'application/msword', 'image/bmp', 'image/tiff', 'image/svg+xml', 'audio/wav',
+                  'audio/x-wav')
+# Any other member is deflated if a fast compression of its first block is
+# smaller than this fraction of the block
+COMPRESSION_PROBE_SIZE = 64 * 1024  # 64 KB
+COMPRESSION_PROBE_RATIO = 0.9
+# Members larger than this are split into blocks of this size to deflate in parallel
+COMPRESSION_BLOCK_SIZE = 1024 * 1024  # 1 MB
+# Deflate keeps a 32 KB window, so each block is primed with the end of the one before
+DEFLATE_WINDOW_SIZE = 32 * 1024
+
+# Threads compressing or hashing archive members, shared by every download in the process
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def file_crc32(path):
+    crc32 = 0
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(ARCHIVE_READ_SIZE)
+            if not data:
+                return crc32
+            crc32 = zlib.crc32(data, crc32)
+
+
+def dos_date_time(value):
+    value = timezone.localtime(value)
+    if value.year < 1980:
+        return 0, (1 << 5) | 1
+    time = (value.hour << 11) | (value.minute << 5) | (value.second // 2)
+    date = ((value.year - 1980) << 9) | (value.month << 5) | value.day
+    return time, date
+
+
+class ZipMember:
+    """A file to put in an archive, read from path or given as data.
+
+    When the CRC-32 is not given it is worked out from the bytes as the member
+    is read in order from its start, or read from the file the first time it
+    is needed before that. Tar archives never need it.
+    """
+
+    def __init__(self, name, date_time, path=None, data=None, crc32=None, deflate=False):
+        self.name = name
+        self.date_time = date_time
+        self.path = path
+        self.data = data
+        self.deflate = deflate
+        self.size = len(data) if data is not None else os.path.getsize(path)
+        self._crc32 = crc32
+        # How far the member has been read in order, and the CRC-32 of that much
+        self._crc32_read = (0, 0)
+
+    @property
+    def crc32(self):
+        if self._crc32 is None:
+            self._crc32 = zlib.crc32(self.data) if self.data is not None else file_crc32(self.path)
+        return self._crc32
+
+    @property
+    def crc32_known(self):
+        """Whether the CRC-32 can be had without reading the file."""
+        return self._crc32 is not None or self.data is not None
+
+    def iter_bytes(self, start=0, length=None):
+        length = self.size - start if length is None else length
+        if self.data is not None:
+            chunks = [self.data[start:start + length]]
+        else:
+            chunks = read_range(self.path, start, length)
+        for chunk in chunks:
+            self.update_crc32(start, chunk)
+            start += len(chunk)
+            yield chunk
+
+    def update_crc32(self, start, chunk):
+        if self._crc32 is not None:
+            return
+        if start == 0:
+            self._crc32_read = (0, 0)
+        offset, crc32 = self._crc32_read
+        if start == offset:
+            self._crc32_read = offset + len(chunk), zlib.crc32(chunk, crc32)
+            if self._crc32_read[0] == self.size:
+                self._crc32 = self._crc32_read[1]
+
+
+def is_compressible(member):
+    sample = b''.join(member.iter_bytes(0, min(member.size, COMPRESSION_PROBE_SIZE)))
+    return len(zlib.compress(sample, 1)) < len(sample) * COMPRESSION_PROBE_RATIO
+
+
+def should_deflate(member, content_type, policy):
+    """Whether to deflate a member under the 'store', 'deflate' or 'adaptive' policy."""
+    if policy == 'store':
+        return False
+    if policy == 'deflate':
+        return True
+    if content_type.startswith(STORED_TYPES):
+        return False
+    if content_type.startswith(DEFLATED_TYPES):
+        return True
+    return is_compressible(member)
+
+
+def local_header(member, method, flags, crc32, compressed_size, size, zip64):
+    name = member.name.encode('utf-8')
+    time, date = dos_date_time(member.date_time)
+    extra = struct.pack('<HHQQ', 0x0001, 16, size, compressed_size) if zip64 else b''
+    if zip64:
+        compressed_size = size = ZIP64_MARKER
+    return struct.pack(
+        '<IHHHHHIIIHH', 0x04034b50, 45 if zip64 else 20, UTF8_FLAG | flags, method, time, date,
+        crc32, compressed_size, size, len(name), len(extra)) + name + extra
+
+
+def central_header(member, method, flags, compressed_size, offset, zip64):
+    name = member.name.encode('utf-8')
+    time, date = dos_date_time(member.date_time)
+    extra = b''.join(struct.pack('<Q', value) for value in (
+        [member.size, compressed_size] if zip64 else []) + ([offset] if offset >= ZIP64_LIMIT else []))
+    if extra:
+        extra = struct.pack('<HH', 0x0001, len(extra)) + extra
+    size = ZIP64_MARKER if zip64 else member.size
+    compressed_size = ZIP64_MARKER if zip64 else compressed_size
+    return struct.pack(
+        '<IHHHHHHIIIHHHHHII', 0x02014b50, VERSION_MADE_BY, 45 if extra else 20, UTF8_FLAG | flags, method,
+        time, date, member.crc32, compressed_size, size, len(name), len(extra), 0, 0, 0,
+        EXTERNAL_ATTRIBUTES, ZIP64_MARKER if offset >= ZIP64_LIMIT else offset) + name + extra
+
+
+def data_descriptor(member, compressed_size, zip64):
+    return struct.pack('<IIQQ' if zip64 else '<IIII', 0x08074b50, member.crc32, compressed_size, member.size)
+
+
+def end_records(central_directory, count, directory_offset):
+    """The end of central directory record, preceded by its zip64 version when needed."""
+    directory_size = len(central_directory)
+    end = b''
+    if count >= ZIP64_COUNT_LIMIT or directory_offset >= ZIP64_LIMIT or directory_size >= ZIP64_LIMIT:
+        end += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, VERSION_MADE_BY, 45, 0, 0, count, count,
+                           directory_size, directory_offset)
+        end += struct.pack('<IIQI', 0x07064b50, 0, directory_offset + directory_size, 1)
+        count = ZIP64_COUNT_MARKER if count >= ZIP64_COUNT_LIMIT else count
+        directory_size = ZIP64_MARKER if directory_size >= ZIP64_LIMIT else directory_size
+        directory_offset = ZIP64_MARKER if directory_offset >= ZIP64_LIMIT else directory_offset
+    return end + struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count, directory_size, directory_offset, 0)
+
+
+class LaidOutArchive:
+    """An archive laid out before any member is read, as a list of segments.
+
+    Its length is known up front and any byte range can be produced on its
+    own, straight from the members' files.
+    """
+
+    def __init__(self):
+        # (offset, length, bytes or a member to read from) for each part of the archive
+        self.segments = []
+        self.size = 0
+
+    def append(self, source, length=None):
+        length = len(source) if length is None else length
+        self.segments.append((self.size, length, source))
+        self.size += length
+
+    def iter_range(self, start=0, end=None):
+        """Yield the bytes of the archive from start to end, inclusive."""
+        end = self.size - 1 if end is None else end
+        for offset, length, source in self.segments:
+            if offset + length <= start or offset > end:
+                continue
+            first = max(start - offset, 0)
+            last = min(end - offset, length - 1)
+            if isinstance(source, bytes):
+                yield source[first:last + 1]
+            else:
+                yield from source.iter_bytes(first, last - first + 1)
+
+    def __iter__(self):
+        return self.iter_range()
+
+
+class StoredZip(LaidOutArchive):
+    """A zip archive of uncompressed members.
+
+    Every byte of the archive follows from the members' names, dates, sizes
+    and CRC-32s, so its ETag is known without reading any member.
+    """
+
+    def __init__(self, members):
+        super().__init__()
+        central_directory = []
+
+        for member in members:
+            offset = self.size
+            zip64 = member.size >= ZIP64_LIMIT
+            self.append(local_header(member, STORED, 0, member.crc32, member.size, member.size, zip64))
+            self.append(member, member.size)
+            central_directory.append(central_header(member, STORED, 0, member.size, offset, zip64))
+
+        central_directory = b''.join(central_directory)
+        end = end_records(central_directory, len(members), self.size)
+        self.append(central_directory + end)
+        # The directory records every member's name, date, size, CRC-32 and offset
+        self.etag = '"{}"'.format(hashlib.sha256(central_directory + end).hexdigest())
+
+
+class StoredTar(LaidOutArchive):
+    """An uncompressed POSIX (pax) tar archive.
+
+    Member data is copied straight from the files between 512 byte headers.
+    The headers hold every member's name, date and size, so they give the
+    ETag along with the contents of members given as data, like metadata,
+    which can change without their files changing.
+    """
+
+    def __init__(self, members):
+        super().__init__()
+        etag = hashlib.sha256()
+
+        for member in members:
+            header = tar_header(member)
+            etag.update(header)
+            if member.data is not None:
+                etag.update(member.data)
+            self.append(header)
+            self.append(member, member.size)
+            if member.size % tarfile.BLOCKSIZE:
+                self.append(tarfile.NUL * (tarfile.BLOCKSIZE - member.size % tarfile.BLOCKSIZE))
+
+        # Two empty blocks end the archive, which is padded to a whole record like tar does
+        end = tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+        end += tarfile.NUL * (-(self.size + len(end)) % tarfile.RECORDSIZE)
+        self.append(end)
+        self.etag = '"{}"'.format(etag.hexdigest())
+
+
+def tar_header(member):
+    info = tarfile.TarInfo(member.name)
+    info.size = member.size
+    info.mtime = int(member.date_time.timestamp())
+    info.mode = 0o644
+    # Long or non-ASCII names and sizes over 8 GB get a pax extended header
+    return info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+
+
+class ZstdArchive:
+    """An archive compressed with Zstandard as it is read, e.g. a .tar.zst."""
+    size = None
+    etag = None
+
+    def __init__(self, archive, level=3, threads=1):
+        self.archive = archive
+        self.level = level
+        self.threads = threads
+
+    def __iter__(self):
+        # zstd compresses on its own threads, so the GIL is not held meanwhile
+        compressor = zstandard.ZstdCompressor(level=self.level, threads=self.threads if self.threads > 1 else 0)
+        stream = compressor.compressobj()
+        for data in self.archive:
+            compressed = stream.compress(data)
+            if compressed:
+                yield compressed
+        yield stream.flush()
+
+
+class StreamingZip:
+    """A zip archive written as it is read, deflating the members marked for it.
+
+    Compressed sizes are only known once a member has been deflated, so they
+    follow its data in a data descriptor and the archive's length is not known
+    up front. members can be any iterable, e.g. a generator reading them from
+    the database as they are needed.
+    """
+    size = None
+    etag = None
+
+    def __init__(self, members, level=6, threads=1):
+        self.members = members
+        self.level = level
+        self.threads = threads
+
+    def __iter__(self):
+        offset = 0
+        count = 0
+        central_directory = []
+
+        for member in self.members:
+            count += 1
+            if member.deflate:
+                # Deflate can make data slightly larger, so leave room when deciding on zip64
+                zip64 = member.size * 1.05 >= ZIP64_LIMIT
+                header = local_header(member, DEFLATED, DATA_DESCRIPTOR_FLAG, 0, 0, 0, zip64)
+                yield header
+                compressed_size = 0
+                for data in self.deflate(member):
+                    compressed_size += len(data)
+                    yield data
+                descriptor = data_descriptor(member, compressed_size, zip64)
+                yield descriptor
+                central_directory.append(central_header(
+                    member, DEFLATED, DATA_DESCRIPTOR_FLAG, compressed_size, offset, zip64))
+                offset += len(header) + compressed_size + len(descriptor)
+            elif not member.crc32_known:
+                # The CRC-32 is worked out as the file is written and follows it, so it is only read once
+                zip64 = member.size >= ZIP64_LIMIT
+                header = local_header(member, STORED, DATA_DESCRIPTOR_FLAG, 0, member.size, member.size, zip64)
+                yield header
+                yield from member.iter_bytes()
+                descriptor = data_descriptor(member, member.size, zip64)
+                yield descriptor
+                central_directory.append(central_header(
+                    member, STORED, DATA_DESCRIPTOR_FLAG, member.size, offset, zip64))
+                offset += len(header) + member.size + len(descriptor)
+            else:
+                zip64 = member.size >= ZIP64_LIMIT
+                header = local_header(member, STORED, 0, member.crc32, member.size, member.size, zip64)
+                yield header
+                yield from member.iter_bytes()
+                central_directory.append(central_header(member, STORED, 0, member.size, offset, zip64))
+                offset += len(header) + member.size
+
+        central_directory = b''.join(central_directory)
+        yield central_directory + end_records(central_directory, count, offset)
+
+    def deflate(self, member):
+        if self.threads > 1 and member.size > COMPRESSION_BLOCK_SIZE:
+            yield from self.deflate_parallel(member)
+            return
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        for data in member.iter_bytes():
+            compressed = compressor.compress(data)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def deflate_parallel(self, member):
+        """Deflate a member in blocks on the compression threads, like pigz.
+
+        zlib releases the GIL while compressing, so the blocks run on separate
+        cores. Each block ends on a byte boundary with a sync flush, so the
+        compressed blocks joined in order are one deflate stream. At most two
+        blocks per thread are held at once.
+        """
+        pool = archive_pool(self.threads)
+        pending = deque()
+        previous = b''
+        for start in range(0, member.size, COMPRESSION_BLOCK_SIZE):
+            length = min(COMPRESSION_BLOCK_SIZE, member.size - start)
+            data = b''.join(member.iter_bytes(start, length))
+            last = start + length == member.size
+            pending.append(pool.submit(deflate_block, data, previous[-DEFLATE_WINDOW_SIZE:], self.level, last))
+            previous = data
+            if len(pending) >= 2 * self.threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def archive_pool(threads, name='archive'):
+    """A shared pool of threads, with a separate pool for each name.
+
+    Work that takes long, like hashing whole files, gets a pool of its own so
+    it never queues ahead of the blocks of the member being compressed.
+    """
+    with _pools_lock:
+        if (name, threads) not in _pools:
+            _pools[name, threads] = ThreadPoolExecutor(threads, thread_name_prefix=name)
+        return _pools[name, threads]
+
+
+def deflate_block(data, dictionary, level, last):
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as f:
+        if hasattr(os, 'posix_fadvise'):
+            # Let the kernel read ahead further, as members are read start to end
+            os.posix_fadvise(f.fileno(), start, length, os.POSIX_FADV_SEQUENTIAL)
+        f.seek(start)
+        while length > 0:
+            # Reads after the first one start on a multiple of ARCHIVE_READ_SIZE
+            data = f.read(min(ARCHIVE_READ_SIZE - start % ARCHIVE_READ_SIZE, length))
+            if not data:
+                raise IOError('{} is shorter than when the archive was laid out'.format(path))
+            start += len(data)
+            length -= len(data)
+            yield data
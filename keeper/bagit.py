@@ -0,0 +1,133 @@
+import hashlib
+import os
+from collections import deque
+
+from django.conf import settings
+from django.http import Http404
+from django.utils import timezone
+
+from .archives import StreamingZip, ZipMember, archive_pool
+from .exports import file_member, grouped_by_accession
+from .fixity import file_checksums
+from .models import Accession, File
+from .utils import format_datetime, generate_metadata
+
+
+BAGIT_VERSION = '1.0'
+BAG_SOURCE_ORGANIZATION = 'UNT Libraries Special Collections'
+
+# How many files without stored checksums are hashed ahead of the one being written
+CHECKSUM_LOOKAHEAD = 4
+
+
+def bag_name(accession):
+    return 'accession-{}'.format(accession.pk)
+
+
+def encode_path(path):
+    # Manifest lines end at a line break, so breaks in file names are percent-encoded
+    return path.replace('%', '%25').replace('\n', '%0A').replace('\r', '%0D')
+
+
+def tag_file(fields):
+    """The text of a tag file of "Label: value" lines, continuing multi-line values indented."""
+    lines = []
+    for label, value in fields:
+        if not value:
+            continue
+        value = '\n  '.join(str(value).strip().splitlines())
+        lines.append('{}: {}'.format(label, value))
+    return '\n'.join(lines) + '\n'
+
+
+def bag_info(accession, files):
+    size = sum(uploaded_file.file.size for uploaded_file in files)
+    return tag_file([
+        ('Source-Organization', BAG_SOURCE_ORGANIZATION),
+        ('External-Identifier', bag_name(accession)),
+        ('Bagging-Date', timezone.localdate().isoformat()),
+        ('Payload-Oxum', '{}.{}'.format(size, len(files))),
+        ('Contact-Name', accession.full_name),
+        ('Contact-Email', accession.email_address),
+        ('Contact-Phone', accession.phone_number),
+        ('External-Description', accession.description),
+        ('Keeper-Affiliation', accession.get_affiliation_display()),
+        ('Keeper-Status', accession.get_accession_status_display()),
+        ('Keeper-Date-Submitted', format_datetime(timezone.localtime(accession.date_submitted))),
+        ('Keeper-Date-Last-Updated', format_datetime(timezone.localtime(accession.date_last_updated))),
+        ('Keeper-Admin-Notes', accession.admin_notes),
+    ])
+
+
+def missing_checksums(uploaded_file):
+    return not uploaded_file.sha256 or not uploaded_file.crc32
+
+
+def checksums_ahead(files, pool):
+    """Yield each file once its checksums are known.
+
+    Files without stored checksums are hashed on the pool up to
+    CHECKSUM_LOOKAHEAD files ahead of the one being yielded, so hashing
+    overlaps with writing the files before it, and each file is read again
+    for the archive while it is still in the page cache.
+    """
+    pending = deque()
+    for uploaded_file in files:
+        pending.append((uploaded_file, pool.submit(file_checksums, uploaded_file.file.path)
+                        if missing_checksums(uploaded_file) else None))
+        if len(pending) > CHECKSUM_LOOKAHEAD:
+            yield record(*pending.popleft())
+    while pending:
+        yield record(*pending.popleft())
+
+
+def record(uploaded_file, future):
+    if future is not None:
+        checksums = future.result()
+        for name, checksum in checksums.items():
+            setattr(uploaded_file, name, checksum)
+        File.objects.filter(pk=uploaded_file.pk).update(**checksums)
+    return uploaded_file
+
+
+def bag_members(accession, files):
+    """Zip members for a BagIt bag of an accession: its files as the payload, then the tag files."""
+    root = bag_name(accession)
+    manifest = []
+    for uploaded_file in checksums_ahead(files, archive_pool(settings.ZIP_COMPRESSION_THREADS, 'checksum')):
+        path = 'data/{}'.format(uploaded_file)
+        manifest.append('{}  {}\n'.format(uploaded_file.sha256, encode_path(path)))
+        yield file_member(uploaded_file, os.path.join(root, path))
+
+    filenames = [(str(f), f.file_description) for f in files]
+    tag_files = {
+        'bagit.txt': 'BagIt-Version: {}\nTag-File-Character-Encoding: UTF-8\n'.format(BAGIT_VERSION),
+        'bag-info.txt': bag_info(accession, files),
+        'manifest-sha256.txt': ''.join(manifest),
+        # Keeper's own summary, with each file's description
+        'metadata.txt': generate_metadata(accession, filenames),
+    }
+    tag_manifest = ''
+    for name, text in tag_files.items():
+        data = text.encode('utf-8')
+        tag_manifest += '{}  {}\n'.format(hashlib.sha256(data).hexdigest(), name)
+        yield ZipMember(os.path.join(root, name), accession.date_last_updated, data=data)
+    yield ZipMember(os.path.join(root, 'tagmanifest-sha256.txt'), accession.date_last_updated,
+                    data=tag_manifest.encode('utf-8'))
+
+
+def bag_zip(accessions, progress=None):
+    """A zip of one BagIt bag per accession, written as it is read."""
+    def members():
+        for exported, (accession, files) in enumerate(grouped_by_accession(accessions), 1):
+            yield from bag_members(accession, files)
+            if progress:
+                progress(exported)
+
+    return StreamingZip(members(), settings.ZIP_COMPRESSION_LEVEL, settings.ZIP_COMPRESSION_THREADS)
+
+
+def accession_bag(pk):
+    if not File.objects.filter(accession=pk).exists():
+        raise Http404
+    return bag_zip(Accession.objects.filter(pk=pk))
@@ -0,0 +1,66 @@
+import os
+import uuid
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Blob
+
+
+def replace_with_link(source, path):
+    # Link next to path first so path is swapped for the link atomically
+    temporary_path = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+    os.link(source, temporary_path)
+    try:
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def attach_blob(uploaded_file):
+    """Point a stored File at the shared blob for its content, creating the blob if needed.
+
+    If the blob already exists the File's own copy is replaced by a hard link
+    to it. Returns the number of bytes this reclaimed.
+    """
+    path = uploaded_file.file.path
+    stat = os.stat(path)
+
+    with transaction.atomic():
+        blob, created = Blob.objects.select_for_update().get_or_create(
+            sha256=uploaded_file.sha256, defaults={'size': stat.st_size})
+
+        if created or not os.path.exists(blob.path):
+            os.makedirs(os.path.dirname(blob.path), exist_ok=True)
+            replace_with_link(path, blob.path)
+            reclaimed = 0
+        elif os.stat(blob.path).st_ino != stat.st_ino:
+            replace_with_link(blob.path, path)
+            # The old copy is only freed if nothing else links to it
+            reclaimed = stat.st_size if stat.st_nlink == 1 else 0
+        else:
+            reclaimed = 0
+
+        Blob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+
+    uploaded_file.blob = blob
+    return reclaimed
+
+
+def release_blob(blob_id):
+    """Drop one reference to a blob, deleting it when nothing refers to it any more."""
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            Blob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+            return
+        path = blob.path
+        blob.delete()
+
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
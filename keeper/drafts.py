@@ -0,0 +1,46 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Accession, ChunkedUpload, File
+
+
+def remove_partial(upload):
+    try:
+        os.remove(upload.partial_path)
+    except FileNotFoundError:
+        pass
+
+
+def abandoned_drafts(cutoff):
+    """Draft accessions with no activity since cutoff."""
+    return Accession.objects.filter(accession_status=Accession.DRAFT, date_last_updated__lt=cutoff).exclude(
+        Exists(File.objects.filter(accession=OuterRef('pk'), date_file_submitted__gte=cutoff))
+    ).exclude(
+        Exists(ChunkedUpload.objects.filter(accession=OuterRef('pk'), date_last_updated__gte=cutoff))
+    )
+
+
+def delete_draft(accession):
+    """Delete a draft accession along with its stored files and partial uploads."""
+    uploads = list(accession.chunkedupload_set.all())
+    uploaded_files = list(accession.file_set.all())
+
+    accession.delete()
+
+    for upload in uploads:
+        remove_partial(upload)
+    for uploaded_file in uploaded_files:
+        uploaded_file.file.delete(save=False)
+
+
+def sweep_drafts(ttl=None):
+    """Delete drafts abandoned for longer than ttl seconds (DRAFT_ACCESSION_TTL by default)."""
+    ttl = settings.DRAFT_ACCESSION_TTL if ttl is None else ttl
+    drafts = list(abandoned_drafts(timezone.now() - timedelta(seconds=ttl)))
+    for accession in drafts:
+        delete_draft(accession)
+    return len(drafts)
@@ -0,0 +1,132 @@
+import os
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+
+from .archive_cache import CacheWriter, archive_fingerprint, cached_archive
+from .archives import StoredTar, StoredZip, StreamingZip, ZipMember, ZstdArchive, should_deflate
+from .models import File
+from .utils import generate_metadata
+
+
+# Files read from the database at a time when exporting many accessions
+EXPORT_BATCH_SIZE = 500
+
+
+def accession_zip(app, model, pk):
+    """The zip archive of an accession's files and metadata.
+
+    Archives that need compressing are served from the archive cache when an
+    up to date copy is there, and saved to it as they are read otherwise.
+    Stored archives are read straight from the files, as caching them would
+    save nothing.
+    """
+    # An accession without files has no archive, so it is read along with them
+    queried_files = list(File.objects.filter(accession=pk).select_related('accession').order_by('pk'))
+    if len(queried_files) == 0:
+        raise Http404
+    accession = queried_files[0].accession
+
+    use_cache = settings.ZIP_COMPRESSION != 'store' and settings.ARCHIVE_CACHE_MAX_SIZE > 0
+    if use_cache:
+        fingerprint = archive_fingerprint(accession, queried_files)
+        cached = cached_archive(pk, fingerprint)
+        if cached is not None:
+            return cached
+
+    members = [file_member(uploaded_file, os.path.join(pk, str(uploaded_file))) for uploaded_file in queried_files]
+    members.append(metadata_member(accession, queried_files))
+
+    # Files stored before CRC-32s were recorded are checksummed as they are
+    # streamed, rather than read in full before sending anything
+    if not any(member.deflate for member in members) and all(member.crc32_known for member in members):
+        return StoredZip(members)
+    archive = StreamingZip(members, settings.ZIP_COMPRESSION_LEVEL, settings.ZIP_COMPRESSION_THREADS)
+    return CacheWriter(archive, pk, fingerprint) if use_cache else archive
+
+
+def accession_tar(pk, zstd=False):
+    """A tar of an accession's files and metadata, laid out like its zip.
+
+    Members are copied from disk as they are, so an uncompressed tar costs
+    almost no CPU and its length is known up front. With zstd the tar is
+    compressed as it is read.
+    """
+    queried_files = list(File.objects.filter(accession=pk).select_related('accession').order_by('pk'))
+    if len(queried_files) == 0:
+        raise Http404
+    accession = queried_files[0].accession
+
+    # A tar has no CRC-32s, so none are read or recorded
+    members = [ZipMember(os.path.join(pk, str(uploaded_file)), uploaded_file.date_file_submitted,
+                         path=uploaded_file.file.path) for uploaded_file in queried_files]
+    members.append(metadata_member(accession, queried_files))
+
+    archive = StoredTar(members)
+    return ZstdArchive(archive, settings.TAR_ZSTD_LEVEL, settings.ZIP_COMPRESSION_THREADS) if zstd else archive
+
+
+def file_member(uploaded_file, name):
+    # audit_fixity fills in the CRC-32s of files stored before they were recorded
+    member = ZipMember(name, uploaded_file.date_file_submitted, path=uploaded_file.file.path,
+                       crc32=int(uploaded_file.crc32, 16) if uploaded_file.crc32 else None)
+    member.deflate = should_deflate(member, uploaded_file.content_type, settings.ZIP_COMPRESSION)
+    return member
+
+
+def metadata_member(accession, files, folder=''):
+    filenames = [(str(f), f.file_description) for f in files]
+    # Always stored: deflating a few hundred bytes would cost the archive its known length
+    return ZipMember(os.path.join(folder, 'metadata.txt'), accession.date_last_updated,
+                     data=generate_metadata(accession, filenames).encode('utf-8'))
+
+
+def grouped_by_accession(accessions):
+    """Yield (accession, files) for each of accessions that has files, in accession order.
+
+    Files are read in keyset batches, so memory does not grow with the number
+    of accessions, only with the files of the one being yielded.
+    """
+    files = File.objects.filter(accession__in=accessions).select_related('accession').order_by('accession_id', 'pk')
+    accession_files = []
+    last = None
+
+    while True:
+        batch = files
+        if last is not None:
+            batch = files.filter(Q(accession=last.accession_id, pk__gt=last.pk) | Q(accession__gt=last.accession_id))
+        batch = list(batch[:EXPORT_BATCH_SIZE])
+        if not batch:
+            break
+
+        for uploaded_file in batch:
+            if accession_files and uploaded_file.accession_id != accession_files[0].accession_id:
+                yield accession_files[0].accession, accession_files
+                accession_files = []
+            accession_files.append(uploaded_file)
+        last = batch[-1]
+
+    if accession_files:
+        yield accession_files[0].accession, accession_files
+
+
+def export_members(accessions, progress=None):
+    """Zip members for many accessions, each in a folder laid out like its own archive.
+
+    Each accession's files are read one after another. progress is called
+    with the number of accessions exported so far as each one is finished.
+    """
+    for exported, (accession, files) in enumerate(grouped_by_accession(accessions), 1):
+        folder = str(accession.pk)
+        for uploaded_file in files:
+            yield file_member(uploaded_file, os.path.join(folder, folder, str(uploaded_file)))
+        yield metadata_member(accession, files, folder)
+        if progress:
+            progress(exported)
+
+
+def export_zip(accessions, progress=None):
+    """One archive of many accessions, written as it is read."""
+    return StreamingZip(export_members(accessions, progress), settings.ZIP_COMPRESSION_LEVEL,
+                        settings.ZIP_COMPRESSION_THREADS)
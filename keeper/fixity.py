@@ -0,0 +1,100 @@
+import hashlib
+import time
+import zlib
+
+from django.conf import settings
+
+
+# Size of the reads used when re-hashing stored files
+FIXITY_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+class CRC32:
+    """A running CRC-32 with the hashlib interface, kept so zip headers can be written without reading files."""
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return '{:08x}'.format(self.value)
+
+
+def new_hashers():
+    """Hash objects for each checksum recorded for a File, by field name."""
+    hashers = {'sha256': hashlib.sha256(), 'crc32': CRC32()}
+    if settings.RECORD_MD5:
+        hashers['md5'] = hashlib.md5()
+    return hashers
+
+
+def hexdigests(hashers):
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+def file_checksums(path):
+    """Every checksum recorded for a File, from one read of the file at path."""
+    hashers = new_hashers()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(FIXITY_CHUNK_SIZE)
+            if not chunk:
+                return hexdigests(hashers)
+            for hasher in hashers.values():
+                hasher.update(chunk)
+
+
+class Throttle:
+    """Keep reads at or below a number of bytes per second by sleeping between them."""
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self.start = time.monotonic()
+        self.bytes_read = 0
+
+    def consume(self, size):
+        self.bytes_read += size
+        # How far ahead of the allowed rate the reads so far have got
+        ahead = self.bytes_read / self.bytes_per_second - (time.monotonic() - self.start)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+# Per process throttle for audit workers, set up by init_audit_worker
+_throttle = None
+
+
+def init_audit_worker(bytes_per_second):
+    global _throttle
+    _throttle = Throttle(bytes_per_second) if bytes_per_second else None
+
+
+def hash_path(item):
+    """Re-hash one stored file for an audit. Runs in a worker process.
+
+    ``item`` is a (file_id, path, record_md5) tuple. Returns (file_id, checksums,
+    bytes_read), with checksums None if the file is missing.
+    """
+    file_id, path, record_md5 = item
+    hashers = {'sha256': hashlib.sha256()}
+    if record_md5:
+        hashers['md5'] = hashlib.md5()
+
+    size = 0
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(FIXITY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                for hasher in hashers.values():
+                    hasher.update(chunk)
+                if _throttle is not None:
+                    _throttle.consume(len(chunk))
+    except FileNotFoundError:
+        return file_id, None, size
+
+    return file_id, hexdigests(hashers), size
@@ -4,7 +4,7 @@ from parsley.decorators import parsleyfy
 
 from captcha.fields import ReCaptchaField
 
-from .models import Accession, File
+from .models import Accession, ChunkedUpload, File
 
 
 @parsleyfy
@@ -34,3 +34,9 @@ class FileForm(ModelForm):
                 'rows': 5
             }),
         }
+
+
+class ChunkedUploadForm(ModelForm):
+    class Meta:
+        model = ChunkedUpload
+        fields = ['filename', 'size', 'file_description', 'content_type']
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Accession, StatusChange
+
+
+def change_status(queryset, new_status, user=None):
+    """Set the status of every accession in queryset, recording each one that changes.
+
+    However many accessions there are, this is one read of the ones changing,
+    one UPDATE and one bulk INSERT of their history, all in one transaction.
+    Returns the number of accessions updated.
+    """
+    with transaction.atomic():
+        changing = queryset.exclude(accession_status=new_status).select_for_update().order_by().values_list(
+            'pk', 'accession_status')
+        now = timezone.now()
+        changes = [StatusChange(accession_id=pk, old_status=old_status, new_status=new_status, user=user,
+                                date_changed=now) for pk, old_status in changing]
+        rows_updated = queryset.update(accession_status=new_status)
+        StatusChange.objects.bulk_create(changes)
+    return rows_updated
+
+
+def record_status_change(accession, old_status, user=None):
+    """Record a status change already saved on one accession."""
+    if accession.accession_status != old_status:
+        StatusChange.objects.create(accession=accession, old_status=old_status,
+                                    new_status=accession.accession_status, user=user)
+
+
+def time_in_status(days=90):
+    """How long accessions stayed in each status, for changes out of it in the last days.
+
+    Each change ends a stay in its old status that began with the change
+    before it, or with the accession's submission if there was none, found
+    through the (accession, date_changed) index.
+    """
+    previous = StatusChange.objects.filter(
+        accession=OuterRef('accession'), date_changed__lt=OuterRef('date_changed')
+    ).order_by('-date_changed').values('date_changed')[:1]
+    started = Coalesce(Subquery(previous), F('accession__date_submitted'))
+
+    stays = StatusChange.objects.filter(date_changed__gte=timezone.now() - timedelta(days=days)).values(
+        'old_status').annotate(
+        changes=Count('id'),
+        average=Avg(ExpressionWrapper(F('date_changed') - started, output_field=DurationField())),
+    ).order_by()
+
+    stays = {stay['old_status']: stay for stay in stays}
+    return [{'status': label, 'changes': stays[status]['changes'], 'average': stays[status]['average']}
+            for status, label in Accession.STATUS_CHOICES if status in stays]
@@ -0,0 +1,179 @@
+import errno
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .blobs import attach_blob
+from .fixity import hexdigests, new_hashers
+from .models import Blob, File
+from .search import index_accessions
+from .tasks import enqueue_file_tasks
+
+
+# Size of the reads used to stream an upload into storage
+INGEST_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+def check_size(size):
+    if size > settings.MAX_UPLOAD_SIZE:
+        raise ValidationError(f'File size must be no more than {settings.MAX_UPLOAD_SIZE / 1024 / 1024 / 1024} GB')
+
+
+def store_exclusively(instance, filename, create):
+    """Store a file under the first free name for filename and return that name.
+
+    ``create(path)`` must create the file at path and raise FileExistsError if
+    it already exists, so a concurrent upload of the same name in the same
+    accession gets a different name rather than overwriting it.
+    """
+    field = File._meta.get_field('file')
+    storage = field.storage
+    name = field.generate_filename(instance, filename)
+
+    while True:
+        name = storage.get_available_name(name, max_length=field.max_length)
+        path = storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            create(path)
+        except FileExistsError:
+            continue
+        if storage.file_permissions_mode is not None:
+            os.chmod(path, storage.file_permissions_mode)
+        return name
+
+
+def copy_upload(instance, upload):
+    """Copy an upload into storage, checking its size and hashing it on the way."""
+    hashers = new_hashers()
+    created = []
+
+    def create(path):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+        created.append(path)
+        size = 0
+        with os.fdopen(fd, 'wb') as destination:
+            upload.seek(0)
+            for chunk in upload.chunks(chunk_size=INGEST_CHUNK_SIZE):
+                size += len(chunk)
+                check_size(size)
+                for hasher in hashers.values():
+                    hasher.update(chunk)
+                destination.write(chunk)
+
+    try:
+        name = store_exclusively(instance, upload.name, create)
+    except BaseException:
+        for path in created:
+            os.remove(path)
+        raise
+
+    return name, hexdigests(hashers)
+
+
+def hash_upload(upload):
+    hashers = new_hashers()
+    size = 0
+    upload.seek(0)
+    for chunk in upload.chunks(chunk_size=INGEST_CHUNK_SIZE):
+        size += len(chunk)
+        check_size(size)
+        for hasher in hashers.values():
+            hasher.update(chunk)
+    return hexdigests(hashers)
+
+
+def move_upload(instance, upload, keep_source=False):
+    """Move a spooled upload into storage with an atomic, collision-safe hard link.
+
+    With keep_source the spool file is left linked where it is, for callers
+    that remove it themselves once the File has been committed. Returns None,
+    having moved nothing, when the spool file is on a different device from
+    storage and has to be copied instead.
+    """
+    source = upload.temporary_file_path()
+    storage = File._meta.get_field('file').storage
+    os.makedirs(storage.location, exist_ok=True)
+    if os.stat(source).st_dev != os.stat(storage.location).st_dev:
+        return None
+
+    # SpoolingUploadHandler hashes uploads as they arrive
+    checksums = getattr(upload, 'checksums', None)
+    if checksums is None or checksums.keys() != new_hashers().keys():
+        checksums = hash_upload(upload)
+    else:
+        check_size(upload.size)
+
+    def create(path):
+        # Unlike a rename, link() refuses to replace an existing file
+        os.link(source, path)
+
+    try:
+        name = store_exclusively(instance, upload.name, create)
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            return None
+        raise
+
+    if not keep_source:
+        os.remove(source)
+    return name, checksums
+
+
+def ingest_upload(upload, accession, file_description='', content_type=None, keep_source=False):
+    """Put an upload in its final location, checking its size and hashing it on the way.
+
+    Spooled uploads on the same filesystem as storage are moved into place,
+    leaving the spool file too with keep_source; anything else is copied,
+    reading it exactly once. With DEDUPLICATE_UPLOADS
+    the stored file is then linked to the shared blob for its content. Returns
+    an unsaved File pointing at the stored bytes.
+    """
+    instance = File(accession=accession,
+                    file_description=file_description,
+                    content_type=upload.content_type if content_type is None else content_type)
+
+    stored = None
+    if hasattr(upload, 'temporary_file_path'):
+        stored = move_upload(instance, upload, keep_source)
+    if stored is None:
+        stored = copy_upload(instance, upload)
+
+    instance.file, checksums = stored
+    instance.size = instance.file.size
+    for name, checksum in checksums.items():
+        setattr(instance, name, checksum)
+
+    if settings.DEDUPLICATE_UPLOADS:
+        attach_blob(instance)
+
+    return instance
+
+
+def save_files(uploaded_files):
+    """Insert ingested Files with a single query and queue their background tasks.
+
+    bulk_create skips post_save, so the tasks keeper.signals would have queued
+    for each new File are queued here instead, and their accessions reindexed
+    for search.
+    """
+    File.objects.bulk_create(uploaded_files)
+    enqueue_file_tasks([uploaded_file.pk for uploaded_file in uploaded_files])
+    accession_pks = {uploaded_file.accession_id for uploaded_file in uploaded_files}
+    transaction.on_commit(lambda: index_accessions(accession_pks))
+
+
+def discard_files(uploaded_files):
+    """Remove the stored bytes of ingested Files whose rows were rolled back."""
+    for uploaded_file in uploaded_files:
+        paths = [uploaded_file.file.path]
+        # A blob created in the same transaction was rolled back with it
+        if uploaded_file.blob_id is not None and not Blob.objects.filter(pk=uploaded_file.blob_id).exists():
+            paths.append(uploaded_file.blob.path)
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,154 @@
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+# Registered task functions, by name
+TASKS = {}
+
+
+def task(name):
+    """Register a function as a task that can be enqueued by name."""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(task_name, **arguments):
+    return Job.objects.create(task=task_name, arguments=arguments)
+
+
+def enqueue_many(task_name, arguments_list):
+    """Enqueue one job per set of arguments with a single insert."""
+    return Job.objects.bulk_create([Job(task=task_name, arguments=arguments) for arguments in arguments_list])
+
+
+def default_worker_name():
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+def retry_delay(attempts):
+    # Exponential backoff: 30s, 1m, 2m, 4m... capped at JOB_RETRY_MAX_DELAY
+    return timedelta(seconds=min(settings.JOB_RETRY_DELAY * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_DELAY))
+
+
+def claimable(now):
+    # Queued jobs that are due, and running jobs whose worker let the lease lapse
+    return Q(status=Job.QUEUED, run_after__lte=now) | Q(status=Job.RUNNING, lease_expires__lt=now)
+
+
+def claim_job(worker):
+    """Lease the next due job to worker, or return None when there is nothing to do.
+
+    A job is claimed with a conditional UPDATE, so two workers racing for the
+    same job cannot both get it, without needing row locks.
+    """
+    while True:
+        now = timezone.now()
+        candidate = Job.objects.filter(claimable(now)).order_by('run_after', 'id').values_list('pk', flat=True).first()
+        if candidate is None:
+            return None
+
+        claimed = Job.objects.filter(claimable(now), pk=candidate).update(
+            status=Job.RUNNING,
+            worker=worker,
+            attempts=F('attempts') + 1,
+            lease_expires=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            date_started=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=candidate)
+
+
+def run_job(job):
+    """Run a claimed job, then record its result or schedule a retry."""
+    try:
+        func = TASKS[job.task]
+        func(**job.arguments)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            job.date_finished = timezone.now()
+        else:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+    else:
+        job.status = Job.DONE
+        job.date_finished = timezone.now()
+
+    job.lease_expires = None
+    # Only record the result if the lease was not lost to another worker meanwhile
+    Job.objects.filter(pk=job.pk, worker=job.worker, status=Job.RUNNING).update(
+        status=job.status,
+        run_after=job.run_after,
+        lease_expires=None,
+        last_error=job.last_error,
+        date_finished=job.date_finished,
+    )
+    return job
+
+
+def run_pending(worker=None, limit=None):
+    """Run due jobs until there are none left (or limit is reached). Returns how many ran."""
+    worker = worker or default_worker_name()
+    count = 0
+    while limit is None or count < limit:
+        job = claim_job(worker)
+        if job is None:
+            break
+        if job.attempts > job.max_attempts:
+            # The lease lapsed on the last attempt, e.g. the worker was killed
+            Job.objects.filter(pk=job.pk, worker=worker).update(
+                status=Job.FAILED, lease_expires=None, date_finished=timezone.now())
+            continue
+        run_job(job)
+        count += 1
+    return count
+
+
+def queue_stats():
+    """Queue depth by state and job latency over the last day, for the admin."""
+    now = timezone.now()
+    depth = dict(Job.objects.values_list('status').annotate(Count('id')).order_by())
+    due = Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+    recent = Job.objects.filter(status=Job.DONE, date_finished__gte=now - timedelta(days=1)).aggregate(
+        count=Count('id'),
+        wait=Avg(ExpressionWrapper(F('date_started') - F('date_created'), output_field=DurationField())),
+        latency=Avg(ExpressionWrapper(F('date_finished') - F('date_created'), output_field=DurationField())),
+    )
+    oldest_due = due.aggregate(oldest=Min('run_after'))['oldest']
+
+    return {
+        'due': due.count(),
+        'scheduled': depth.get(Job.QUEUED, 0) - due.count(),
+        'running': depth.get(Job.RUNNING, 0),
+        'failed': depth.get(Job.FAILED, 0),
+        'oldest_due_age': now - oldest_due if oldest_due else None,
+        'done_last_day': recent['count'],
+        'average_wait': recent['wait'],
+        'average_latency': recent['latency'],
+    }
+
+
+def work(once=False, poll_interval=5):
+    """Worker loop: run jobs as they become due, sleeping while the queue is empty."""
+    # Never share a database connection inherited from a parent process
+    connections.close_all()
+    worker = default_worker_name()
+    while True:
+        if run_pending(worker, limit=1):
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
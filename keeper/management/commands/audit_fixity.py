@@ -0,0 +1,108 @@
+import multiprocessing
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from keeper.fixity import hash_path, init_audit_worker
+from keeper.models import File, FixityAudit, FixityCheck
+
+
+class Command(BaseCommand):
+    help = 'Re-hash stored uploads and compare them with their recorded checksums.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=0,
+                            help='Only audit files not checked in this many days.')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue the last audit that did not finish.')
+        parser.add_argument('--processes', type=int, default=4,
+                            help='Number of processes reading files.')
+        parser.add_argument('--max-bandwidth', type=float, default=0,
+                            help='Most MB per second to read, shared by all processes (0 for no limit).')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of files to read from the database at a time.')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            audit = FixityAudit.objects.filter(date_finished__isnull=True).order_by('-date_started').first()
+            if audit is None:
+                raise CommandError('There is no unfinished audit to resume.')
+        else:
+            audit = FixityAudit.objects.create(checked_before=timezone.now() - timedelta(days=options['days']))
+
+        # Files checked since the audit started have dropped out of this queryset,
+        # so an interrupted audit picks up where it stopped
+        queryset = File.objects.filter(
+            Q(date_fixity_checked__isnull=True) | Q(date_fixity_checked__lt=audit.checked_before)).order_by('pk')
+
+        bytes_per_second = options['max_bandwidth'] * 1024 * 1024 / options['processes']
+        if options['processes'] == 1:
+            init_audit_worker(bytes_per_second)
+            self.audit(audit, queryset, map, options['batch_size'])
+        else:
+            # Workers only read files, but must not inherit a database connection
+            connections.close_all()
+            with multiprocessing.Pool(options['processes'], init_audit_worker, (bytes_per_second,)) as pool:
+                self.audit(audit, queryset, lambda func, items: pool.imap_unordered(func, items, chunksize=8),
+                           options['batch_size'])
+
+        audit.date_finished = timezone.now()
+        audit.save(update_fields=['date_finished'])
+        audit.refresh_from_db()
+
+        self.stdout.write(self.style.SUCCESS(
+            'Checked {} files ({} bytes): {} failed, {} missing.'.format(
+                audit.files_checked, audit.bytes_read, audit.files_failed, audit.files_missing)))
+
+    def audit(self, audit, queryset, map_func, batch_size):
+        last_pk = 0
+        storage = File._meta.get_field('file').storage
+
+        while True:
+            batch = {uploaded_file.pk: uploaded_file for uploaded_file in
+                     queryset.filter(pk__gt=last_pk).only('file', 'sha256', 'md5')[:batch_size]}
+            if not batch:
+                return
+            last_pk = max(batch)
+
+            items = [(pk, storage.path(uploaded_file.file.name), settings.RECORD_MD5 or bool(uploaded_file.md5))
+                     for pk, uploaded_file in batch.items()]
+            checks = []
+            failed = missing = bytes_read = 0
+
+            for pk, checksums, size in map_func(hash_path, items):
+                uploaded_file = batch[pk]
+                bytes_read += size
+
+                if checksums is None:
+                    outcome = FixityCheck.MISSING
+                    missing += 1
+                    self.stderr.write('Missing: {}'.format(uploaded_file.file.name))
+                elif any(getattr(uploaded_file, name) and getattr(uploaded_file, name) != checksum
+                         for name, checksum in checksums.items()):
+                    outcome = FixityCheck.FAILED
+                    failed += 1
+                    self.stderr.write('Failed: {}'.format(uploaded_file.file.name))
+                else:
+                    outcome = FixityCheck.PASSED
+                    # Files stored before checksums were recorded get them now
+                    missing_checksums = [name for name in checksums if not getattr(uploaded_file, name)]
+                    if missing_checksums:
+                        File.objects.filter(pk=pk).update(
+                            **{name: checksums[name] for name in missing_checksums})
+
+                checks.append(FixityCheck(file_id=pk, audit=audit, outcome=outcome,
+                                          sha256=checksums['sha256'] if checksums else ''))
+
+            FixityCheck.objects.bulk_create(checks)
+            File.objects.filter(pk__in=batch).update(date_fixity_checked=timezone.now())
+            FixityAudit.objects.filter(pk=audit.pk).update(
+                files_checked=F('files_checked') + len(checks),
+                files_failed=F('files_failed') + failed,
+                files_missing=F('files_missing') + missing,
+                bytes_read=F('bytes_read') + bytes_read,
+            )
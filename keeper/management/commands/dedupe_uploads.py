@@ -0,0 +1,41 @@
+import hashlib
+
+from django.core.management.base import BaseCommand
+
+from keeper.blobs import attach_blob
+from keeper.models import File
+
+
+class Command(BaseCommand):
+    help = 'Move existing uploads into the content-addressed blob store and report the bytes reclaimed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of files to read from the database at a time.')
+
+    def handle(self, *args, **options):
+        files_linked = 0
+        files_missing = 0
+        bytes_reclaimed = 0
+
+        queryset = File.objects.filter(blob__isnull=True).order_by('pk')
+        for uploaded_file in queryset.iterator(chunk_size=options['batch_size']):
+            if not uploaded_file.file.storage.exists(uploaded_file.file.name):
+                self.stderr.write('Missing: {}'.format(uploaded_file.file.name))
+                files_missing += 1
+                continue
+
+            if not uploaded_file.sha256:
+                sha256 = hashlib.sha256()
+                with uploaded_file.file.open('rb') as f:
+                    for chunk in f.chunks():
+                        sha256.update(chunk)
+                uploaded_file.sha256 = sha256.hexdigest()
+
+            bytes_reclaimed += attach_blob(uploaded_file)
+            uploaded_file.save(update_fields=['sha256', 'blob'])
+            files_linked += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            'Linked {} files to blobs, reclaimed {} bytes ({} missing).'.format(
+                files_linked, bytes_reclaimed, files_missing)))
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from keeper.bagit import bag_zip
+from keeper.exports import export_zip
+from keeper.models import Accession
+
+
+class Command(BaseCommand):
+    help = 'Write one zip archive of many accessions, each in its own folder or BagIt bag.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('accession_ids', nargs='*', type=int, help='Accessions to export.')
+        parser.add_argument('--status', choices=[status for status, _ in Accession.STATUS_CHOICES],
+                            help='Export every accession with this status, e.g. ACC for accepted.')
+        parser.add_argument('--format', choices=['zip', 'bag'], default='zip',
+                            help='A folder per accession like its own zip download, or a BagIt bag per accession.')
+        parser.add_argument('--output', required=True, help='Path of the zip to write, or - for standard output.')
+
+    def handle(self, *args, **options):
+        accessions = Accession.objects.all()
+        if options['accession_ids']:
+            accessions = accessions.filter(pk__in=options['accession_ids'])
+        if options['status']:
+            accessions = accessions.filter(accession_status=options['status'])
+        if not options['accession_ids'] and not options['status']:
+            raise CommandError('Give accession IDs or --status.')
+
+        total = accessions.filter(file__isnull=False).distinct().count()
+        bytes_written = 0
+
+        def progress(exported):
+            self.stderr.write('Exported {} of {} accessions ({} bytes)'.format(exported, total, bytes_written))
+
+        export = bag_zip if options['format'] == 'bag' else export_zip
+        output = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            for data in export(accessions, progress):
+                output.write(data)
+                bytes_written += len(data)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+
+        self.stderr.write(self.style.SUCCESS('Exported {} accessions ({} bytes) to {}.'.format(
+            total, bytes_written, options['output'])))
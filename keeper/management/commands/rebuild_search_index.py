@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from keeper.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents of every accession.'
+
+    def handle(self, *args, **options):
+        def progress(indexed):
+            self.stderr.write('Indexed {} accessions'.format(indexed))
+
+        indexed = rebuild_index(progress if options['verbosity'] > 1 else None)
+        self.stdout.write(self.style.SUCCESS('Indexed {} accessions.'.format(indexed)))
@@ -0,0 +1,35 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+
+from keeper.jobs import work
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Number of worker processes to start.')
+        parser.add_argument('--poll-interval', type=float, default=5,
+                            help='Seconds to wait before checking an empty queue again.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no jobs are due instead of waiting for more.')
+
+    def handle(self, *args, **options):
+        kwargs = {'once': options['once'], 'poll_interval': options['poll_interval']}
+
+        if options['processes'] == 1:
+            work(**kwargs)
+            return
+
+        workers = [multiprocessing.Process(target=work, kwargs=kwargs) for _ in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # Jobs interrupted here are picked up again when their lease expires
+            for worker in workers:
+                worker.terminate()
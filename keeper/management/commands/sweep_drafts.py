@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from keeper.drafts import sweep_drafts
+
+
+class Command(BaseCommand):
+    help = 'Delete draft accessions that have been abandoned, with their uploaded files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int,
+                            help='Seconds without activity before a draft is deleted. '
+                                 'Defaults to the DRAFT_ACCESSION_TTL setting.')
+
+    def handle(self, *args, **options):
+        count = sweep_drafts(options['ttl'])
+        self.stdout.write(self.style.SUCCESS('Deleted {} abandoned draft accessions.'.format(count)))
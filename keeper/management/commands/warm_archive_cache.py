@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from keeper.archive_cache import CacheWriter
+from keeper.exports import accession_zip
+from keeper.models import Accession
+
+
+class Command(BaseCommand):
+    help = 'Build cached zip archives for accepted accessions that do not have an up to date one.'
+
+    def handle(self, *args, **options):
+        if settings.ZIP_COMPRESSION == 'store' or not settings.ARCHIVE_CACHE_MAX_SIZE:
+            raise CommandError('Archives are only cached when ZIP_COMPRESSION is not "store" '
+                               'and ARCHIVE_CACHE_MAX_SIZE is set.')
+
+        built = 0
+        bytes_written = 0
+        skipped = 0
+        accessions = Accession.objects.filter(accession_status=Accession.ACCEPTED, file__isnull=False).distinct()
+        for pk in accessions.order_by('pk').values_list('pk', flat=True):
+            archive = accession_zip('keeper', 'accession', str(pk))
+            if not isinstance(archive, CacheWriter):
+                # Already cached, or stored and read straight from the files
+                skipped += 1
+                continue
+            bytes_written += sum(len(data) for data in archive)
+            built += 1
+
+        self.stdout.write(self.style.SUCCESS('Cached {} archives ({} bytes), {} already cached or not compressed.'.format(
+            built, bytes_written, skipped)))
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keeper', '0005_alter_file_file'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accession',
+            name='accession_status',
+            field=models.CharField(blank=True, choices=[('NEW', 'New'), ('REV', 'Under Review'), ('ACC', 'Accepted'), ('REJ', 'Rejected'), ('DRA', 'Draft')], default='NEW', max_length=25),
+        ),
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('filename', models.CharField(max_length=255)),
+                ('file_description', models.TextField(blank=True)),
+                ('content_type', models.CharField(blank=True, max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('offset', models.PositiveBigIntegerField(default=0)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_last_updated', models.DateTimeField(auto_now=True)),
+                ('accession', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='keeper.accession')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keeper', '0006_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256'),
+        ),
+    ]
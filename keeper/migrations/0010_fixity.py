@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keeper', '0009_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FixityAudit',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checked_before', models.DateTimeField()),
+                ('date_started', models.DateTimeField(auto_now_add=True)),
+                ('date_finished', models.DateTimeField(blank=True, null=True)),
+                ('files_checked', models.PositiveIntegerField(default=0)),
+                ('files_failed', models.PositiveIntegerField(default=0)),
+                ('files_missing', models.PositiveIntegerField(default=0)),
+                ('bytes_read', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='date_fixity_checked',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='md5',
+            field=models.CharField(blank=True, editable=False, max_length=32, verbose_name='MD5'),
+        ),
+        migrations.CreateModel(
+            name='FixityCheck',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('outcome', models.CharField(choices=[('PAS', 'Passed'), ('FAI', 'Failed'), ('MIS', 'Missing')], max_length=3)),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256')),
+                ('date_checked', models.DateTimeField(auto_now_add=True)),
+                ('audit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='keeper.fixityaudit')),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='keeper.file')),
+            ],
+            options={
+                'ordering': ['-date_checked'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keeper', '0010_fixity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='crc32',
+            field=models.CharField(blank=True, editable=False, max_length=8, verbose_name='CRC-32'),
+        ),
+    ]
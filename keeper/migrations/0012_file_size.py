@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:27
+
+from django.db import migrations, models
+
+
+def record_sizes(apps, schema_editor):
+    File = apps.get_model('keeper', 'File')
+    storage = File._meta.get_field('file').storage
+    batch = []
+    for uploaded_file in File.objects.filter(size__isnull=True).only('pk', 'file').iterator(chunk_size=1000):
+        try:
+            uploaded_file.size = storage.size(uploaded_file.file.name)
+        except FileNotFoundError:
+            # Missing files are left without a size
+            continue
+        batch.append(uploaded_file)
+        if len(batch) == 1000:
+            File.objects.bulk_update(batch, ['size'])
+            batch = []
+    File.objects.bulk_update(batch, ['size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keeper', '0011_file_crc32'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(record_sizes, migrations.RunPython.noop),
+    ]
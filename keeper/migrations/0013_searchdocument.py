@@ -0,0 +1,71 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SQLITE_INDEX = [
+    # An external content table: the text is only stored in keeper_searchdocument
+    """CREATE VIRTUAL TABLE keeper_searchdocument_fts USING fts5(
+        text, content='keeper_searchdocument', content_rowid='accession_id',
+        tokenize='porter unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER keeper_searchdocument_insert AFTER INSERT ON keeper_searchdocument BEGIN
+        INSERT INTO keeper_searchdocument_fts(rowid, text) VALUES (new.accession_id, new.text);
+    END""",
+    """CREATE TRIGGER keeper_searchdocument_delete AFTER DELETE ON keeper_searchdocument BEGIN
+        INSERT INTO keeper_searchdocument_fts(keeper_searchdocument_fts, rowid, text)
+            VALUES ('delete', old.accession_id, old.text);
+    END""",
+    """CREATE TRIGGER keeper_searchdocument_update AFTER UPDATE ON keeper_searchdocument BEGIN
+        INSERT INTO keeper_searchdocument_fts(keeper_searchdocument_fts, rowid, text)
+            VALUES ('delete', old.accession_id, old.text);
+        INSERT INTO keeper_searchdocument_fts(rowid, text) VALUES (new.accession_id, new.text);
+    END""",
+]
+
+SQLITE_DROP_INDEX = [
+    'DROP TRIGGER keeper_searchdocument_insert',
+    'DROP TRIGGER keeper_searchdocument_delete',
+    'DROP TRIGGER keeper_searchdocument_update',
+    'DROP TABLE keeper_searchdocument_fts',
+]
+
+POSTGRESQL_INDEX = [
+    # Stored, so searches match and rank against it without parsing the text again
+    """ALTER TABLE keeper_searchdocument ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', text)) STORED""",
+    'CREATE INDEX keeper_searchdocument_vector_gin ON keeper_searchdocument USING gin (search_vector)',
+]
+
+POSTGRESQL_DROP_INDEX = [
+    'DROP INDEX keeper_searchdocument_vector_gin',
+    'ALTER TABLE keeper_searchdocument DROP COLUMN search_vector',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keeper', '0012_file_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('accession', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='keeper.accession')),
+                ('text', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_INDEX, 'postgresql': POSTGRESQL_INDEX}),
+            run_for_vendor({'sqlite': SQLITE_DROP_INDEX, 'postgresql': POSTGRESQL_DROP_INDEX}),
+        ),
+    ]
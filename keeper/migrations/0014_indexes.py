@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keeper', '0013_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accession',
+            index=models.Index(fields=['date_submitted', 'id'], name='keeper_acc_submitted'),
+        ),
+        migrations.AddIndex(
+            model_name='accession',
+            index=models.Index(fields=['accession_status', 'date_submitted', 'id'], name='keeper_acc_status_submitted'),
+        ),
+        migrations.AddIndex(
+            model_name='accession',
+            index=models.Index(fields=['email_address'], name='keeper_acc_email'),
+        ),
+        migrations.AddIndex(
+            model_name='accession',
+            index=models.Index(condition=models.Q(('accession_status', 'DRA')), fields=['date_last_updated'], name='keeper_acc_draft_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['accession', 'id'], name='keeper_file_accession'),
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='accession',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='keeper.accession'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('keeper', '0014_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_status', models.CharField(blank=True, choices=[('NEW', 'New'), ('REV', 'Under Review'), ('ACC', 'Accepted'), ('REJ', 'Rejected'), ('DRA', 'Draft')], max_length=25)),
+                ('new_status', models.CharField(blank=True, choices=[('NEW', 'New'), ('REV', 'Under Review'), ('ACC', 'Accepted'), ('REJ', 'Rejected'), ('DRA', 'Draft')], max_length=25)),
+                ('date_changed', models.DateTimeField(default=django.utils.timezone.now)),
+                ('accession', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='keeper.accession')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date_changed'],
+                'indexes': [models.Index(fields=['date_changed'], name='keeper_statuschange_date'), models.Index(fields=['accession', 'date_changed'], name='keeper_statuschange_accession')],
+            },
+        ),
+    ]
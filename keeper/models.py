@@ -1,11 +1,16 @@
 import os
+import uuid
 
+from django.conf import settings
 from django.db import models
+from django.urls import reverse
+from django.utils import timezone
 from django.utils.html import format_html
 
 from private_storage.fields import PrivateFileField
 
 from .constants import ACCEPTED_FILE_TYPES
+from .thumbnails import has_thumbnail
 from .validators import validate_file_type, validate_file_size
 
 
@@ -15,12 +20,14 @@ class Accession(models.Model):
     REVIEW = 'REV'
     ACCEPTED = 'ACC'
     REJECTED = 'REJ'
+    DRAFT = 'DRA'
 
     STATUS_CHOICES = (
         (NEW,       'New'),
         (REVIEW,    'Under Review'),
         (ACCEPTED,  'Accepted'),
         (REJECTED,  'Rejected'),
+        (DRAFT,     'Draft'),
     )
 
     # Status for donor affiliation
@@ -62,18 +69,103 @@ class Accession(models.Model):
 
     class Meta:
         ordering = ['date_submitted']
+        indexes = [
+            # Listing in date order, and paging through it by (date_submitted, id)
+            models.Index(fields=['date_submitted', 'id'], name='keeper_acc_submitted'),
+            # The admin status filter in date order, and counting accessions by status for stats
+            models.Index(fields=['accession_status', 'date_submitted', 'id'], name='keeper_acc_status_submitted'),
+            models.Index(fields=['email_address'], name='keeper_acc_email'),
+            # Only drafts are swept, and they are few next to the rest
+            models.Index(fields=['date_last_updated'], name='keeper_acc_draft_updated',
+                         condition=models.Q(accession_status='DRA')),
+        ]
+
+
+class StatusChange(models.Model):
+    """One change of an accession's status, recorded by keeper.history and never edited."""
+    # Indexed along with date_changed below
+    accession = models.ForeignKey('Accession', on_delete=models.CASCADE, db_index=False)
+    old_status = models.CharField(max_length=25, blank=True, choices=Accession.STATUS_CHOICES)
+    new_status = models.CharField(max_length=25, blank=True, choices=Accession.STATUS_CHOICES)
+    # Empty for changes made by the donor, such as submitting a draft
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    date_changed = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return '{} {} to {}'.format(self.accession_id, self.get_old_status_display(), self.get_new_status_display())
+
+    class Meta:
+        ordering = ['-date_changed']
+        indexes = [
+            # What changed in a period
+            models.Index(fields=['date_changed'], name='keeper_statuschange_date'),
+            # An accession's history, and the change before each one for time in status
+            models.Index(fields=['accession', 'date_changed'], name='keeper_statuschange_accession'),
+        ]
+
+
+class SearchDocument(models.Model):
+    """The words an accession is found by in the admin search box.
+
+    The text is indexed for full-text search by the database: a GIN index on
+    a generated search_vector column in PostgreSQL, and an FTS5 table kept in
+    step by triggers in SQLite. See keeper.search.
+    """
+    accession = models.OneToOneField('Accession', primary_key=True, on_delete=models.CASCADE,
+                                     related_name='search_document')
+    text = models.TextField()
+
+    def __str__(self):
+        return str(self.accession_id)
 
 
 def file_upload_location(instance, filename):
     return os.path.join('uploads', str(instance.accession.id), filename)
 
 
+def blob_location(sha256):
+    return os.path.join('blobs', sha256[:2], sha256[2:4], sha256)
+
+
+class Blob(models.Model):
+    """Content shared by every File with the same SHA-256.
+
+    Deduplicated uploads stay at their own path under uploads/ as a hard link
+    to the blob, so filenames, downloads and zip exports do not change.
+    """
+    sha256 = models.CharField('SHA-256', max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def path(self):
+        storage = File._meta.get_field('file').storage
+        return storage.path(blob_location(self.sha256))
+
+    def __str__(self):
+        return self.sha256
+
+
 class File(models.Model):
     file = PrivateFileField(upload_to=file_upload_location, validators=[validate_file_type, validate_file_size])
-    accession = models.ForeignKey('Accession', on_delete=models.CASCADE)
+    # Indexed along with id below
+    accession = models.ForeignKey('Accession', on_delete=models.CASCADE, db_index=False)
     file_description = models.TextField(blank=True)
     content_type = models.CharField(max_length=255, blank=True)
     date_file_submitted = models.DateTimeField(auto_now_add=True)
+    sha256 = models.CharField('SHA-256', max_length=64, blank=True, editable=False)
+    md5 = models.CharField('MD5', max_length=32, blank=True, editable=False)
+    crc32 = models.CharField('CRC-32', max_length=8, blank=True, editable=False)
+    # Kept beside the file so accession totals are summed in the database rather than by stat
+    size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    date_fixity_checked = models.DateTimeField(null=True, blank=True, editable=False)
+    blob = models.ForeignKey('Blob', null=True, blank=True, editable=False, on_delete=models.PROTECT)
+
+    def save(self, *args, **kwargs):
+        if self.size is None and self.file:
+            self.size = self.file.size
+        super().save(*args, **kwargs)
 
     def get_filename(self):
         return os.path.basename(self.file.name)
@@ -84,11 +176,20 @@ class File(models.Model):
                            self.file.url, self.get_filename())
     file_download_element.short_description = 'Download'
 
+    def thumbnail_url(self):
+        # Versioned by the source's modification time, so the thumbnail can be cached indefinitely
+        try:
+            version = os.stat(self.file.path).st_mtime_ns
+        except FileNotFoundError:
+            version = 0
+        return '{}?v={}'.format(reverse('keeper:thumbnail', args=[self.pk]), version)
+
     def image_thumb(self):
-        return format_html('<img src="{}" width="100" height="100" />', self.file.url)
+        return format_html('<img src="{}" width="100" height="100" style="object-fit: contain" />',
+                           self.thumbnail_url())
 
     def clickable_thumb(self):
-        if self.content_type.split('/')[0] == 'image':
+        if has_thumbnail(self):
             thumb = self.image_thumb()
         else:
             thumb = self.icon_thumb()
@@ -108,3 +209,121 @@ class File(models.Model):
 
     def __str__(self):
         return self.get_filename()
+
+    class Meta:
+        indexes = [
+            # An accession's files in the order archives and exports read them
+            models.Index(fields=['accession', 'id'], name='keeper_file_accession'),
+        ]
+
+
+class ChunkedUpload(models.Model):
+    """A file being uploaded in fixed-size chunks to a draft accession.
+
+    Received bytes are written to a partial file in private storage and
+    ``offset`` records how many of them the server already has, so an
+    interrupted upload can resume from there instead of starting over.
+    """
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    accession = models.ForeignKey('Accession', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    file_description = models.TextField(blank=True)
+    content_type = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_last_updated = models.DateTimeField(auto_now=True)
+
+    @property
+    def partial_path(self):
+        storage = File._meta.get_field('file').storage
+        return storage.path(os.path.join('partial', str(self.upload_id)))
+
+    @property
+    def is_complete(self):
+        return self.offset == self.size
+
+    def clean(self):
+        validate_file_size(self)
+
+    def __str__(self):
+        return self.filename
+
+
+class FixityAudit(models.Model):
+    """One run of the audit_fixity command, which can be resumed if interrupted.
+
+    The audit re-hashes every File last checked before ``checked_before``.
+    """
+    checked_before = models.DateTimeField()
+    date_started = models.DateTimeField(auto_now_add=True)
+    date_finished = models.DateTimeField(null=True, blank=True)
+    files_checked = models.PositiveIntegerField(default=0)
+    files_failed = models.PositiveIntegerField(default=0)
+    files_missing = models.PositiveIntegerField(default=0)
+    bytes_read = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return 'Fixity audit {}'.format(self.date_started)
+
+
+class FixityCheck(models.Model):
+    """The result of re-hashing a File during a fixity audit."""
+    PASSED = 'PAS'
+    FAILED = 'FAI'
+    MISSING = 'MIS'
+
+    OUTCOME_CHOICES = (
+        (PASSED,    'Passed'),
+        (FAILED,    'Failed'),
+        (MISSING,   'Missing'),
+    )
+
+    file = models.ForeignKey('File', on_delete=models.CASCADE)
+    audit = models.ForeignKey('FixityAudit', null=True, blank=True, on_delete=models.SET_NULL)
+    outcome = models.CharField(max_length=3, choices=OUTCOME_CHOICES)
+    sha256 = models.CharField('SHA-256', max_length=64, blank=True)
+    date_checked = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return '{} {}'.format(self.file, self.get_outcome_display())
+
+    class Meta:
+        ordering = ['-date_checked']
+
+
+class Job(models.Model):
+    """A unit of background work, run by the run_jobs management command."""
+    QUEUED = 'QUE'
+    RUNNING = 'RUN'
+    DONE = 'DON'
+    FAILED = 'FAI'
+
+    STATUS_CHOICES = (
+        (QUEUED,    'Queued'),
+        (RUNNING,   'Running'),
+        (DONE,      'Done'),
+        (FAILED,    'Failed'),
+    )
+
+    task = models.CharField(max_length=100)
+    arguments = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=3, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    lease_expires = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_started = models.DateTimeField(null=True, blank=True)
+    date_finished = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return '{} {}'.format(self.id, self.task)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='keeper_job_status_run_after'),
+        ]
@@ -0,0 +1,145 @@
+import json
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+# Changelist query string parameters holding the row a keyset page starts after or ends before
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+# Below this many estimated rows the exact count is cheap enough to run
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+def estimated_count(queryset):
+    """The number of rows in queryset, estimated by PostgreSQL's planner for large tables.
+
+    Counting every row of a large table takes as long as reading it, so the
+    planner's estimate is used once it is above ESTIMATED_COUNT_THRESHOLD.
+    Other databases have no estimate to give and are counted exactly.
+    """
+    if connection.vendor != 'postgresql' or queryset.query.is_empty():
+        return queryset.count()
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            # Kept up to date by VACUUM and ANALYZE
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [queryset.model._meta.db_table])
+            estimate = cursor.fetchone()[0]
+        else:
+            sql, params = queryset.values('pk').query.sql_with_params()
+            cursor.execute('EXPLAIN (FORMAT JSON) {}'.format(sql), params)
+            plan = cursor.fetchone()[0]
+            estimate = (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']['Plan Rows']
+    # A table that has never been analyzed estimates -1
+    return estimate if estimate >= ESTIMATED_COUNT_THRESHOLD else queryset.count()
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
+
+
+def seek(queryset, fields, values, descending):
+    """Rows of queryset after the row with values for fields, in (fields) order.
+
+    The first field is also compared on its own, so the database can start
+    from its place in an index on the fields instead of testing each row.
+    """
+    after, after_or_equal = ('__lt', '__lte') if descending else ('__gt', '__gte')
+    condition = Q()
+    for position, (field, value) in enumerate(zip(fields, values)):
+        equal = dict(zip(fields[:position], values))
+        condition |= Q(**equal, **{field + after: value})
+    return queryset.filter(**{fields[0] + after_or_equal: values[0]}).filter(condition)
+
+
+class KeysetChangeList(ChangeList):
+    """A changelist paged by seeking to the row after the last one shown.
+
+    In the model admin's ordering, which must be on fields ending with a
+    unique one and all sorted the same way, each page is read straight from
+    an index on those fields rather than by skipping OFFSET rows, so every
+    page is as fast as the first. Pages link to the next and previous ones
+    instead of to page numbers. Sorting by a column or searching falls back to
+    numbered pages.
+    """
+    keyset = None
+
+    def get_queryset(self, request):
+        # Taken out before filtering, and left out of the changelist's other links
+        self.after = self.params.pop(AFTER_VAR, None)
+        self.before = self.params.pop(BEFORE_VAR, None)
+        return super().get_queryset(request)
+
+    def get_keyset(self, request):
+        """The (fields, descending) pages are sought by, or None for numbered pages."""
+        ordering = list(self.model_admin.get_ordering(request) or ())
+        # The changelist may repeat the ordering after it, which changes nothing
+        if ORDER_VAR in self.params or self.show_all or list(self.queryset.query.order_by[:len(ordering)]) != ordering:
+            return None
+        directions = {name.startswith('-') for name in ordering}
+        if len(directions) != 1:
+            return None
+        return [name.lstrip('-') for name in ordering], directions.pop()
+
+    def get_results(self, request):
+        self.keyset = self.get_keyset(request)
+        if self.keyset is None:
+            return super().get_results(request)
+        fields, descending = self.keyset
+
+        if self.before:
+            reverse_ordering = [('' if descending else '-') + field for field in fields]
+            rows = list(seek(self.queryset, fields, self.cursor_values(self.before), not descending)
+                        .order_by(*reverse_ordering)[:self.list_per_page + 1])
+            self.has_previous = len(rows) > self.list_per_page
+            self.has_next = True
+            rows = rows[:self.list_per_page][::-1]
+        else:
+            queryset = self.queryset
+            if self.after:
+                queryset = seek(queryset, fields, self.cursor_values(self.after), descending)
+            rows = list(queryset[:self.list_per_page + 1])
+            self.has_previous = self.after is not None
+            self.has_next = len(rows) > self.list_per_page
+            rows = rows[:self.list_per_page]
+
+        self.result_list = rows
+        self.result_count = estimated_count(self.queryset)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = self.has_previous or self.has_next
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        if rows:
+            self.previous_url = self.get_query_string({BEFORE_VAR: self.cursor(rows[0])})
+            self.next_url = self.get_query_string({AFTER_VAR: self.cursor(rows[-1])})
+
+    def cursor(self, obj):
+        """An opaque token for the row a page starts after or ends before."""
+        fields, _ = self.keyset
+        values = [self.lookup_opts.get_field(field).value_to_string(obj) for field in fields]
+        return urlsafe_base64_encode(json.dumps(values).encode())
+
+    def cursor_values(self, cursor):
+        fields, _ = self.keyset
+        try:
+            values = json.loads(force_str(urlsafe_base64_decode(cursor)))
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError('Cursor does not match the ordering')
+            return [self.lookup_opts.get_field(field).to_python(value) for field, value in zip(fields, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise IncorrectLookupParameters('Invalid page cursor')
@@ -0,0 +1,90 @@
+import os
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Accession, File, SearchDocument
+
+
+# Accessions indexed at a time when rebuilding the index
+INDEX_BATCH_SIZE = 1000
+
+# What an accession is found by, besides its files' names and descriptions
+INDEXED_FIELDS = ('first_name', 'last_name', 'organization_name', 'email_address', 'description', 'admin_notes')
+
+
+def index_accessions(pks):
+    """Bring the search documents of these accessions up to date.
+
+    Reads the accessions and their files with one query each and writes every
+    document with a single upsert, so reindexing many accessions at once costs
+    the same number of queries as one.
+    """
+    pks = list(pks)
+    files = defaultdict(list)
+    for accession_id, name, description in (File.objects.filter(accession__in=pks).order_by('pk')
+                                            .values_list('accession', 'file', 'file_description')):
+        files[accession_id] += [os.path.basename(name), description]
+
+    documents = []
+    for pk, *values in Accession.objects.filter(pk__in=pks).values_list('pk', *INDEXED_FIELDS):
+        text = '\n'.join(value for value in values + files[pk] if value)
+        documents.append(SearchDocument(accession_id=pk, text=text))
+    SearchDocument.objects.bulk_create(documents, update_conflicts=True, unique_fields=['accession'],
+                                       update_fields=['text'])
+
+
+def rebuild_index(progress=None):
+    """Reindex every accession in batches, returning how many were indexed."""
+    indexed = 0
+    last = 0
+    while True:
+        pks = list(Accession.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:INDEX_BATCH_SIZE])
+        if not pks:
+            break
+        index_accessions(pks)
+        indexed += len(pks)
+        last = pks[-1]
+        if progress:
+            progress(indexed)
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            # Merge the index's segments, which upserts leave fragmented
+            cursor.execute("INSERT INTO keeper_searchdocument_fts(keeper_searchdocument_fts) VALUES ('optimize')")
+    return indexed
+
+
+def fts5_query(terms):
+    # Each word is quoted, so punctuation in what staff type is never read as FTS5 syntax
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in terms.split())
+
+
+def search(queryset, terms):
+    """Accessions in queryset matching terms, annotated with search_rank, higher for better matches.
+
+    The match is answered from the full-text index: PostgreSQL's GIN index on
+    the documents' stored tsvector, which ranking reads too, or SQLite's FTS5
+    table.
+    """
+    accession = '{}.{}'.format(connection.ops.quote_name(Accession._meta.db_table), connection.ops.quote_name('id'))
+    if connection.vendor == 'postgresql':
+        # websearch_to_tsquery accepts anything typed in a search box
+        match = ("SELECT accession_id FROM keeper_searchdocument "
+                 "WHERE search_vector @@ websearch_to_tsquery('english', %s)")
+        rank = ("SELECT ts_rank(search_vector, websearch_to_tsquery('english', %s)) "
+                "FROM keeper_searchdocument WHERE accession_id = {}".format(accession))
+        query = terms
+    else:
+        query = fts5_query(terms)
+        if not query:
+            return queryset.none().annotate(search_rank=Value(0, output_field=FloatField()))
+        match = 'SELECT rowid FROM keeper_searchdocument_fts WHERE keeper_searchdocument_fts MATCH %s'
+        # bm25() is lower for better matches
+        rank = ('SELECT -bm25(keeper_searchdocument_fts) FROM keeper_searchdocument_fts '
+                'WHERE keeper_searchdocument_fts MATCH %s AND rowid = {}'.format(accession))
+
+    return queryset.filter(pk__in=RawSQL(match, [query])).annotate(
+        search_rank=RawSQL(rank, [query], output_field=FloatField()))
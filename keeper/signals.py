@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .archive_cache import remove_cached_archives
+from .blobs import release_blob
+from .models import Accession, File
+from .search import index_accessions
+from .tasks import enqueue_file_tasks
+from .thumbnails import remove_thumbnail
+
+
+@receiver(post_save, sender=File)
+def queue_new_file_tasks(sender, instance, created, **kwargs):
+    if created:
+        enqueue_file_tasks([instance.pk])
+
+
+@receiver(post_delete, sender=File)
+def release_file_blob(sender, instance, **kwargs):
+    if instance.blob_id is not None:
+        release_blob(instance.blob_id)
+
+
+@receiver(post_delete, sender=File)
+def remove_file_thumbnail(sender, instance, **kwargs):
+    remove_thumbnail(instance)
+
+
+# Cached archives are never served once stale, but are removed eagerly to free space
+@receiver(post_save, sender=Accession)
+@receiver(post_delete, sender=Accession)
+def remove_accession_archives(sender, instance, **kwargs):
+    remove_cached_archives(instance.pk)
+
+
+@receiver(post_save, sender=File)
+@receiver(post_delete, sender=File)
+def remove_file_accession_archives(sender, instance, **kwargs):
+    remove_cached_archives(instance.accession_id)
+
+
+# Reindexed once the change is committed, when a deleted accession is gone rather than half deleted
+@receiver(post_save, sender=Accession)
+def index_accession(sender, instance, **kwargs):
+    transaction.on_commit(lambda: index_accessions([instance.pk]))
+
+
+@receiver(post_save, sender=File)
+@receiver(post_delete, sender=File)
+def index_file_accession(sender, instance, **kwargs):
+    transaction.on_commit(lambda: index_accessions([instance.accession_id]))
@@ -0,0 +1,41 @@
+from django.db import transaction
+
+from .fixity import hexdigests, new_hashers
+from .jobs import task
+from .models import File, Job
+from .thumbnails import make_thumbnail
+
+
+# Tasks queued for every new File, each called with file_id
+FILE_TASKS = ['keeper.checksum', 'keeper.thumbnail']
+
+
+def enqueue_file_tasks(file_ids):
+    """Queue FILE_TASKS for new Files, in one insert once the current transaction commits."""
+    jobs = [Job(task=name, arguments={'file_id': file_id}) for file_id in file_ids for name in FILE_TASKS]
+    transaction.on_commit(lambda: Job.objects.bulk_create(jobs))
+
+
+@task('keeper.checksum')
+def checksum(file_id):
+    uploaded_file = File.objects.filter(pk=file_id).first()
+    if uploaded_file is None:
+        return
+    hashers = new_hashers()
+    if all(getattr(uploaded_file, name) for name in hashers):
+        return
+
+    with uploaded_file.file.open('rb') as f:
+        for chunk in f.chunks():
+            for hasher in hashers.values():
+                hasher.update(chunk)
+    for name, checksum in hexdigests(hashers).items():
+        setattr(uploaded_file, name, checksum)
+    uploaded_file.save(update_fields=list(hashers))
+
+
+@task('keeper.thumbnail')
+def thumbnail(file_id):
+    uploaded_file = File.objects.filter(pk=file_id).first()
+    if uploaded_file is not None:
+        make_thumbnail(uploaded_file)
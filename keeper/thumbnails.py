@@ -0,0 +1,71 @@
+import os
+import uuid
+
+from PIL import Image, ImageOps
+
+
+# Largest width and height of a thumbnail, twice the size it is shown at for high DPI screens
+THUMBNAIL_SIZE = (200, 200)
+
+# Image types a thumbnail can be made from
+THUMBNAIL_SOURCE_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/bmp', 'image/tiff', 'image/webp')
+
+
+def thumbnail_path(uploaded_file):
+    # Kept in a hidden directory beside the accession's uploads
+    return os.path.join(os.path.dirname(uploaded_file.file.path), '.thumbnails', '{}.jpg'.format(uploaded_file.pk))
+
+
+def has_thumbnail(uploaded_file):
+    return uploaded_file.content_type in THUMBNAIL_SOURCE_TYPES
+
+
+def is_current(path, source):
+    """Whether the thumbnail at path exists and is newer than its source file."""
+    try:
+        return os.stat(path).st_mtime_ns >= os.stat(source).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def make_thumbnail(uploaded_file):
+    """Write the thumbnail for an uploaded image unless an up to date one exists.
+
+    Returns the thumbnail's path, or None if the file is not an image that can
+    be read.
+    """
+    if not has_thumbnail(uploaded_file):
+        return None
+    source = uploaded_file.file.path
+    path = thumbnail_path(uploaded_file)
+    if is_current(path, source):
+        return path
+
+    try:
+        with Image.open(source) as image:
+            # Let JPEGs decode at a reduced scale instead of at full size
+            image.draft('RGB', THUMBNAIL_SIZE)
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(THUMBNAIL_SIZE)
+            image = image.convert('RGB')
+    except (OSError, Image.DecompressionBombError):
+        return None
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write beside the final path and rename so a request never sees half a thumbnail
+    temporary_path = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+    try:
+        image.save(temporary_path, 'JPEG', quality=85)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    return path
+
+
+def remove_thumbnail(uploaded_file):
+    try:
+        os.remove(thumbnail_path(uploaded_file))
+    except FileNotFoundError:
+        pass
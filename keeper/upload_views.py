@@ -0,0 +1,282 @@
+import functools
+import os
+import re
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_http_methods, require_POST
+
+from .drafts import remove_partial
+from .forms import AccessionForm, ChunkedUploadForm, FileForm
+from .history import record_status_change
+from .ingest import discard_files, ingest_upload, save_files
+from .models import Accession, ChunkedUpload, File
+from .views import submission_success
+
+
+# Resumable chunked uploads
+#
+# 1. POST upload/ with the accession form fields creates a draft accession.
+# 2. POST upload/<accession_id>/files/ declares each file (filename, size,
+#    file_description, content_type) and returns its upload_id.
+# 3. PUT or PATCH upload/<accession_id>/files/<upload_id>/ sends one chunk with
+#    a "Content-Range: bytes <start>-<end>/<size>" header. Chunks are
+#    UPLOAD_CHUNK_SIZE bytes, except the last one.
+# 4. GET or HEAD on the same URL reports how many bytes the server already has,
+#    so a client can resume by resending only the missing chunks.
+# 5. POST upload/<accession_id>/finalize/ validates the assembled files, creates
+#    the File rows and moves the accession from draft to new.
+#
+# Smaller files can instead be sent whole, one per request, with a multipart
+# POST to upload/<accession_id>/file/. Each is validated and stored as it
+# arrives, and can be removed again with a POST to
+# upload/<accession_id>/file/<file_id>/delete/ before the draft is finalized.
+# Drafts left unfinished for DRAFT_ACCESSION_TTL seconds are deleted by the
+# sweep_drafts command.
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+# Read request bodies in pieces rather than holding a whole chunk in memory
+READ_SIZE = 64 * 1024
+
+
+class AssembledUpload(UploadedFile):
+    """A completed chunked upload, which ingest moves into place rather than copying."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def get_draft_accession(request, accession_id):
+    # Drafts may only be touched from the session that created them
+    if int(accession_id) not in request.session.get('draft_accessions', []):
+        raise Http404
+    return get_object_or_404(Accession, pk=accession_id, accession_status=Accession.DRAFT)
+
+
+def upload_status(upload):
+    response = JsonResponse({
+        'upload_id': str(upload.upload_id),
+        'offset': upload.offset,
+        'size': upload.size,
+    })
+    response['Upload-Offset'] = upload.offset
+    return response
+
+
+@require_POST
+def create_draft(request):
+    accession_form = AccessionForm(request.POST, prefix='accession')
+
+    if not accession_form.is_valid():
+        return JsonResponse({
+            'success': False,
+            'errorsForm': accession_form.errors,
+        })
+
+    accession = accession_form.save(commit=False)
+    accession.accession_status = Accession.DRAFT
+    accession.save()
+
+    request.session['draft_accessions'] = request.session.get('draft_accessions', []) + [accession.id]
+
+    return JsonResponse({
+        'success': True,
+        'accession_id': accession.id,
+        'chunk_size': settings.UPLOAD_CHUNK_SIZE,
+    })
+
+
+@require_POST
+def declare_file(request, accession_id):
+    accession = get_draft_accession(request, accession_id)
+
+    upload_form = ChunkedUploadForm(request.POST)
+    if not upload_form.is_valid():
+        return JsonResponse({
+            'success': False,
+            'errorsFile': [{
+                'file_name': request.POST.get('filename', ''),
+                'error': upload_form.errors
+            }]
+        })
+
+    upload = upload_form.save(commit=False)
+    upload.accession = accession
+    upload.save()
+
+    os.makedirs(os.path.dirname(upload.partial_path), exist_ok=True)
+    open(upload.partial_path, 'wb').close()
+
+    return JsonResponse({
+        'success': True,
+        'upload_id': str(upload.upload_id),
+        'offset': upload.offset,
+        'size': upload.size,
+        'chunk_size': settings.UPLOAD_CHUNK_SIZE,
+    })
+
+
+@require_POST
+def upload_file(request, accession_id):
+    accession = get_draft_accession(request, accession_id)
+
+    request_files = request.FILES.getlist('file-file')
+    if len(request_files) != 1:
+        return JsonResponse({'error': 'Send exactly one file per request.'}, status=400)
+
+    bound_form = FileForm(request.POST, request.FILES, prefix='file')
+    if not bound_form.is_valid():
+        return JsonResponse({
+            'success': False,
+            'errorsFile': [{
+                'file_name': request_files[0].name,
+                'error': bound_form.errors
+            }]
+        })
+
+    uploaded_file = ingest_upload(request_files[0], accession, bound_form.cleaned_data['file_description'])
+    uploaded_file.save()
+
+    return JsonResponse({
+        'success': True,
+        'file_id': uploaded_file.id,
+        'file_name': uploaded_file.get_filename(),
+    })
+
+
+@require_POST
+def delete_file(request, accession_id, file_id):
+    accession = get_draft_accession(request, accession_id)
+    uploaded_file = get_object_or_404(File, accession=accession, pk=file_id)
+
+    uploaded_file.delete()
+    uploaded_file.file.delete(save=False)
+
+    return JsonResponse({'success': True})
+
+
+@require_http_methods(['GET', 'HEAD', 'PUT', 'PATCH'])
+def upload_chunk(request, accession_id, upload_id):
+    accession = get_draft_accession(request, accession_id)
+    upload = get_object_or_404(ChunkedUpload, accession=accession, upload_id=upload_id)
+
+    if request.method in ('GET', 'HEAD'):
+        return upload_status(upload)
+
+    match = CONTENT_RANGE_RE.match(request.headers.get('Content-Range', ''))
+    if match is None:
+        return JsonResponse({'error': 'A "Content-Range: bytes start-end/size" header is required.'}, status=400)
+
+    start, end, total = (int(group) for group in match.groups())
+    length = end - start + 1
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+
+    if total != upload.size or end >= total or start % chunk_size != 0 or \
+            length != min(chunk_size, total - start):
+        return JsonResponse({'error': 'Content-Range does not describe a chunk of this upload.'}, status=416)
+
+    if start > upload.offset:
+        # Chunks must arrive in order; tell the client where to resume
+        response = upload_status(upload)
+        response.status_code = 409
+        return response
+
+    with open(upload.partial_path, 'r+b') as partial:
+        partial.seek(start)
+        received = 0
+        while received < length:
+            data = request.read(min(READ_SIZE, length - received))
+            if not data:
+                break
+            partial.write(data)
+            received += len(data)
+
+    if received != length:
+        # Incomplete chunk, e.g. a dropped connection. The offset is not
+        # advanced, so the client resends this chunk.
+        return JsonResponse({'error': 'Chunk body is shorter than its Content-Range.'}, status=400)
+
+    # Only move the offset forward, in case an earlier chunk was resent
+    ChunkedUpload.objects.filter(pk=upload.pk, offset=start).update(offset=end + 1)
+    upload.refresh_from_db()
+
+    return upload_status(upload)
+
+
+@require_POST
+def finalize(request, accession_id):
+    accession = get_draft_accession(request, accession_id)
+    uploads = list(ChunkedUpload.objects.filter(accession=accession).order_by('id'))
+
+    incomplete = [upload for upload in uploads if not upload.is_complete]
+    if incomplete:
+        return JsonResponse({
+            'success': False,
+            'incomplete': [{
+                'upload_id': str(upload.upload_id),
+                'file_name': upload.filename,
+                'offset': upload.offset,
+                'size': upload.size,
+            } for upload in incomplete]
+        }, status=409)
+
+    if not uploads and not accession.file_set.exists():
+        return JsonResponse({'error': 'No files have been uploaded.'}, status=400)
+
+    assembled = [
+        AssembledUpload(file=open(upload.partial_path, 'rb'), name=upload.filename,
+                        content_type=upload.content_type, size=upload.size)
+        for upload in uploads
+    ]
+
+    try:
+        file_form_errors = []
+        for upload, assembled_file in zip(uploads, assembled):
+            bound_form = FileForm({'file-file_description': upload.file_description},
+                                  {'file-file': assembled_file}, prefix='file')
+            if not bound_form.is_valid():
+                file_form_errors.append({
+                    'file_name': upload.filename,
+                    'error': bound_form.errors
+                })
+
+        if file_form_errors:
+            return JsonResponse({
+                'success': False,
+                'context': request.session.get('accession'),
+                'errorsForm': {},
+                'errorsFile': file_form_errors
+            })
+
+        # The files and the status change are saved together or not at all. The
+        # partials are kept until then, so a failed finalize can be retried.
+        uploaded_files = []
+        try:
+            with transaction.atomic():
+                for upload, assembled_file in zip(uploads, assembled):
+                    uploaded_files.append(ingest_upload(assembled_file, accession, upload.file_description,
+                                                        keep_source=True))
+
+                save_files(uploaded_files)
+                for upload in uploads:
+                    upload.delete()
+                    transaction.on_commit(functools.partial(remove_partial, upload))
+                accession.accession_status = Accession.NEW
+                accession.save()
+                record_status_change(accession, Accession.DRAFT)
+        except BaseException:
+            discard_files(uploaded_files)
+            raise
+    finally:
+        for assembled_file in assembled:
+            assembled_file.close()
+
+    request.session['draft_accessions'] = [
+        draft_id for draft_id in request.session.get('draft_accessions', []) if draft_id != accession.id
+    ]
+
+    return JsonResponse(submission_success(request, accession))
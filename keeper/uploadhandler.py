@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, TemporaryFileUploadHandler
+
+from .fixity import hexdigests, new_hashers
+
+
+def upload_spool_dir():
+    # Spool inside private storage so finished uploads can be renamed into place
+    from .models import File
+    path = File._meta.get_field('file').storage.path('spool')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class SpooledUploadedFile(TemporaryUploadedFile):
+    """A TemporaryUploadedFile written to the spool directory in private storage.
+
+    ``checksums`` is filled in by SpoolingUploadHandler once the upload is complete.
+    """
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + ext, dir=upload_spool_dir())
+        super(TemporaryUploadedFile, self).__init__(file, name, content_type, size, charset, content_type_extra)
+        self.checksums = None
+
+
+class SpoolingUploadHandler(TemporaryFileUploadHandler):
+    """Spool uploads on the same filesystem as private storage, hashing them as they arrive.
+
+    Together with keeper.ingest this lets a finished upload be committed with a
+    rename instead of being read back and copied into storage.
+    """
+
+    def new_file(self, *args, **kwargs):
+        FileUploadHandler.new_file(self, *args, **kwargs)
+        self.file = SpooledUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.hashers = new_hashers()
+
+    def receive_data_chunk(self, raw_data, start):
+        for hasher in self.hashers.values():
+            hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.checksums = hexdigests(self.hashers)
+        return super().file_complete(file_size)
@@ -3,7 +3,8 @@ from django.contrib import admin
 from django.urls import re_path
 
 from keeper.views import intro, submit, index, stats
-from keeper.admin_views import zip_files
+from keeper.admin_views import bag_files, tar_files, thumbnail, zip_files
+from keeper.upload_views import create_draft, declare_file, upload_chunk, upload_file, delete_file, finalize
 
 app_name = 'keeper'
 
@@ -12,9 +13,18 @@ admin.site.enable_nav_sidebar = False
 
 urlpatterns = [
     re_path(r'^admin/([^/]+)/([^/]+)/([^/]+)_zip', zip_files, name='zip'),
+    re_path(r'^admin/([^/]+)/([^/]+)/([^/]+)_bag$', bag_files, name='bag'),
+    re_path(r'^admin/([^/]+)/([^/]+)/([^/]+)_tar(_zst)?$', tar_files, name='tar'),
     re_path(r'^admin/', admin.site.urls),
+    re_path(r'^thumbnails/(\d+)/$', thumbnail, name='thumbnail'),
     re_path(r'^intro/$', intro, name='intro'),
     re_path(r'^$', index, name='index'),
     re_path(r'^submit/$', submit, name='submit'),
     re_path(r'^stats/$', stats, name='stats'),
+    re_path(r'^upload/$', create_draft, name='upload_create'),
+    re_path(r'^upload/(\d+)/files/$', declare_file, name='upload_declare'),
+    re_path(r'^upload/(\d+)/files/([0-9a-f-]+)/$', upload_chunk, name='upload_chunk'),
+    re_path(r'^upload/(\d+)/file/$', upload_file, name='upload_file'),
+    re_path(r'^upload/(\d+)/file/(\d+)/delete/$', delete_file, name='upload_delete_file'),
+    re_path(r'^upload/(\d+)/finalize/$', finalize, name='upload_finalize'),
 ]
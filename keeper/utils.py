@@ -1,15 +1,13 @@
-import os
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
 
-from .models import Accession
 
-
-def generate_data_file(app, model, pk, path, filenames):
-    accession = Accession.objects.get(pk=pk)
+def generate_metadata(accession, filenames):
+    """The text of an accession's metadata.txt, listing the (name, description) of each file."""
     related_files = '\n'.join("{0}\n{1}".format(*f) for f in filenames)
 
     file_template = """Accession: {accession_id}
-Download date: {download_date}
 Date submitted: {date_submitted}
 
 Status: {accession_status}
@@ -32,22 +30,47 @@ Included files:
         "accession_id": accession.pk,
         "date_submitted": format_datetime(timezone.localtime(accession.date_submitted)),
         "date_last_updated": format_datetime(timezone.localtime(accession.date_last_updated)),
-        "download_date": format_datetime(timezone.localtime(timezone.now())),
         "description": accession.description,
         "donor_name": accession.full_name,
-        "affiliation": [item[1] for item in Accession.AFFILIATION_CHOICES if item[0] == accession.affiliation][0],
+        "affiliation": accession.get_affiliation_display(),
         "email_address": accession.email_address,
         "phone_number": accession.phone_number,
         "admin_notes": accession.admin_notes,
-        "accession_status": [item[1] for item in Accession.STATUS_CHOICES if item[0] == accession.accession_status][0],
+        "accession_status": accession.get_accession_status_display(),
         "related_files": related_files
     }
 
-    with open(os.path.join(path, 'metadata.txt'), 'w') as f:
-        f.write(file_template.format(**context))
-
-    return 'metadata.txt'
+    return file_template.format(**context)
 
 
 def format_datetime(dt):
     return dt.strftime('%Y-%m-%d %I:%M %p  %Z')
+
+
+async def iterate_in_thread(iterable, chunk_size=1024 * 1024):
+    """Yield chunks of at least chunk_size bytes from a blocking iterable, read in a worker thread."""
+    iterator = iter(iterable)
+
+    def read():
+        parts = []
+        size = 0
+        for part in iterator:
+            parts.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                break
+        return b''.join(parts)
+
+    while True:
+        data = await sync_to_async(read, thread_sensitive=False)()
+        if not data:
+            return
+        yield data
+
+
+def streaming_content(request, iterable):
+    # Under ASGI Django reads a blocking iterator into memory before sending any
+    # of it, so it is read a chunk at a time in a thread instead
+    if isinstance(request, ASGIRequest):
+        return iterate_in_thread(iterable)
+    return iterable
@@ -1,25 +1,41 @@
 import magic
 import fnmatch
 from django.conf import settings
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 
 from .constants import ACCEPTED_FILE_TYPES
 
 
-def validate_file_type(upload):
-    # Determine the size of the file
-    file_size = upload.size
+# Types libmagic reports for compound documents whose directory it could not
+# find in the header window. Word documents can keep it anywhere in the file.
+CONTAINER_FILE_TYPES = ('application/x-ole-storage', 'application/CDFV2')
+
 
-    if file_size <= 64 * 1024 * 1024:  # 64 MB
-        # File is not too large, read the whole file
-        chunk = upload.file.read()
-    else:
-        # File is too large, read only a chunk
-        chunk = upload.file.read(64 * 1024)
+def sniff_file_type(upload):
+    # Only read a header window rather than the whole upload, so validating
+    # a request never holds more than MIME_SNIFF_MAX_BYTES in memory
+    window = settings.MIME_SNIFF_BYTES
+    budget = settings.MIME_SNIFF_MAX_BYTES
+    if window > budget:
+        raise ImproperlyConfigured('MIME_SNIFF_BYTES must not be larger than MIME_SNIFF_MAX_BYTES.')
 
-    upload.file.seek(0)  # Reset file pointer back to beginning
+    chunk = upload.read(window)
     file_type = magic.from_buffer(chunk, mime=True)
 
+    if file_type in CONTAINER_FILE_TYPES and len(chunk) == window:
+        # Release the first window before reading the larger one
+        chunk = None
+        upload.seek(0)
+        chunk = upload.read(budget)
+        file_type = magic.from_buffer(chunk, mime=True)
+
+    upload.seek(0)  # Reset file pointer back to beginning
+    return file_type
+
+
+def validate_file_type(upload):
+    file_type = sniff_file_type(upload.file)
+
     def good_mimetype(mimetype_str, mimetype_dict):
         for allowed_mimetype in mimetype_dict:
             if fnmatch.fnmatch(mimetype_str, allowed_mimetype):
@@ -1,11 +1,13 @@
 import json
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.db import transaction
 from django.template.loader import render_to_string
-from django.views.decorators.http import require_POST
 
 from .forms import AccessionForm, FileForm
+from .ingest import discard_files, ingest_upload, save_files
 from .models import File, Accession, ACCEPTED_FILE_TYPES
 
 
@@ -13,9 +15,10 @@ def intro(request):
     return render(request, 'keeper/intro.html')
 
 
-def index(request):
-    if 'accession' in request.session:
-        accession_data = request.session.get('accession')
+async def index(request):
+    # Loading the session may query the database, depending on SESSION_ENGINE
+    accession_data = await sync_to_async(request.session.get)('accession')
+    if accession_data is not None:
         accession_form = AccessionForm(prefix='accession',
                                        initial={
                                            'first_name': accession_data.get('first_name', ''),
@@ -35,11 +38,19 @@ def index(request):
         'file_form': file_form
     }
 
-    return render(request, 'keeper/index.html', context)
+    return await sync_to_async(render)(request, 'keeper/index.html', context)
 
 
-@require_POST
-def submit(request):
+# Under ASGI the request body has already been received without holding a
+# thread by the time the view runs; only processing it happens in a thread
+async def submit(request):
+    # require_POST does not support async views before Django 5
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    return JsonResponse(await sync_to_async(save_submission)(request))
+
+
+def save_submission(request):
     accession_form = AccessionForm(request.POST, prefix='accession')
 
     # Django only validates the last item in request.FILES, so we must
@@ -65,40 +76,23 @@ def submit(request):
             file_is_valid = False
 
     if accession_form.is_valid() and file_is_valid:
-        accession = accession_form.save()
-
-        for key, request_file in enumerate(request.FILES.getlist('file-file')):
-
-            file_description = request.POST.getlist('file-file_description')[key]
-
-            uploaded_file = File(file=request_file,
-                                 accession=accession,
-                                 file_description=file_description,
-                                 content_type=request_file.content_type
-                                 )
-            uploaded_file.save()
-
-        # Attach form data to session for easy filling of subsequent forms
-        request.session['accession'] = {
-            'first_name': accession.first_name,
-            'last_name': accession.last_name,
-            'email_address': accession.email_address,
-            'phone_number': accession.phone_number,
-            'description': accession.description,
-            'affiliation': accession.affiliation,
-            'accession_id': accession.id
-        }
+        file_descriptions = request.POST.getlist('file-file_description')
+        uploaded_files = []
 
-        # Set session cookie expiration to browser close
-        request.session.set_expiry(0)
+        # The accession and all of its files are saved together or not at all
+        try:
+            with transaction.atomic():
+                accession = accession_form.save()
 
-        template = render_to_string('keeper/_results.html', context=None, request=request)
+                for key, request_file in enumerate(request.FILES.getlist('file-file')):
+                    uploaded_files.append(ingest_upload(request_file, accession, file_descriptions[key]))
 
-        payload = {
-            'success': True,
-            # 'context': request.session.get('accession'),
-            'template': template
-        }
+                save_files(uploaded_files)
+        except BaseException:
+            discard_files(uploaded_files)
+            raise
+
+        payload = submission_success(request, accession)
 
     else:
         payload = {
@@ -108,15 +102,39 @@ def submit(request):
             'errorsFile': file_form_errors
         }
 
-    return JsonResponse(payload)
+    return payload
+
+
+def submission_success(request, accession):
+    # Attach form data to session for easy filling of subsequent forms
+    request.session['accession'] = {
+        'first_name': accession.first_name,
+        'last_name': accession.last_name,
+        'email_address': accession.email_address,
+        'phone_number': accession.phone_number,
+        'description': accession.description,
+        'affiliation': accession.affiliation,
+        'accession_id': accession.id
+    }
+
+    # Set session cookie expiration to browser close
+    request.session.set_expiry(0)
+
+    template = render_to_string('keeper/_results.html', context=None, request=request)
+
+    return {
+        'success': True,
+        # 'context': request.session.get('accession'),
+        'template': template
+    }
 
 
-def stats(request):
-    accession_count = Accession.objects.count()
-    file_count = File.objects.count()
+async def stats(request):
+    accession_count = await Accession.objects.exclude(accession_status=Accession.DRAFT).acount()
+    file_count = await File.objects.acount()
 
     context = {
         'accession_count': accession_count,
         'file_count': file_count,
     }
-    return render(request, 'keeper/stats.html', context)
+    return await sync_to_async(render)(request, 'keeper/stats.html', context)
@@ -8,7 +8,7 @@ install_requires = [
     'python-magic',
     'Unipath',
     'wheel==0.41.0',
-    'zipstream',
+    'zstandard',
 ]
 
 setup(
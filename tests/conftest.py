@@ -10,3 +10,15 @@ def cleanup_after_tests():
 
     # Code below this line will be executed after all tests have run
     shutil.rmtree(settings.MEDIA_ROOT)
+
+
+@pytest.fixture
+def valid_accession_data():
+    return {
+        'accession-first_name': 'John',
+        'accession-last_name': 'Doe',
+        'accession-email_address': 'johndoe@example.com',
+        'accession-phone_number': '123456789',
+        'accession-description': 'Test description',
+        'accession-affiliation': 'STU',
+    }
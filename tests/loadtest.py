@@ -0,0 +1,170 @@
+"""
+Local load test for comparing the WSGI and ASGI deployments.
+
+Starts slow uploads to the submit view and slow zip downloads from the admin
+at increasing levels of concurrency. While they run it times requests to the
+stats page, which is what any other visitor would be waiting on. A level is
+sustained when every upload and download finishes and the stats page stays
+responsive.
+
+Run it against a server started with development settings, e.g.
+
+    uwsgi --http :8000 --module tests.wsgi:application --processes 4 --threads 2
+    uvicorn tests.asgi:application --port 8000 --workers 4
+
+then
+
+    python tests/loadtest.py --url http://127.0.0.1:8000 --accession 1 --sessionid <admin session cookie>
+
+Downloads are skipped without --sessionid.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from urllib.parse import urlsplit
+
+
+async def http_request(url, method='GET', headers=None, body=b'', body_rate=None, read_rate=None):
+    """Make one HTTP/1.1 request, optionally sending and reading the body slowly.
+
+    Returns (status, headers, bytes of body read).
+    """
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    lines = ['{} {} HTTP/1.1'.format(method, path), 'Host: {}'.format(parts.netloc), 'Connection: close',
+             'Content-Length: {}'.format(len(body))]
+    lines += ['{}: {}'.format(name, value) for name, value in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+
+    chunk_size = 64 * 1024
+    for start in range(0, len(body), chunk_size):
+        writer.write(body[start:start + chunk_size])
+        await writer.drain()
+        if body_rate:
+            await asyncio.sleep(chunk_size / body_rate)
+
+    status_line = await reader.readline()
+    status = int(status_line.split()[1]) if status_line else 0
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        response_headers.setdefault(name.strip().lower(), []).append(value.strip())
+
+    size = 0
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            break
+        size += len(data)
+        if read_rate:
+            await asyncio.sleep(len(data) / read_rate)
+    writer.close()
+    return status, response_headers, size
+
+
+async def csrf_token(base_url):
+    _, headers, _ = await http_request(base_url + '/')
+    for cookie in headers.get('set-cookie', []):
+        name, _, value = cookie.split(';')[0].partition('=')
+        if name == 'csrftoken':
+            return value
+    raise SystemExit('No csrftoken cookie from {}/'.format(base_url))
+
+
+def submission_body(boundary, size):
+    fields = {
+        'accession-first_name': 'Load',
+        'accession-last_name': 'Test',
+        'accession-email_address': 'loadtest@example.com',
+        'accession-phone_number': '5555555555',
+        'accession-description': 'Load test',
+        'accession-affiliation': 'STU',
+        'file-file_description': 'Load test file',
+    }
+    body = b''.join(
+        '--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n{}\r\n'.format(boundary, name, value).encode()
+        for name, value in fields.items())
+    body += ('--{}\r\nContent-Disposition: form-data; name="file-file"; filename="loadtest.txt"\r\n'
+             'Content-Type: text/plain\r\n\r\n'.format(boundary)).encode()
+    return body + b'a' * size + '\r\n--{}--\r\n'.format(boundary).encode()
+
+
+async def upload(options, token):
+    boundary = uuid.uuid4().hex
+    headers = {
+        'Content-Type': 'multipart/form-data; boundary={}'.format(boundary),
+        'Cookie': 'csrftoken={}'.format(token),
+        'X-CSRFToken': token,
+        'Referer': options.url + '/',
+    }
+    status, _, _ = await http_request(options.url + '/submit/', 'POST', headers,
+                                      submission_body(boundary, options.upload_size), body_rate=options.rate)
+    return status == 200
+
+
+async def download(options):
+    url = '{}/admin/keeper/accession/{}_zip'.format(options.url, options.accession)
+    headers = {'Cookie': 'sessionid={}'.format(options.sessionid)}
+    status, _, _ = await http_request(url, headers=headers, read_rate=options.rate)
+    return status == 200
+
+
+async def probe(options, stop, latencies):
+    while not stop.is_set():
+        start = time.monotonic()
+        try:
+            status, _, _ = await asyncio.wait_for(http_request(options.url + '/stats/'), options.timeout)
+        except asyncio.TimeoutError:
+            status = 0
+        latencies.append(time.monotonic() - start if status == 200 else options.timeout)
+        await asyncio.sleep(0.5)
+
+
+async def run_level(options, token, concurrency):
+    stop = asyncio.Event()
+    latencies = []
+    probe_task = asyncio.create_task(probe(options, stop, latencies))
+
+    requests = [upload(options, token) for _ in range(concurrency)]
+    if options.sessionid:
+        requests += [download(options) for _ in range(concurrency)]
+    results = await asyncio.gather(*requests, return_exceptions=True)
+
+    stop.set()
+    await probe_task
+    succeeded = sum(result is True for result in results)
+    return succeeded, len(results), statistics.median(latencies), max(latencies)
+
+
+async def main(options):
+    token = await csrf_token(options.url)
+    print('{:>11} {:>10} {:>13} {:>13}  {}'.format('concurrency', 'succeeded', 'stats median', 'stats max', ''))
+    for concurrency in options.levels:
+        succeeded, total, median, worst = await run_level(options, token, concurrency)
+        sustained = succeeded == total and worst < options.timeout
+        print('{:>11} {:>4}/{:<5} {:>12.3f}s {:>12.3f}s  {}'.format(
+            concurrency, succeeded, total, median, worst, 'sustained' if sustained else 'NOT sustained'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--levels', type=lambda value: [int(level) for level in value.split(',')],
+                        default=[4, 8, 16, 32, 64], help='Comma separated numbers of concurrent uploads and downloads.')
+    parser.add_argument('--upload-size', type=int, default=4 * 1024 * 1024, help='Bytes in each upload.')
+    parser.add_argument('--rate', type=int, default=1024 * 1024,
+                        help='Bytes per second each client sends or reads, to model slow connections.')
+    parser.add_argument('--accession', type=int, help='Accession to download as a zip.')
+    parser.add_argument('--sessionid', default=os.environ.get('KEEPER_SESSIONID'),
+                        help='Session cookie of a logged in admin, for downloads.')
+    parser.add_argument('--timeout', type=float, default=10,
+                        help='Seconds after which a stats request counts as failed.')
+    asyncio.run(main(parser.parse_args()))
@@ -11,6 +11,10 @@ MEDIA_URL = '/private-media/'
 # Settings for Django Private Storage
 PRIVATE_STORAGE_ROOT = MEDIA_ROOT
 PRIVATE_STORAGE_AUTH_FUNCTION = 'private_storage.permissions.allow_staff'
+# 'nginx' has Django only check permissions and leave sending the file to nginx
+# with X-Accel-Redirect, through the internal location in nginx/nginx.conf
+PRIVATE_STORAGE_SERVER = os.environ.get('PRIVATE_STORAGE_SERVER', 'django')
+PRIVATE_STORAGE_INTERNAL_URL = '/private-x-accel-redirect/'
 
 # Gets the site root (same level that project, apps, and templates lives on)
 SITE_ROOT = os.path.realpath(os.path.dirname(os.path.dirname(__file__)))
@@ -100,6 +104,43 @@ DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 # Upload settings
 MAX_UPLOAD_SIZE = 4 * 1024 * 1024 * 1024  # 4 GB
+# Large uploads are spooled inside PRIVATE_STORAGE_ROOT so they can be renamed into place
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'keeper.uploadhandler.SpoolingUploadHandler',
+]
+# Size of each chunk sent to the resumable upload endpoints
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+# Draft accessions with no uploads for this long are deleted by sweep_drafts
+DRAFT_ACCESSION_TTL = 24 * 60 * 60  # 1 day
+# Store identical uploads once, hard linking each File to a shared content-addressed blob
+DEDUPLICATE_UPLOADS = os.environ.get('DEDUPLICATE_UPLOADS', 'False') == 'True'
+# Bytes read from the start of each upload to detect its MIME type
+MIME_SNIFF_BYTES = 256 * 1024  # 256 KB
+# Most bytes ever read for type detection, used when a compound document
+# (e.g. Word) needs more than the header window. Matches libmagic's own limit.
+MIME_SNIFF_MAX_BYTES = 7 * 1024 * 1024  # 7 MB
+# Record an MD5 checksum for each upload alongside its SHA-256
+RECORD_MD5 = os.environ.get('RECORD_MD5', 'False') == 'True'
+
+# How accession zips compress each member: 'store' leaves every member as it is,
+# 'deflate' compresses all of them, and 'adaptive' only compresses members whose
+# type or first block suggests they will get smaller
+ZIP_COMPRESSION = os.environ.get('ZIP_COMPRESSION', 'adaptive')
+# zlib level from 1 (fastest) to 9 (smallest)
+ZIP_COMPRESSION_LEVEL = int(os.environ.get('ZIP_COMPRESSION_LEVEL', 6))
+# Threads deflating large zip members in blocks, shared by all downloads in a process.
+# Each .tar.zst download also compresses with up to this many zstd threads
+ZIP_COMPRESSION_THREADS = int(os.environ.get('ZIP_COMPRESSION_THREADS', os.cpu_count() or 1))
+# Zstandard level for .tar.zst downloads, from 1 (fastest) to 19 (smallest)
+TAR_ZSTD_LEVEL = int(os.environ.get('TAR_ZSTD_LEVEL', 3))
+# Most bytes of compressed accession zips kept in the archive cache, least recently used first out
+ARCHIVE_CACHE_MAX_SIZE = 20 * 1024 * 1024 * 1024  # 20 GB
+
+# Background jobs
+JOB_LEASE_SECONDS = 15 * 60  # A running job is given back to the queue if not finished in this time
+JOB_RETRY_DELAY = 30  # Seconds before the first retry, doubling for each later attempt
+JOB_RETRY_MAX_DELAY = 60 * 60
 
 # Settings for reCAPTCHA
 
@@ -4,6 +4,8 @@ DEBUG = False
 
 # Settings for Django Private Storage at same level as BASE_DIR
 MEDIA_ROOT = BASE_DIR.child('private-media')
+# Served behind nginx, which sends private files itself
+PRIVATE_STORAGE_SERVER = os.environ.get('PRIVATE_STORAGE_SERVER', 'nginx')
 
 # Settings for SSL
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
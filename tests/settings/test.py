@@ -12,3 +12,4 @@ PRIVATE_STORAGE_ROOT = BASE_DIR.child('private-media-test')
 
 # Override to save space and time in testing
 MAX_UPLOAD_SIZE = 4 * 1024 * 1024  # 4 MB
+UPLOAD_CHUNK_SIZE = 1024  # 1 KB
@@ -0,0 +1,81 @@
+"""
+Benchmark of the CPU cost of zip, tar and tar.zst archives of the same accession.
+
+Builds the mixed media corpus from tests.zipbench and writes it as a zip under
+each compression policy, as a tar and as a tar.zst, reporting CPU seconds per
+GB of files (summed over all threads, so parallel compression is not hidden)
+and archive size.
+
+    python -m tests.tarbench --size 200 --zstd-level 3 --threads 1,4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+
+from keeper.archives import StoredTar, StoredZip, StreamingZip, ZipMember, ZstdArchive, file_crc32, should_deflate
+from tests.zipbench import build_corpus
+
+
+def zip_archive(files, crc32s, policy, level, threads):
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    members = []
+    for (path, content_type), crc32 in zip(files, crc32s):
+        member = ZipMember(os.path.basename(path), date, path=path, crc32=crc32)
+        member.deflate = should_deflate(member, content_type, policy)
+        members.append(member)
+    return StreamingZip(members, level, threads) if any(member.deflate for member in members) else StoredZip(members)
+
+
+def tar_archive(files):
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return StoredTar([ZipMember(os.path.basename(path), date, path=path) for path, _ in files])
+
+
+def measure(build):
+    start = time.process_time()
+    size = sum(len(data) for data in build())
+    return time.process_time() - start, size
+
+
+def main(options):
+    settings.configure(USE_TZ=True, TIME_ZONE='America/Chicago')
+    django.setup()
+    with tempfile.TemporaryDirectory() as directory:
+        files = build_corpus(directory, options.size * 1024 * 1024)
+        total = sum(os.path.getsize(path) for path, _ in files)
+        # CRC-32s come from the database when serving, so they are not measured
+        crc32s = [file_crc32(path) for path, _ in files]
+        # Read the corpus once so every archive starts from the page cache
+        sum(len(data) for data in tar_archive(files))
+
+        print('{} files, {:.1f} MB, deflate level {}, zstd level {}\n'.format(
+            len(files), total / 1024 / 1024, options.level, options.zstd_level))
+        print('{:>14} {:>7} {:>12} {:>12} {:>7}'.format('archive', 'threads', 'CPU s/GB', 'archive MB', 'ratio'))
+        for threads in options.threads:
+            runs = [('zip store', lambda: zip_archive(files, crc32s, 'store', options.level, threads))]
+            runs += [('zip ' + policy, lambda policy=policy: zip_archive(files, crc32s, policy, options.level, threads))
+                     for policy in ('adaptive', 'deflate')]
+            runs += [
+                ('tar', lambda: tar_archive(files)),
+                ('tar.zst', lambda: ZstdArchive(tar_archive(files), options.zstd_level, threads)),
+            ]
+            for name, build in runs:
+                cpu, size = measure(build)
+                print('{:>14} {:>7} {:>12.3f} {:>12.1f} {:>7.3f}'.format(
+                    name, threads, cpu / (total / 1024 ** 3), size / 1024 / 1024, size / total))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--size', type=int, default=200, help='MB of files in the corpus.')
+    parser.add_argument('--level', type=int, default=6, help='zlib compression level for deflated zip members.')
+    parser.add_argument('--zstd-level', type=int, default=3, help='Zstandard level for the tar.zst.')
+    parser.add_argument('--threads', type=lambda value: [int(threads) for threads in value.split(',')],
+                        default=[1], help='Comma separated numbers of compression threads to try.')
+    main(parser.parse_args())
@@ -1,8 +1,10 @@
 import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 
-from keeper.models import Accession
-from .factories import AccessionFactory
+from keeper.admin import AccessionAdmin
+from keeper.models import Accession, File
+from .factories import AccessionFactory, FileFactory
 
 
 @pytest.fixture
@@ -110,3 +112,42 @@ class TestAccessionAdmin:
         assert response.status_code == 200
         assert response.context['site_title'] == 'Keeper by UNT Libraries'
         assert response.context['site_header'] == 'Keeper administration'
+
+    def test_file_count_and_size(self, admin_client):
+        accession = AccessionFactory()
+        FileFactory(accession=accession, file=SimpleUploadedFile("a.txt", b"a" * 1000))
+        FileFactory(accession=accession, file=SimpleUploadedFile("b.txt", b"b" * 2000))
+        empty = AccessionFactory()
+
+        response = admin_client.get(reverse('admin:keeper_accession_changelist'))
+        rows = {row.pk: row for row in response.context['cl'].result_list}
+        assert (rows[accession.pk].file_count, rows[accession.pk].total_size) == (2, 3000)
+        assert (rows[empty.pk].file_count, rows[empty.pk].total_size) == (0, None)
+        assert b'2.9\xc2\xa0KB' in response.content
+
+    def test_sort_by_file_count_and_size(self, admin_client):
+        small, large = AccessionFactory.create_batch(2)
+        FileFactory(accession=small, file=SimpleUploadedFile("a.txt", b"a" * 10))
+        FileFactory(accession=large, file=SimpleUploadedFile("b.txt", b"b" * 100))
+        FileFactory(accession=large, file=SimpleUploadedFile("c.txt", b"c" * 100))
+        url = reverse('admin:keeper_accession_changelist')
+
+        # The columns after id, date_submitted, full_name and accession_status
+        for column in ('5', '6'):
+            response = admin_client.get(url, {'o': column})
+            assert list(response.context['cl'].result_list) == [small, large]
+            response = admin_client.get(url, {'o': '-' + column})
+            assert list(response.context['cl'].result_list) == [large, small]
+
+    def test_changelist_queries_do_not_grow_with_rows(self, admin_client, django_assert_num_queries, monkeypatch):
+        monkeypatch.setattr(AccessionAdmin, 'list_per_page', 500)
+        accessions = Accession.objects.bulk_create(AccessionFactory.build(id=None) for _ in range(500))
+        File.objects.bulk_create(File(accession=accession, file='uploads/{}/file.txt'.format(accession.pk), size=100)
+                                 for accession in accessions for _ in range(2))
+        url = reverse('admin:keeper_accession_changelist')
+
+        # The user, the count and the page of rows with their files counted and summed
+        with django_assert_num_queries(3):
+            response = admin_client.get(url)
+        assert len(response.context['cl'].result_list) == 500
+        assert all(row.file_count == 2 and row.total_size == 200 for row in response.context['cl'].result_list)
@@ -1,12 +1,21 @@
+import os
+
 import pytest
+from asgiref.sync import async_to_sync
 from django.contrib.auth.models import User
 from django.test import RequestFactory
 
+from keeper import archives
 from keeper.admin_views import zip_files
+from keeper.archives import file_crc32
+from keeper.exports import accession_zip
+from keeper.models import Accession, File
 from .factories import AccessionFactory, FileFactory
 from django.core.files.uploadedfile import SimpleUploadedFile
-from zipfile import ZipFile
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
 from io import BytesIO
+import tarfile
+import zstandard
 
 
 @pytest.fixture
@@ -14,6 +23,12 @@ def accession():
     return AccessionFactory()
 
 
+def record_crc32s():
+    # Ingest records every file's CRC-32, which factory made files lack
+    for uploaded_file in File.objects.all():
+        File.objects.filter(pk=uploaded_file.pk).update(crc32='{:08x}'.format(file_crc32(uploaded_file.file.path)))
+
+
 @pytest.mark.django_db(transaction=True)
 def test_zip_files(accession):
     # Create a user
@@ -28,7 +43,7 @@ def test_zip_files(accession):
     request.user = user
 
     # Call the zip_files view
-    response = zip_files(request, 'keeper', 'accession', str(accession.pk))
+    response = async_to_sync(zip_files)(request, 'keeper', 'accession', str(accession.pk))
 
     # Check that the response contains a valid ZIP file
     assert response.status_code == 200
@@ -108,3 +123,202 @@ def test_zip_files_metadata_contents(admin_client):
     assert file1.get_filename() in metadata
     assert file2.get_filename() in metadata
 
+
+
+@pytest.mark.django_db(transaction=True)
+class TestZipRanges:
+    @pytest.fixture(autouse=True)
+    def store(self, settings):
+        settings.ZIP_COMPRESSION = 'store'
+
+    @pytest.fixture
+    def url(self):
+        accession = AccessionFactory()
+        FileFactory(accession=accession, file=SimpleUploadedFile("file1.txt", b"a" * 1000))
+        FileFactory(accession=accession, file=SimpleUploadedFile("file2.txt", b"b" * 1000))
+        record_crc32s()
+        return f'/admin/keeper/accession/{accession.pk}_zip'
+
+    @pytest.fixture
+    def full(self, admin_client, url):
+        response = admin_client.get(url)
+        return response, b"".join(response.streaming_content)
+
+    def test_full_download(self, full):
+        response, content = full
+        assert response.status_code == 200
+        assert int(response['Content-Length']) == len(content)
+        assert response['Accept-Ranges'] == 'bytes'
+        assert response['ETag']
+
+    def test_download_is_repeatable(self, admin_client, url, full):
+        response, content = full
+        again = admin_client.get(url)
+        assert again['ETag'] == response['ETag']
+        assert b"".join(again.streaming_content) == content
+
+    @pytest.mark.parametrize('header,start,end', [
+        ('bytes=0-99', 0, 100),
+        ('bytes=500-', 500, None),
+        ('bytes=-200', -200, None),
+        ('bytes=1500-999999', 1500, None),
+    ])
+    def test_range(self, admin_client, url, full, header, start, end):
+        content = full[1]
+        response = admin_client.get(url, HTTP_RANGE=header)
+        expected = content[start:end]
+
+        assert response.status_code == 206
+        assert b"".join(response.streaming_content) == expected
+        assert int(response['Content-Length']) == len(expected)
+        first = start % len(content)
+        assert response['Content-Range'] == 'bytes {}-{}/{}'.format(first, first + len(expected) - 1, len(content))
+
+    def test_unsatisfiable_range(self, admin_client, url, full):
+        content = full[1]
+        response = admin_client.get(url, HTTP_RANGE='bytes={}-'.format(len(content)))
+        assert response.status_code == 416
+        assert response['Content-Range'] == 'bytes */{}'.format(len(content))
+
+    def test_if_range(self, admin_client, url, full):
+        response, content = full
+        matching = admin_client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=response['ETag'])
+        assert matching.status_code == 206
+
+        stale = admin_client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        assert stale.status_code == 200
+        assert b"".join(stale.streaming_content) == content
+
+    def test_missing_crc32_is_worked_out_while_streaming(self, admin_client, url, full, monkeypatch):
+        # Reading every file before sending anything would hold up the download
+        monkeypatch.setattr(archives, 'file_crc32', lambda path: pytest.fail('read a file for its CRC-32'))
+        File.objects.update(crc32='')
+        response = admin_client.get(url)
+        assert 'Content-Length' not in response
+
+        zip_file = ZipFile(BytesIO(b"".join(response.streaming_content)))
+        assert zip_file.testzip() is None
+        expected = ZipFile(BytesIO(full[1]))
+        assert [(info.filename, info.CRC) for info in zip_file.infolist()] == [
+            (info.filename, info.CRC) for info in expected.infolist()]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestZipCompression:
+    @pytest.fixture
+    def accession(self):
+        accession = AccessionFactory()
+        FileFactory(accession=accession, file=SimpleUploadedFile("photo.jpg", os.urandom(1000)),
+                    content_type='image/jpeg')
+        FileFactory(accession=accession, file=SimpleUploadedFile("notes.txt", b"notes " * 1000),
+                    content_type='text/plain')
+        return accession
+
+    def download(self, admin_client, accession):
+        response = admin_client.get(f'/admin/keeper/accession/{accession.pk}_zip')
+        assert response.status_code == 200
+        zip_file = ZipFile(BytesIO(b"".join(response.streaming_content)))
+        assert zip_file.testzip() is None
+        return response, {info.filename.split('/')[-1]: info for info in zip_file.infolist()}
+
+    def test_adaptive(self, admin_client, accession, settings):
+        settings.ZIP_COMPRESSION = 'adaptive'
+        response, members = self.download(admin_client, accession)
+
+        assert members['photo.jpg'].compress_type == ZIP_STORED
+        assert members['notes.txt'].compress_type == ZIP_DEFLATED
+        assert members['notes.txt'].compress_size < 100
+        # The compressed size of the archive is not known up front
+        assert not response.has_header('Content-Length')
+
+    def test_adaptive_stores_only_media(self, admin_client, settings):
+        settings.ZIP_COMPRESSION = 'adaptive'
+        accession = AccessionFactory()
+        FileFactory(accession=accession, file=SimpleUploadedFile("photo.jpg", b"x" * 1000),
+                    content_type='image/jpeg')
+        record_crc32s()
+        response, members = self.download(admin_client, accession)
+
+        assert members['photo.jpg'].compress_type == ZIP_STORED
+        assert response.has_header('Content-Length')
+
+    def test_deflate(self, admin_client, accession, settings):
+        settings.ZIP_COMPRESSION = 'deflate'
+        _, members = self.download(admin_client, accession)
+        assert members['photo.jpg'].compress_type == ZIP_DEFLATED
+        assert members['notes.txt'].compress_type == ZIP_DEFLATED
+
+    def test_store(self, admin_client, accession, settings):
+        settings.ZIP_COMPRESSION = 'store'
+        _, members = self.download(admin_client, accession)
+        assert members['photo.jpg'].compress_type == ZIP_STORED
+        assert members['notes.txt'].compress_type == ZIP_STORED
+
+
+@pytest.mark.django_db(transaction=True)
+class TestTarFiles:
+    @pytest.fixture
+    def accession(self):
+        accession = AccessionFactory(accession_status=Accession.ACCEPTED)
+        FileFactory(accession=accession, file=SimpleUploadedFile("photo.jpg", os.urandom(1000)),
+                    content_type='image/jpeg')
+        FileFactory(accession=accession, file=SimpleUploadedFile("notes.txt", b"notes " * 1000),
+                    content_type='text/plain')
+        return accession
+
+    def names(self, accession):
+        return {f"{accession.pk}/{f.get_filename()}" for f in accession.file_set.all()} | {"metadata.txt"}
+
+    def test_tar(self, admin_client, accession):
+        response = admin_client.get(f'/admin/keeper/accession/{accession.pk}_tar')
+        content = b"".join(response.streaming_content)
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/x-tar'
+        assert response['Content-Disposition'] == f'attachment; filename={accession.pk}.tar'
+        assert int(response['Content-Length']) == len(content)
+        tar_file = tarfile.open(fileobj=BytesIO(content))
+        assert set(tar_file.getnames()) == self.names(accession)
+        assert tar_file.extractfile('metadata.txt').read().startswith(f'Accession: {accession.pk}'.encode())
+
+        partial = admin_client.get(f'/admin/keeper/accession/{accession.pk}_tar', HTTP_RANGE='bytes=100-',
+                                   HTTP_IF_RANGE=response['ETag'])
+        assert partial.status_code == 206
+        assert b"".join(partial.streaming_content) == content[100:]
+
+    def test_tar_zst(self, admin_client, accession):
+        response = admin_client.get(f'/admin/keeper/accession/{accession.pk}_tar_zst')
+        content = b"".join(response.streaming_content)
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/zstd'
+        assert response['Content-Disposition'] == f'attachment; filename={accession.pk}.tar.zst'
+        assert not response.has_header('Content-Length')
+        tar_file = tarfile.open(fileobj=zstandard.ZstdDecompressor().stream_reader(BytesIO(content)), mode='r|')
+        assert {member.name for member in tar_file} == self.names(accession)
+
+    def test_tar_no_files(self, admin_client):
+        accession = AccessionFactory(accession_status=Accession.ACCEPTED)
+        assert admin_client.get(f'/admin/keeper/accession/{accession.pk}_tar').status_code == 404
+
+    def test_tar_without_login(self, client, accession):
+        response = client.get(f'/admin/keeper/accession/{accession.pk}_tar')
+        assert response.status_code == 302
+
+
+@pytest.mark.django_db(transaction=True)
+def test_zip_metadata_is_built_in_memory(admin_client, django_assert_num_queries, settings):
+    settings.ZIP_COMPRESSION = 'store'
+    accession = AccessionFactory()
+    FileFactory(accession=accession, file=SimpleUploadedFile("file1.txt", b"content"))
+    # A donor's own upload called metadata.txt is not overwritten
+    donor_metadata = FileFactory(accession=accession, file=SimpleUploadedFile("metadata.txt", b"donor's"))
+
+    record_crc32s()
+    with django_assert_num_queries(1):
+        archive = accession_zip('keeper', 'accession', str(accession.pk))
+
+    assert donor_metadata.file.read() == b"donor's"
+    zip_file = ZipFile(BytesIO(b"".join(archive.iter_range())))
+    assert zip_file.read('metadata.txt').startswith('Accession: {}'.format(accession.pk).encode())
+    assert zip_file.read('{}/{}'.format(accession.pk, donor_metadata.get_filename())) == b"donor's"
@@ -0,0 +1,128 @@
+import os
+from io import BytesIO, StringIO
+from zipfile import ZipFile
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from keeper import archive_cache
+from keeper.archive_cache import CacheWriter, prune_cache
+from keeper.exports import accession_zip
+from keeper.models import Accession
+from .factories import AccessionFactory, FileFactory
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch, settings):
+    settings.ZIP_COMPRESSION = 'adaptive'
+    monkeypatch.setattr(archive_cache, 'cache_dir', lambda: str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def accession():
+    accession = AccessionFactory(accession_status=Accession.ACCEPTED)
+    FileFactory(accession=accession, file=SimpleUploadedFile("notes.txt", b"notes " * 1000),
+                content_type='text/plain')
+    return accession
+
+
+def download(admin_client, accession, **headers):
+    response = admin_client.get(f'/admin/keeper/accession/{accession.pk}_zip', **headers)
+    return response, b"".join(response.streaming_content)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestArchiveCache:
+    def test_second_download_is_cached(self, admin_client, accession, cache_dir):
+        first, first_content = download(admin_client, accession)
+        assert not first.has_header('Content-Length')
+        assert len(list(cache_dir.glob('*.zip'))) == 1
+
+        second, second_content = download(admin_client, accession)
+        assert second_content == first_content
+        assert int(second['Content-Length']) == len(first_content)
+        assert second['ETag']
+        assert ZipFile(BytesIO(second_content)).testzip() is None
+
+        partial, partial_content = download(admin_client, accession, HTTP_RANGE='bytes=10-19')
+        assert partial.status_code == 206
+        assert partial_content == first_content[10:20]
+
+    def test_editing_the_accession_invalidates(self, admin_client, accession, cache_dir):
+        download(admin_client, accession)
+        accession.description = 'A new description'
+        accession.save()
+        assert not list(cache_dir.glob('*.zip'))
+
+        response, content = download(admin_client, accession)
+        assert not response.has_header('Content-Length')
+        assert b'A new description' in content
+
+    def test_adding_a_file_invalidates(self, admin_client, accession, cache_dir):
+        download(admin_client, accession)
+        FileFactory(accession=accession, file=SimpleUploadedFile("more.txt", b"more " * 1000),
+                    content_type='text/plain')
+
+        response, content = download(admin_client, accession)
+        assert not response.has_header('Content-Length')
+        assert 'more.txt' in ' '.join(ZipFile(BytesIO(content)).namelist())
+        assert len(list(cache_dir.glob('*.zip'))) == 1
+
+    def test_stale_fingerprint_is_not_served(self, accession, settings):
+        # Changes made without signals, e.g. bulk updates, still give a new fingerprint
+        b"".join(accession_zip('keeper', 'accession', str(accession.pk)))
+        Accession.objects.filter(pk=accession.pk).update(admin_notes='Updated in bulk')
+        assert isinstance(accession_zip('keeper', 'accession', str(accession.pk)), CacheWriter)
+
+    def test_stored_archives_are_not_cached(self, admin_client, accession, cache_dir, settings):
+        settings.ZIP_COMPRESSION = 'store'
+        download(admin_client, accession)
+        assert not list(cache_dir.glob('*.zip'))
+
+    def test_interrupted_download_is_not_cached(self, accession, cache_dir):
+        archive = iter(accession_zip('keeper', 'accession', str(accession.pk)))
+        next(archive)
+        archive.close()
+        assert not list(cache_dir.iterdir())
+
+
+def test_cached_archive_outlives_pruning(cache_dir, monkeypatch):
+    monkeypatch.setattr(archive_cache, 'ARCHIVE_READ_SIZE', 100)
+    path = cache_dir / '1-fingerprint.zip'
+    path.write_bytes(bytes(range(250)))
+    archive = archive_cache.cached_archive(1, 'fingerprint')
+
+    chunks = archive.iter_range(50)
+    first = next(chunks)
+    prune_cache(max_size=0)
+    assert not path.exists()
+    assert first + b''.join(chunks) == bytes(range(50, 250))
+
+
+def test_prune_cache(cache_dir):
+    for number in range(4):
+        path = cache_dir / '{}-fingerprint.zip'.format(number)
+        path.write_bytes(b'x' * 100)
+        os.utime(path, ns=(number * 10 ** 9, number * 10 ** 9))
+    # A recent download makes the oldest archive the most recently used
+    os.utime(cache_dir / '0-fingerprint.zip')
+
+    assert prune_cache(max_size=250) == 2
+    assert sorted(path.name for path in cache_dir.iterdir()) == ['0-fingerprint.zip', '3-fingerprint.zip']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_warm_archive_cache_command(accession, cache_dir):
+    new = AccessionFactory(accession_status=Accession.NEW)
+    FileFactory(accession=new, file=SimpleUploadedFile("new.txt", b"new " * 1000), content_type='text/plain')
+
+    out = StringIO()
+    call_command('warm_archive_cache', stdout=out)
+    assert 'Cached 1 archives' in out.getvalue()
+    assert [path.name.split('-')[0] for path in cache_dir.glob('*.zip')] == [str(accession.pk)]
+
+    out = StringIO()
+    call_command('warm_archive_cache', stdout=out)
+    assert 'Cached 0 archives (0 bytes), 1 already cached' in out.getvalue()
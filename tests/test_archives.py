@@ -0,0 +1,194 @@
+import os
+import tarfile
+import zlib
+from datetime import datetime, timezone
+from io import BytesIO
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import pytest
+import zstandard
+
+from keeper import archives
+from keeper.archives import (StoredTar, StoredZip, StreamingZip, ZipMember, ZstdArchive, is_compressible,
+                             read_range, should_deflate)
+
+
+DATE = datetime(2024, 5, 6, 7, 8, 10, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def members(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(b'\xff\xd8' + b'x' * 5000)
+    return [
+        ZipMember('1/photo.jpg', DATE, path=str(path)),
+        ZipMember('1/notes é.txt', DATE, data=b'Some notes'),
+        ZipMember('metadata.txt', DATE, data=b'Accession: 1\n'),
+    ]
+
+
+def read_archive(archive):
+    data = b''.join(archive.iter_range())
+    assert len(data) == archive.size
+    return data
+
+
+def test_stored_zip_is_readable(members):
+    data = read_archive(StoredZip(members))
+
+    zip_file = ZipFile(BytesIO(data))
+    assert zip_file.testzip() is None
+    assert zip_file.namelist() == ['1/photo.jpg', '1/notes é.txt', 'metadata.txt']
+    assert zip_file.read('1/notes é.txt') == b'Some notes'
+    assert zip_file.read('1/photo.jpg') == b'\xff\xd8' + b'x' * 5000
+    assert zip_file.getinfo('metadata.txt').compress_type == 0
+
+
+def test_stored_zip_is_deterministic(members, tmp_path):
+    first = StoredZip(members)
+    second = StoredZip(members)
+    assert read_archive(first) == read_archive(second)
+    assert first.etag == second.etag
+
+    (tmp_path / 'photo.jpg').write_bytes(b'\xff\xd8' + b'y' * 5001)
+    changed = StoredZip([ZipMember('1/photo.jpg', DATE, path=str(tmp_path / 'photo.jpg'))] + members[1:])
+    assert changed.etag != first.etag
+
+
+def test_stored_zip_uses_given_crc32(members):
+    member = ZipMember('given.txt', DATE, data=b'data', crc32=zlib.crc32(b'data'))
+    assert ZipFile(BytesIO(read_archive(StoredZip([member])))).read('given.txt') == b'data'
+
+
+@pytest.mark.parametrize('start,end', [(0, 0), (10, 100), (40, 5100), (5100, None), (0, None)])
+def test_iter_range(members, start, end):
+    archive = StoredZip(members)
+    data = read_archive(archive)
+    expected = data[start:] if end is None else data[start:end + 1]
+    assert b''.join(archive.iter_range(start, end)) == expected
+
+
+def test_zip64(members, monkeypatch):
+    # Lower the limits so every size, offset and count needs zip64 records
+    monkeypatch.setattr(archives, 'ZIP64_LIMIT', 100)
+    monkeypatch.setattr(archives, 'ZIP64_COUNT_LIMIT', 2)
+    data = read_archive(StoredZip(members))
+
+    assert b'PK\x06\x06' in data
+    zip_file = ZipFile(BytesIO(data))
+    assert zip_file.testzip() is None
+    assert zip_file.read('1/photo.jpg') == b'\xff\xd8' + b'x' * 5000
+    assert zip_file.read('metadata.txt') == b'Accession: 1\n'
+
+
+def test_streaming_zip(members, monkeypatch):
+    members[0].deflate = True
+    members[2].deflate = True
+    data = b''.join(StreamingZip(members, level=9))
+
+    zip_file = ZipFile(BytesIO(data))
+    assert zip_file.testzip() is None
+    assert [info.compress_type for info in zip_file.infolist()] == [ZIP_DEFLATED, ZIP_STORED, ZIP_DEFLATED]
+    assert zip_file.getinfo('1/photo.jpg').compress_size < 100
+    assert zip_file.read('1/photo.jpg') == b'\xff\xd8' + b'x' * 5000
+    assert zip_file.read('1/notes é.txt') == b'Some notes'
+
+    monkeypatch.setattr(archives, 'ZIP64_LIMIT', 100)
+    zip_file = ZipFile(BytesIO(b''.join(StreamingZip(members))))
+    assert zip_file.testzip() is None
+    assert zip_file.read('1/photo.jpg') == b'\xff\xd8' + b'x' * 5000
+
+
+@pytest.mark.parametrize('deflate', [False, True])
+@pytest.mark.parametrize('threads', [1, 2])
+def test_streaming_zip_checksums_as_it_reads(members, monkeypatch, deflate, threads):
+    monkeypatch.setattr(archives, 'COMPRESSION_BLOCK_SIZE', 1000)
+    monkeypatch.setattr(archives, 'file_crc32', lambda path: pytest.fail('read a file for its CRC-32'))
+    members[0].deflate = deflate
+    assert not members[0].crc32_known
+
+    for zip64_limit in (archives.ZIP64_LIMIT, 100):
+        monkeypatch.setattr(archives, 'ZIP64_LIMIT', zip64_limit)
+        zip_file = ZipFile(BytesIO(b''.join(StreamingZip(members, threads=threads))))
+        assert zip_file.testzip() is None
+        assert zip_file.read('1/photo.jpg') == b'\xff\xd8' + b'x' * 5000
+        assert members[0].crc32 == zlib.crc32(b'\xff\xd8' + b'x' * 5000)
+
+
+def test_stored_tar_is_readable(members):
+    archive = StoredTar(members)
+    data = read_archive(archive)
+    assert len(data) % tarfile.RECORDSIZE == 0
+
+    tar_file = tarfile.open(fileobj=BytesIO(data))
+    assert tar_file.getnames() == ['1/photo.jpg', '1/notes é.txt', 'metadata.txt']
+    assert tar_file.extractfile('1/photo.jpg').read() == b'\xff\xd8' + b'x' * 5000
+    assert tar_file.extractfile('1/notes é.txt').read() == b'Some notes'
+    assert tar_file.getmember('metadata.txt').mtime == DATE.timestamp()
+
+    assert b''.join(archive.iter_range(600, 5599)) == data[600:5600]
+    assert StoredTar(members).etag == archive.etag
+
+
+def test_stored_tar_etag_follows_data_members(members):
+    changed = members[:-1] + [ZipMember('metadata.txt', DATE, data=members[-1].data.upper())]
+    assert len(changed[-1].data) == len(members[-1].data)
+    assert StoredTar(changed).etag != StoredTar(members).etag
+
+
+def test_stored_tar_reads_no_crc32(members, monkeypatch):
+    monkeypatch.setattr(archives, 'file_crc32', lambda path: pytest.fail('read a CRC-32'))
+    read_archive(StoredTar(members))
+
+
+def test_zstd_archive(members):
+    archive = ZstdArchive(StoredTar(members), level=3)
+    assert archive.size is None
+    data = zstandard.ZstdDecompressor().stream_reader(BytesIO(b''.join(archive))).read()
+
+    assert data == read_archive(StoredTar(members))
+
+
+def test_read_range_is_aligned(tmp_path, monkeypatch):
+    monkeypatch.setattr(archives, 'ARCHIVE_READ_SIZE', 100)
+    path = tmp_path / 'file'
+    path.write_bytes(bytes(range(256)) * 2)
+
+    chunks = list(read_range(str(path), 30, 400))
+    assert [len(chunk) for chunk in chunks] == [70, 100, 100, 100, 30]
+    assert b''.join(chunks) == path.read_bytes()[30:430]
+
+
+def test_should_deflate():
+    random = ZipMember('random.bin', DATE, data=os.urandom(10000))
+    text = ZipMember('text.bin', DATE, data=b'text ' * 2000)
+
+    assert not should_deflate(text, 'text/plain', 'store')
+    assert should_deflate(random, 'image/jpeg', 'deflate')
+    # The type decides when it is known to compress or not
+    assert not should_deflate(text, 'image/jpeg', 'adaptive')
+    assert not should_deflate(text, 'video/mp4', 'adaptive')
+    assert should_deflate(random, 'text/html', 'adaptive')
+    # Otherwise the start of the member is tried
+    assert should_deflate(text, 'application/pdf', 'adaptive')
+    assert not should_deflate(random, 'application/pdf', 'adaptive')
+
+
+def test_is_compressible(tmp_path):
+    path = tmp_path / 'empty'
+    path.write_bytes(b'')
+    assert not is_compressible(ZipMember('empty', DATE, path=str(path)))
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+def test_streaming_zip_parallel_deflate(tmp_path, monkeypatch, threads):
+    monkeypatch.setattr(archives, 'COMPRESSION_BLOCK_SIZE', 1000)
+    content = b''.join(b'line %d of a long text file\n' % number for number in range(2000)) + os.urandom(3000)
+    path = tmp_path / 'long.txt'
+    path.write_bytes(content)
+    member = ZipMember('long.txt', DATE, path=str(path), deflate=True)
+
+    zip_file = ZipFile(BytesIO(b''.join(StreamingZip([member], threads=threads))))
+    assert zip_file.testzip() is None
+    assert zip_file.read('long.txt') == content
+    assert zip_file.getinfo('long.txt').compress_size < len(content) / 2
@@ -0,0 +1,95 @@
+from io import BytesIO
+from zipfile import ZipFile
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient
+from django.urls import reverse
+
+from keeper.models import Accession, File
+from keeper.utils import iterate_in_thread
+from .factories import AccessionFactory, FileFactory
+
+
+@pytest.fixture
+def async_client():
+    return AsyncClient()
+
+
+def request(method, *args, **kwargs):
+    async def send():
+        return await method(*args, **kwargs)
+    return async_to_sync(send)()
+
+
+async def read_streaming_content(response):
+    return b''.join([part async for part in response.streaming_content])
+
+
+def test_asgi_application():
+    from tests.asgi import application
+    assert callable(application)
+
+
+def test_iterate_in_thread_joins_small_parts():
+    async def read_all():
+        return [chunk async for chunk in iterate_in_thread([b'a'] * 5 + [b'', b'bcd'], chunk_size=3)]
+
+    assert async_to_sync(read_all)() == [b'aaa', b'aabcd']
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncViews:
+    def test_index(self, async_client):
+        response = request(async_client.get, reverse('keeper:index'))
+        assert response.status_code == 200
+
+    def test_stats(self, async_client):
+        AccessionFactory(accession_status=Accession.NEW)
+        AccessionFactory(accession_status=Accession.DRAFT)
+
+        response = request(async_client.get, reverse('keeper:stats'))
+
+        assert response.status_code == 200
+        assert response.context['accession_count'] == 1
+
+    def test_submit(self, async_client):
+        post_data = {
+            'accession-first_name': 'John',
+            'accession-last_name': 'Doe',
+            'accession-email_address': 'johndoe@example.com',
+            'accession-phone_number': '123456789',
+            'accession-description': 'Test description',
+            'accession-affiliation': 'STU',
+            'file-file': SimpleUploadedFile("file1.txt", b"Some file content", content_type="text/plain"),
+            'file-file_description': 'Test file description',
+        }
+
+        response = request(async_client.post, reverse('keeper:submit'), data=post_data)
+
+        assert response.json()['success'] is True
+        assert File.objects.get().file.read() == b"Some file content"
+
+    def test_submit_requires_post(self, async_client):
+        response = request(async_client.get, reverse('keeper:submit'))
+        assert response.status_code == 405
+
+    def test_zip_files(self, async_client, admin_user):
+        accession = AccessionFactory()
+        uploaded_file = FileFactory(accession=accession, file=SimpleUploadedFile("file1.txt", b"Some file content"))
+        async_client.force_login(admin_user)
+
+        response = request(async_client.get, reverse('keeper:zip', args=['keeper', 'accession', accession.pk]))
+
+        assert response.status_code == 200
+        assert response.is_async
+        zip_file = ZipFile(BytesIO(async_to_sync(read_streaming_content)(response)))
+        assert zip_file.read('{}/{}'.format(accession.pk, uploaded_file.get_filename())) == b"Some file content"
+
+    def test_zip_files_requires_login(self, async_client):
+        accession = AccessionFactory()
+
+        response = request(async_client.get, reverse('keeper:zip', args=['keeper', 'accession', accession.pk]))
+
+        assert response.status_code == 302
@@ -0,0 +1,127 @@
+import hashlib
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from zipfile import ZipFile
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from keeper import bagit, exports
+from keeper.bagit import bag_zip, encode_path, tag_file
+from keeper.models import Accession, File
+from .factories import AccessionFactory, FileFactory
+
+
+@pytest.fixture
+def accession():
+    accession = AccessionFactory(accession_status=Accession.ACCEPTED, description='First line\nSecond line')
+    for name in ('letter.txt', 'photo.jpg', 'scan.pdf'):
+        FileFactory(accession=accession, file=SimpleUploadedFile(name, 'content of {}'.format(name).encode()))
+    return accession
+
+
+def read_bag(zip_file, root):
+    """The bag's files by path inside the bag, after checking its manifests."""
+    files = {name[len(root) + 1:]: zip_file.read(name) for name in zip_file.namelist() if name.startswith(root + '/')}
+    assert files['bagit.txt'] == b'BagIt-Version: 1.0\nTag-File-Character-Encoding: UTF-8\n'
+    for manifest in ('manifest-sha256.txt', 'tagmanifest-sha256.txt'):
+        for line in files[manifest].decode().splitlines():
+            checksum, path = line.split('  ', 1)
+            assert hashlib.sha256(files[path]).hexdigest() == checksum
+    payload = {path for path in files if path.startswith('data/')}
+    assert payload == {line.split('  ', 1)[1] for line in files['manifest-sha256.txt'].decode().splitlines()}
+    return files
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBagZip:
+    def test_bag(self, accession):
+        zip_file = ZipFile(BytesIO(b''.join(bag_zip(Accession.objects.filter(pk=accession.pk)))))
+        assert zip_file.testzip() is None
+        files = read_bag(zip_file, 'accession-{}'.format(accession.pk))
+
+        for uploaded_file in accession.file_set.all():
+            assert files['data/{}'.format(uploaded_file)] == uploaded_file.file.read()
+        bag_info = files['bag-info.txt'].decode()
+        size = sum(len(data) for path, data in files.items() if path.startswith('data/'))
+        assert 'Payload-Oxum: {}.3\n'.format(size) in bag_info
+        assert 'External-Identifier: accession-{}\n'.format(accession.pk) in bag_info
+        assert 'Contact-Email: {}\n'.format(accession.email_address) in bag_info
+        assert 'External-Description: First line\n  Second line\n' in bag_info
+        assert 'Keeper-Status: Accepted\n' in bag_info
+        assert 'Accession: {}'.format(accession.pk) in files['metadata.txt'].decode()
+
+    def test_missing_checksums_are_computed_and_recorded(self, accession, monkeypatch):
+        monkeypatch.setattr(bagit, 'CHECKSUM_LOOKAHEAD', 1)
+        File.objects.update(sha256='', crc32='')
+
+        zip_file = ZipFile(BytesIO(b''.join(bag_zip(Accession.objects.filter(pk=accession.pk)))))
+        assert zip_file.testzip() is None
+        read_bag(zip_file, 'accession-{}'.format(accession.pk))
+        for uploaded_file in accession.file_set.all():
+            assert uploaded_file.sha256 == hashlib.sha256(uploaded_file.file.read()).hexdigest()
+            assert uploaded_file.crc32
+
+    def test_checksums_are_not_computed_on_the_compression_pool(self, accession, monkeypatch):
+        # Hashing whole files there would hold up deflating the member being written
+        checksums = bagit.file_checksums
+        threads = []
+
+        def file_checksums(path):
+            threads.append(threading.current_thread().name)
+            return checksums(path)
+
+        monkeypatch.setattr(bagit, 'file_checksums', file_checksums)
+        File.objects.update(sha256='', crc32='')
+
+        b''.join(bag_zip(Accession.objects.filter(pk=accession.pk)))
+        assert len(threads) == 3
+        assert all(name.startswith('checksum') for name in threads)
+
+    def test_many_accessions(self, accession):
+        other = AccessionFactory(accession_status=Accession.ACCEPTED)
+        FileFactory(accession=other, file=SimpleUploadedFile('other.txt', b'other'))
+        progress = []
+
+        zip_file = ZipFile(BytesIO(b''.join(bag_zip(Accession.objects.all(), progress.append))))
+        read_bag(zip_file, 'accession-{}'.format(accession.pk))
+        read_bag(zip_file, 'accession-{}'.format(other.pk))
+        assert progress == [1, 2]
+
+    def test_batches_follow_accession_ids(self, accession, monkeypatch):
+        # Submission dates out of id order must not make batches skip files
+        monkeypatch.setattr(exports, 'EXPORT_BATCH_SIZE', 1)
+        other = AccessionFactory(accession_status=Accession.ACCEPTED)
+        for name in ('first.txt', 'second.txt'):
+            FileFactory(accession=other, file=SimpleUploadedFile(name, name.encode()))
+        Accession.objects.filter(pk=other.pk).update(date_submitted=accession.date_submitted - timedelta(days=1))
+
+        zip_file = ZipFile(BytesIO(b''.join(bag_zip(Accession.objects.all()))))
+        assert len(read_bag(zip_file, 'accession-{}'.format(accession.pk))['manifest-sha256.txt'].splitlines()) == 3
+        assert len(read_bag(zip_file, 'accession-{}'.format(other.pk))['manifest-sha256.txt'].splitlines()) == 2
+
+    def test_bag_view(self, admin_client, accession):
+        response = admin_client.get('/admin/keeper/accession/{}_bag'.format(accession.pk))
+        assert response.status_code == 200
+        assert response['Content-Disposition'] == 'attachment; filename=accession-{}.zip'.format(accession.pk)
+        read_bag(ZipFile(BytesIO(b''.join(response.streaming_content))), 'accession-{}'.format(accession.pk))
+
+    def test_bag_view_without_files(self, admin_client):
+        accession = AccessionFactory()
+        assert admin_client.get('/admin/keeper/accession/{}_bag'.format(accession.pk)).status_code == 404
+
+    def test_export_command(self, accession, tmp_path):
+        output = tmp_path / 'bags.zip'
+        call_command('export_accessions', str(accession.pk), '--format', 'bag', '--output', str(output),
+                     stderr=StringIO())
+        read_bag(ZipFile(output), 'accession-{}'.format(accession.pk))
+
+
+def test_encode_path():
+    assert encode_path('data/100%\nnew\rline.txt') == 'data/100%25%0Anew%0Dline.txt'
+
+
+def test_tag_file():
+    assert tag_file([('Label', 'one\ntwo'), ('Empty', ''), ('Other', 3)]) == 'Label: one\n  two\nOther: 3\n'
@@ -0,0 +1,84 @@
+import os
+from io import StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from keeper.ingest import ingest_upload
+from keeper.models import Blob
+from .factories import AccessionFactory, FileFactory
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDeduplicatedIngest:
+    @pytest.fixture(autouse=True)
+    def deduplicate(self, settings):
+        settings.DEDUPLICATE_UPLOADS = True
+
+    def ingest(self, name, content):
+        uploaded_file = ingest_upload(SimpleUploadedFile(name, content), AccessionFactory())
+        uploaded_file.save()
+        return uploaded_file
+
+    def test_identical_uploads_share_a_blob(self):
+        content = b"Some file content"
+        first = self.ingest("file1.txt", content)
+        second = self.ingest("photo.txt", content)
+
+        blob = Blob.objects.get()
+        assert first.blob == second.blob == blob
+        assert blob.ref_count == 2
+        assert blob.size == len(content)
+
+        # Each File keeps its own name and path, linked to the blob's content
+        assert second.get_filename() == 'photo.txt'
+        assert os.stat(first.file.path).st_ino == os.stat(blob.path).st_ino
+        assert os.stat(second.file.path).st_ino == os.stat(blob.path).st_ino
+        assert second.file.read() == content
+
+    def test_different_uploads_get_their_own_blobs(self):
+        self.ingest("file1.txt", b"first")
+        self.ingest("file2.txt", b"second")
+
+        assert Blob.objects.count() == 2
+
+    def test_deleting_files_releases_the_blob(self):
+        content = b"Some file content"
+        first = self.ingest("file1.txt", content)
+        second = self.ingest("file2.txt", content)
+        blob_path = first.blob.path
+
+        first.delete()
+        assert Blob.objects.get().ref_count == 1
+        assert os.path.exists(blob_path)
+
+        second.accession.delete()
+        assert Blob.objects.count() == 0
+        assert not os.path.exists(blob_path)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_dedupe_uploads_command():
+    content = b"Some file content"
+    first = FileFactory(file=SimpleUploadedFile("file1.txt", content))
+    second = FileFactory(file=SimpleUploadedFile("file2.txt", content))
+    other = FileFactory(file=SimpleUploadedFile("file3.txt", b"other content"))
+
+    out = StringIO()
+    call_command('dedupe_uploads', stdout=out)
+
+    assert 'Linked 3 files to blobs, reclaimed {} bytes'.format(len(content)) in out.getvalue()
+    first.refresh_from_db()
+    second.refresh_from_db()
+    other.refresh_from_db()
+    assert first.blob == second.blob
+    assert first.blob.ref_count == 2
+    assert other.blob.ref_count == 1
+    assert os.stat(first.file.path).st_ino == os.stat(second.file.path).st_ino
+    assert second.file.read() == content
+
+    # Running again has nothing left to do
+    out = StringIO()
+    call_command('dedupe_uploads', stdout=out)
+    assert 'Linked 0 files to blobs, reclaimed 0 bytes' in out.getvalue()
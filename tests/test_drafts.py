@@ -0,0 +1,62 @@
+import os
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from freezegun import freeze_time
+
+from keeper.drafts import abandoned_drafts, sweep_drafts
+from keeper.models import Accession, ChunkedUpload, File
+from .factories import AccessionFactory, FileFactory
+
+
+@pytest.fixture
+def old_draft():
+    with freeze_time(timezone.now() - timedelta(days=2)):
+        accession = AccessionFactory(accession_status=Accession.DRAFT)
+        uploaded_file = FileFactory(accession=accession, file=SimpleUploadedFile("file1.txt", b"content"))
+        upload = ChunkedUpload.objects.create(accession=accession, filename='file2.txt', size=10)
+        os.makedirs(os.path.dirname(upload.partial_path), exist_ok=True)
+        open(upload.partial_path, 'wb').close()
+    return accession, uploaded_file, upload
+
+
+@pytest.mark.django_db(transaction=True)
+class TestSweepDrafts:
+    def test_sweep_abandoned_draft(self, old_draft, settings):
+        settings.DRAFT_ACCESSION_TTL = 24 * 60 * 60
+        accession, uploaded_file, upload = old_draft
+
+        assert sweep_drafts() == 1
+
+        assert not Accession.objects.filter(pk=accession.pk).exists()
+        assert not File.objects.exists()
+        assert not os.path.exists(uploaded_file.file.path)
+        assert not os.path.exists(upload.partial_path)
+
+    def test_recent_upload_keeps_draft(self, old_draft):
+        accession, _, _ = old_draft
+        FileFactory(accession=accession)
+
+        assert list(abandoned_drafts(timezone.now() - timedelta(days=1))) == []
+
+    def test_recent_chunk_keeps_draft(self, old_draft):
+        _, _, upload = old_draft
+        upload.save()
+
+        assert list(abandoned_drafts(timezone.now() - timedelta(days=1))) == []
+
+    def test_submitted_accessions_are_kept(self):
+        with freeze_time(timezone.now() - timedelta(days=2)):
+            AccessionFactory(accession_status=Accession.NEW)
+
+        assert sweep_drafts(ttl=60) == 0
+        assert Accession.objects.count() == 1
+
+    def test_sweep_drafts_command(self, old_draft):
+        out = StringIO()
+        call_command('sweep_drafts', '--ttl=3600', stdout=out)
+        assert 'Deleted 1 abandoned draft accessions.' in out.getvalue()
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from io import BytesIO, StringIO
+from zipfile import ZipFile
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+
+from keeper import exports
+from keeper.exports import export_zip
+from keeper.models import Accession
+from .factories import AccessionFactory, FileFactory
+
+
+@pytest.fixture
+def accessions():
+    accessions = []
+    for number in range(3):
+        accession = AccessionFactory(accession_status=Accession.ACCEPTED)
+        for name in ('first.txt', 'second.jpg'):
+            FileFactory(accession=accession, file=SimpleUploadedFile(name, '{} {}'.format(number, name).encode()))
+        accessions.append(accession)
+    # Accessions without files are left out
+    AccessionFactory(accession_status=Accession.ACCEPTED)
+    return accessions
+
+
+def expected_names(accessions):
+    names = set()
+    for accession in accessions:
+        names.add('{}/metadata.txt'.format(accession.pk))
+        names.update('{0}/{0}/{1}'.format(accession.pk, uploaded_file.get_filename())
+                     for uploaded_file in accession.file_set.all())
+    return names
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_zip(accessions, monkeypatch):
+    # Batches that split an accession's files still keep them together
+    monkeypatch.setattr(exports, 'EXPORT_BATCH_SIZE', 3)
+    progress = []
+    zip_file = ZipFile(BytesIO(b''.join(export_zip(Accession.objects.all(), progress.append))))
+
+    assert zip_file.testzip() is None
+    assert set(zip_file.namelist()) == expected_names(accessions)
+    # Each accession's files are followed by its metadata
+    assert [name.split('/')[0] for name in zip_file.namelist()] == [
+        str(accession.pk) for accession in accessions for _ in range(3)]
+    for accession in accessions:
+        metadata = zip_file.read('{}/metadata.txt'.format(accession.pk)).decode()
+        assert metadata.startswith('Accession: {}'.format(accession.pk))
+        for uploaded_file in accession.file_set.all():
+            assert str(uploaded_file) in metadata
+    assert progress == [1, 2, 3]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_zip_batches_follow_accession_ids(accessions, monkeypatch):
+    # Submission dates out of id order must not make batches skip files
+    monkeypatch.setattr(exports, 'EXPORT_BATCH_SIZE', 1)
+    first, second, third = accessions
+    Accession.objects.filter(pk=third.pk).update(date_submitted=first.date_submitted - timedelta(days=1))
+    Accession.objects.filter(pk=first.pk).update(date_submitted=second.date_submitted + timedelta(days=1))
+    zip_file = ZipFile(BytesIO(b''.join(export_zip(Accession.objects.all()))))
+
+    assert zip_file.testzip() is None
+    assert set(zip_file.namelist()) == expected_names(accessions)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_zip_queries_do_not_grow_with_accessions(accessions, monkeypatch, django_assert_max_num_queries):
+    monkeypatch.setattr(exports, 'EXPORT_BATCH_SIZE', 100)
+    with django_assert_max_num_queries(2):
+        b''.join(export_zip(Accession.objects.all()))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_accessions_action(admin_client, accessions):
+    url = reverse('admin:keeper_accession_changelist')
+    response = admin_client.post(url, {
+        'action': 'export_accessions',
+        '_selected_action': [accession.pk for accession in accessions[:2]],
+    })
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/zip'
+    assert response['Content-Disposition'].startswith('attachment; filename=accessions-')
+    zip_file = ZipFile(BytesIO(b''.join(response.streaming_content)))
+    assert set(zip_file.namelist()) == expected_names(accessions[:2])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_accessions_command(accessions, tmp_path):
+    AccessionFactory(accession_status=Accession.NEW)
+    output = tmp_path / 'export.zip'
+    err = StringIO()
+    call_command('export_accessions', '--status', Accession.ACCEPTED, '--output', str(output), stderr=err)
+
+    assert set(ZipFile(output).namelist()) == expected_names(accessions)
+    assert 'Exported 3 of 3 accessions' in err.getvalue()
+    assert 'Exported 3 accessions' in err.getvalue()
+
+    call_command('export_accessions', str(accessions[0].pk), '--output', str(output), stderr=StringIO())
+    assert set(ZipFile(output).namelist()) == expected_names(accessions[:1])
@@ -0,0 +1,121 @@
+import hashlib
+import os
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from keeper.fixity import Throttle
+from keeper.ingest import ingest_upload
+from keeper.models import File, FixityAudit, FixityCheck
+from .factories import AccessionFactory
+
+
+def stored_file(name, content):
+    uploaded_file = ingest_upload(SimpleUploadedFile(name, content), AccessionFactory())
+    uploaded_file.save()
+    return uploaded_file
+
+
+def audit_fixity(*args):
+    out = StringIO()
+    call_command('audit_fixity', '--processes=1', *args, stdout=out, stderr=StringIO())
+    return out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ingest_records_md5(settings):
+    settings.RECORD_MD5 = True
+    content = b"Some file content"
+
+    uploaded_file = stored_file("file1.txt", content)
+
+    assert uploaded_file.sha256 == hashlib.sha256(content).hexdigest()
+    assert uploaded_file.md5 == hashlib.md5(content).hexdigest()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAuditFixity:
+    def test_audit_passes(self):
+        first = stored_file("file1.txt", b"first")
+        stored_file("file2.txt", b"second")
+
+        assert 'Checked 2 files (11 bytes): 0 failed, 0 missing.' in audit_fixity()
+
+        assert FixityCheck.objects.filter(outcome=FixityCheck.PASSED).count() == 2
+        first.refresh_from_db()
+        assert first.date_fixity_checked is not None
+        assert FixityAudit.objects.get().date_finished is not None
+
+    def test_audit_finds_changed_and_missing_files(self):
+        changed = stored_file("file1.txt", b"first")
+        missing = stored_file("file2.txt", b"second")
+        with open(changed.file.path, 'wb') as f:
+            f.write(b"changed")
+        os.remove(missing.file.path)
+
+        assert '1 failed, 1 missing.' in audit_fixity()
+
+        assert FixityCheck.objects.get(file=changed).outcome == FixityCheck.FAILED
+        assert FixityCheck.objects.get(file=changed).sha256 == hashlib.sha256(b"changed").hexdigest()
+        assert FixityCheck.objects.get(file=missing).outcome == FixityCheck.MISSING
+
+    def test_audit_fills_in_missing_checksums(self, settings):
+        settings.RECORD_MD5 = True
+        uploaded_file = stored_file("file1.txt", b"first")
+        File.objects.filter(pk=uploaded_file.pk).update(sha256='', md5='')
+
+        audit_fixity()
+
+        uploaded_file.refresh_from_db()
+        assert uploaded_file.sha256 == hashlib.sha256(b"first").hexdigest()
+        assert uploaded_file.md5 == hashlib.md5(b"first").hexdigest()
+
+    def test_audit_skips_recently_checked_files(self):
+        recent = stored_file("file1.txt", b"first")
+        old = stored_file("file2.txt", b"second")
+        File.objects.filter(pk=recent.pk).update(date_fixity_checked=timezone.now() - timedelta(days=1))
+        File.objects.filter(pk=old.pk).update(date_fixity_checked=timezone.now() - timedelta(days=40))
+
+        assert 'Checked 1 files' in audit_fixity('--days=30')
+        assert FixityCheck.objects.get().file == old
+
+    def test_resume_continues_unfinished_audit(self):
+        done = stored_file("file1.txt", b"first")
+        stored_file("file2.txt", b"second")
+        audit = FixityAudit.objects.create(checked_before=timezone.now())
+        File.objects.filter(pk=done.pk).update(date_fixity_checked=timezone.now())
+
+        audit_fixity('--resume')
+
+        audit.refresh_from_db()
+        assert audit.date_finished is not None
+        assert audit.files_checked == 1
+        assert FixityAudit.objects.count() == 1
+
+    def test_resume_without_unfinished_audit(self):
+        with pytest.raises(CommandError):
+            audit_fixity('--resume')
+
+    def test_audit_with_process_pool(self):
+        for i in range(5):
+            stored_file("file{}.txt".format(i), b"content")
+
+        out = StringIO()
+        call_command('audit_fixity', '--processes=2', '--batch-size=2', stdout=out)
+
+        assert 'Checked 5 files' in out.getvalue()
+        assert FixityCheck.objects.filter(outcome=FixityCheck.PASSED).count() == 5
+
+
+def test_throttle_sleeps_when_ahead():
+    with mock.patch('keeper.fixity.time') as mock_time:
+        mock_time.monotonic.return_value = 0
+        throttle = Throttle(bytes_per_second=100)
+        throttle.consume(50)
+        mock_time.sleep.assert_called_once_with(0.5)
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from freezegun import freeze_time
+
+from keeper.history import change_status, record_status_change, time_in_status
+from keeper.models import Accession, StatusChange
+from .factories import AccessionFactory
+
+
+@pytest.mark.django_db(transaction=True)
+class TestChangeStatus:
+    def test_records_each_change(self):
+        user = User.objects.create_user('staff')
+        new = AccessionFactory.create_batch(3, accession_status=Accession.NEW)
+        accepted = AccessionFactory(accession_status=Accession.ACCEPTED)
+
+        rows_updated = change_status(Accession.objects.all(), Accession.ACCEPTED, user)
+
+        assert rows_updated == 4
+        assert set(Accession.objects.values_list('accession_status', flat=True)) == {Accession.ACCEPTED}
+        # Accessions already in the status are not recorded as changing
+        changes = StatusChange.objects.order_by('accession')
+        assert [change.accession_id for change in changes] == [accession.pk for accession in new]
+        assert {(change.old_status, change.new_status, change.user) for change in changes} == {
+            (Accession.NEW, Accession.ACCEPTED, user)}
+        assert not StatusChange.objects.filter(accession=accepted).exists()
+
+    def test_one_insert(self, django_assert_num_queries):
+        AccessionFactory.create_batch(100, accession_status=Accession.NEW)
+
+        # The changing rows, the update and the insert, with the transaction around them.
+        # SQLite would split an insert of more than 999 parameters, about 200 changes
+        with django_assert_num_queries(5):
+            change_status(Accession.objects.all(), Accession.REVIEW)
+        assert StatusChange.objects.count() == 100
+
+    def test_record_status_change(self):
+        accession = AccessionFactory(accession_status=Accession.REVIEW)
+        record_status_change(accession, Accession.REVIEW)
+        assert not StatusChange.objects.exists()
+
+        record_status_change(accession, Accession.NEW)
+        change = StatusChange.objects.get()
+        assert (change.old_status, change.new_status, change.user) == (Accession.NEW, Accession.REVIEW, None)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_time_in_status():
+    with freeze_time(timezone.now() - timedelta(days=10)):
+        accession = AccessionFactory(accession_status=Accession.NEW)
+        other = AccessionFactory(accession_status=Accession.NEW)
+    with freeze_time(timezone.now() - timedelta(days=8)):
+        change_status(Accession.objects.filter(pk=accession.pk), Accession.REVIEW)
+    with freeze_time(timezone.now() - timedelta(days=6)):
+        change_status(Accession.objects.filter(pk=other.pk), Accession.REVIEW)
+    with freeze_time(timezone.now() - timedelta(days=5)):
+        change_status(Accession.objects.filter(pk=accession.pk), Accession.ACCEPTED)
+
+    stays = {stay['status']: stay for stay in time_in_status()}
+    # New for 2 and 4 days from submission, under review for 3 days since the change before
+    assert stays['New']['changes'] == 2
+    assert abs(stays['New']['average'] - timedelta(days=3)) < timedelta(minutes=1)
+    assert stays['Under Review']['changes'] == 1
+    assert abs(stays['Under Review']['average'] - timedelta(days=3)) < timedelta(minutes=1)
+
+    # Only changes in the period count
+    assert [stay['status'] for stay in time_in_status(days=7)] == ['New', 'Under Review']
+    assert time_in_status(days=1) == []
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAdminHistory:
+    def test_update_status_action(self, admin_client, admin_user):
+        accessions = AccessionFactory.create_batch(3, accession_status=Accession.NEW)
+        admin_client.post(reverse('admin:keeper_accession_changelist'), {
+            'action': 'update_status_rejected',
+            '_selected_action': [accession.pk for accession in accessions],
+        })
+        assert StatusChange.objects.filter(new_status=Accession.REJECTED, user=admin_user).count() == 3
+
+    def test_change_form(self, admin_client, admin_user):
+        accession = AccessionFactory(accession_status=Accession.NEW)
+        url = reverse('admin:keeper_accession_change', args=(accession.pk,))
+        response = admin_client.get(url)
+        data = {**response.context['adminform'].form.initial, 'accession_status': Accession.ACCEPTED,
+                'file_set-TOTAL_FORMS': 0, 'file_set-INITIAL_FORMS': 0}
+        data = {key: value for key, value in data.items() if value is not None}
+        response = admin_client.post(url, data)
+        assert response.status_code == 302
+
+        change = StatusChange.objects.get()
+        assert (change.old_status, change.new_status, change.user) == (Accession.NEW, Accession.ACCEPTED, admin_user)
+
+    def test_history_changelist(self, admin_client):
+        accession = AccessionFactory(accession_status=Accession.NEW)
+        change_status(Accession.objects.filter(pk=accession.pk), Accession.REVIEW)
+
+        response = admin_client.get(reverse('admin:keeper_statuschange_changelist'), {
+            'date_changed__gte': str(timezone.now() - timedelta(days=7))})
+        assert response.status_code == 200
+        assert len(response.context['cl'].result_list) == 1
+        assert response.context['time_in_status'][0]['status'] == 'New'
+        assert b'time-in-status' in response.content
+        assert not response.context['has_add_permission']
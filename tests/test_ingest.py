@@ -0,0 +1,157 @@
+import errno
+import hashlib
+import os
+import zlib
+from unittest import mock
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from keeper.ingest import ingest_upload
+from keeper.models import File
+from keeper.uploadhandler import SpooledUploadedFile
+from .factories import AccessionFactory
+
+
+@pytest.fixture
+def accession():
+    return AccessionFactory()
+
+
+class CountingUpload(SimpleUploadedFile):
+    """Counts the bytes read from the upload."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bytes_read = 0
+
+    def read(self, *args, **kwargs):
+        data = super().read(*args, **kwargs)
+        self.bytes_read += len(data)
+        return data
+
+
+@pytest.mark.django_db(transaction=True)
+class TestIngestUpload:
+    def test_ingest_upload(self, accession):
+        content = b"Some file content"
+        upload = SimpleUploadedFile("file1.txt", content, content_type="text/plain")
+
+        uploaded_file = ingest_upload(upload, accession, 'Test file description')
+        uploaded_file.save()
+
+        uploaded_file = File.objects.get(pk=uploaded_file.pk)
+        assert uploaded_file.get_filename() == 'file1.txt'
+        assert uploaded_file.file.name == os.path.join('uploads', str(accession.pk), 'file1.txt')
+        assert uploaded_file.file.read() == content
+        assert uploaded_file.sha256 == hashlib.sha256(content).hexdigest()
+        assert uploaded_file.crc32 == '{:08x}'.format(zlib.crc32(content))
+        assert uploaded_file.size == len(content)
+        assert uploaded_file.content_type == 'text/plain'
+        assert uploaded_file.file_description == 'Test file description'
+
+    def test_ingest_upload_reads_once(self, accession):
+        content = b"Some file content\n" * 100000
+        upload = CountingUpload("file1.txt", content, content_type="text/plain")
+
+        ingest_upload(upload, accession)
+
+        assert upload.bytes_read == len(content)
+
+    def test_ingest_upload_name_collision(self, accession):
+        first = ingest_upload(SimpleUploadedFile("file1.txt", b"first"), accession)
+        second = ingest_upload(SimpleUploadedFile("file1.txt", b"second"), accession)
+
+        assert first.file.name != second.file.name
+        assert first.file.read() == b"first"
+        assert second.file.read() == b"second"
+
+    @override_settings(MAX_UPLOAD_SIZE=10)
+    def test_ingest_upload_too_large(self, accession):
+        upload = SimpleUploadedFile("file1.txt", b"Some file content")
+
+        with pytest.raises(ValidationError):
+            ingest_upload(upload, accession)
+
+        field = File._meta.get_field('file')
+        assert not field.storage.exists(os.path.join('uploads', str(accession.pk), 'file1.txt'))
+
+
+def spooled_upload(name, content):
+    upload = SpooledUploadedFile(name, 'text/plain', len(content), None)
+    upload.write(content)
+    upload.seek(0)
+    upload.checksums = {'sha256': hashlib.sha256(content).hexdigest(), 'crc32': '{:08x}'.format(zlib.crc32(content))}
+    return upload
+
+
+@pytest.mark.django_db(transaction=True)
+class TestIngestSpooledUpload:
+    def test_spooled_upload_is_moved(self, accession):
+        content = b"Some file content"
+        upload = spooled_upload("file1.txt", content)
+        source = upload.temporary_file_path()
+        inode = os.stat(source).st_ino
+
+        uploaded_file = ingest_upload(upload, accession)
+
+        assert not os.path.exists(source)
+        assert os.stat(uploaded_file.file.path).st_ino == inode
+        assert uploaded_file.file.read() == content
+        assert uploaded_file.sha256 == hashlib.sha256(content).hexdigest()
+        upload.close()
+
+    def test_spooled_upload_source_can_be_kept(self, accession):
+        upload = spooled_upload("file1.txt", b"Some file content")
+        source = upload.temporary_file_path()
+
+        uploaded_file = ingest_upload(upload, accession, keep_source=True)
+
+        assert os.stat(source).st_ino == os.stat(uploaded_file.file.path).st_ino
+        upload.close()
+
+    def test_spooled_upload_name_collision(self, accession):
+        first_upload = spooled_upload("file1.txt", b"first")
+        second_upload = spooled_upload("file1.txt", b"second")
+        first = ingest_upload(first_upload, accession)
+        second = ingest_upload(second_upload, accession)
+
+        assert first.file.name != second.file.name
+        assert first.file.read() == b"first"
+        assert second.file.read() == b"second"
+        first_upload.close()
+        second_upload.close()
+
+    def test_spooled_upload_without_hash(self, accession):
+        content = b"Some file content"
+        upload = spooled_upload("file1.txt", content)
+        upload.checksums = None
+
+        uploaded_file = ingest_upload(upload, accession)
+
+        assert uploaded_file.sha256 == hashlib.sha256(content).hexdigest()
+        upload.close()
+
+    def test_spooled_upload_across_devices_is_copied(self, accession):
+        content = b"Some file content"
+        upload = spooled_upload("file1.txt", content)
+
+        with mock.patch('keeper.ingest.os.link', side_effect=OSError(errno.EXDEV, 'Invalid cross-device link')):
+            uploaded_file = ingest_upload(upload, accession)
+
+        assert os.path.exists(upload.temporary_file_path())
+        assert uploaded_file.file.read() == content
+        assert uploaded_file.sha256 == hashlib.sha256(content).hexdigest()
+        upload.close()
+
+    @override_settings(MAX_UPLOAD_SIZE=10)
+    def test_spooled_upload_too_large(self, accession):
+        upload = spooled_upload("file1.txt", b"Some file content")
+
+        with pytest.raises(ValidationError):
+            ingest_upload(upload, accession)
+
+        assert os.path.exists(upload.temporary_file_path())
+        upload.close()
@@ -0,0 +1,192 @@
+import hashlib
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from freezegun import freeze_time
+
+from keeper import jobs
+from keeper.models import Job
+from .factories import FileFactory
+
+
+calls = []
+
+
+@jobs.task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@jobs.task('tests.fail')
+def fail():
+    raise RuntimeError('Task failed')
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestJobQueue:
+    def test_run_pending(self):
+        job = jobs.enqueue('tests.record', value=1)
+        jobs.enqueue_many('tests.record', [{'value': 2}, {'value': 3}])
+
+        assert jobs.run_pending(worker='test') == 3
+        assert calls == [1, 2, 3]
+
+        job.refresh_from_db()
+        assert job.status == Job.DONE
+        assert job.attempts == 1
+        assert job.worker == 'test'
+        assert job.date_finished is not None
+
+    def test_claim_job_leases_the_job(self):
+        job = jobs.enqueue('tests.record', value=1)
+
+        claimed = jobs.claim_job('first')
+        assert claimed == job
+        assert claimed.status == Job.RUNNING
+        assert claimed.lease_expires > timezone.now()
+        # A running job is not handed to another worker
+        assert jobs.claim_job('second') is None
+
+    def test_future_jobs_wait(self):
+        Job.objects.create(task='tests.record', arguments={'value': 1},
+                           run_after=timezone.now() + timedelta(minutes=5))
+
+        assert jobs.run_pending() == 0
+        assert calls == []
+
+    def test_failed_job_is_retried_with_backoff(self, settings):
+        settings.JOB_RETRY_DELAY = 30
+
+        with freeze_time('2024-01-01 12:00:00'):
+            job = jobs.enqueue('tests.fail')
+            jobs.run_pending()
+            job.refresh_from_db()
+            assert job.status == Job.QUEUED
+            assert job.run_after == timezone.now() + timedelta(seconds=30)
+            assert 'Task failed' in job.last_error
+
+        with freeze_time('2024-01-01 12:00:31'):
+            jobs.run_pending()
+            job.refresh_from_db()
+            assert job.attempts == 2
+            assert job.run_after == timezone.now() + timedelta(seconds=60)
+
+    def test_job_fails_after_max_attempts(self, settings):
+        settings.JOB_RETRY_DELAY = 0
+        job = Job.objects.create(task='tests.fail', max_attempts=3)
+
+        assert jobs.run_pending() == 3
+
+        job.refresh_from_db()
+        assert job.status == Job.FAILED
+        assert job.attempts == 3
+        assert job.date_finished is not None
+
+    def test_unknown_task_fails(self):
+        job = Job.objects.create(task='tests.missing', max_attempts=1)
+
+        jobs.run_pending()
+
+        job.refresh_from_db()
+        assert job.status == Job.FAILED
+        assert 'KeyError' in job.last_error
+
+    def test_expired_lease_is_reclaimed(self, settings):
+        settings.JOB_LEASE_SECONDS = 60
+
+        with freeze_time('2024-01-01 12:00:00'):
+            job = jobs.enqueue('tests.record', value=1)
+            jobs.claim_job('lost')
+
+        with freeze_time('2024-01-01 12:00:30'):
+            assert jobs.run_pending(worker='second') == 0
+
+        with freeze_time('2024-01-01 12:01:01'):
+            assert jobs.run_pending(worker='second') == 1
+
+        job.refresh_from_db()
+        assert job.status == Job.DONE
+        assert job.worker == 'second'
+        assert job.attempts == 2
+        assert calls == [1]
+
+    def test_lost_lease_result_is_not_recorded(self):
+        jobs.enqueue('tests.record', value=1)
+        job = jobs.claim_job('first')
+        Job.objects.filter(pk=job.pk).update(worker='second')
+
+        jobs.run_job(job)
+
+        assert Job.objects.get(pk=job.pk).status == Job.RUNNING
+
+    def test_queue_stats(self):
+        jobs.enqueue('tests.record', value=1)
+        Job.objects.create(task='tests.record', arguments={'value': 2},
+                           run_after=timezone.now() + timedelta(minutes=5))
+        Job.objects.create(task='tests.fail', max_attempts=1)
+        jobs.run_pending()
+
+        stats = jobs.queue_stats()
+        assert stats['due'] == 0
+        assert stats['scheduled'] == 1
+        assert stats['failed'] == 1
+        assert stats['done_last_day'] == 1
+        assert stats['average_latency'] >= timedelta(0)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_jobs_command():
+    jobs.enqueue('tests.record', value=1)
+
+    call_command('run_jobs', '--once', stdout=StringIO())
+
+    assert calls == [1]
+    assert Job.objects.get().status == Job.DONE
+
+
+@pytest.mark.django_db(transaction=True)
+def test_new_file_queues_checksum():
+    content = b"Some file content"
+    uploaded_file = FileFactory(file=SimpleUploadedFile("file1.txt", content))
+
+    job = Job.objects.get(task='keeper.checksum')
+    assert job.arguments == {'file_id': uploaded_file.pk}
+
+    jobs.run_pending()
+
+    uploaded_file.refresh_from_db()
+    assert uploaded_file.sha256 == hashlib.sha256(content).hexdigest()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_job_changelist(admin_client):
+    jobs.enqueue('tests.record', value=1)
+
+    response = admin_client.get(reverse('admin:keeper_job_changelist'))
+
+    assert response.status_code == 200
+    assert response.context['queue_stats']['due'] == 1
+    assert b'queue-stats' in response.content
+
+
+@pytest.mark.django_db(transaction=True)
+def test_retry_jobs_action(admin_client):
+    job = Job.objects.create(task='tests.record', arguments={'value': 1}, status=Job.FAILED, attempts=5)
+
+    response = admin_client.post(reverse('admin:keeper_job_changelist'),
+                                 {'action': 'retry_jobs', '_selected_action': [job.pk]})
+
+    assert response.status_code == 302
+    job.refresh_from_db()
+    assert job.status == Job.QUEUED
+    assert job.attempts == 0
@@ -106,7 +106,9 @@ class TestFile:
     def test_image_thumb(self):
         file = FileFactory()
         with patch("os.path.basename", return_value="mocked_filename"):
-            assert file.image_thumb() == format_html('<img src="{}" width="100" height="100" />', file.file.url)
+            assert file.image_thumb() == format_html(
+                '<img src="{}" width="100" height="100" style="object-fit: contain" />', file.thumbnail_url())
+        assert file.thumbnail_url().startswith('/thumbnails/{}/?v='.format(file.pk))
 
     def test_icon_thumb(self):
         file = FileFactory(content_type='image/png')
@@ -127,7 +129,8 @@ class TestFile:
     def test_clickable_thumb_for_image(self):
         file = FileFactory(content_type='image/png')
         with patch("os.path.basename", return_value="mocked_filename"):
-            assert '<img src="{}" width="100" height="100" />'.format(file.file.url) in file.clickable_thumb()
+            assert '<img src="{}"'.format(file.thumbnail_url()) in file.clickable_thumb()
+        assert 'href="{}"'.format(file.file.url) in file.clickable_thumb()
 
     def test_clickable_thumb_for_non_image(self):
         file = FileFactory(content_type='application/pdf')
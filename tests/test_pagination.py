@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import urlsafe_base64_encode
+
+from keeper.admin import AccessionAdmin
+from keeper.models import Accession
+from .factories import AccessionFactory
+
+
+URL = reverse('admin:keeper_accession_changelist')
+
+
+@pytest.fixture
+def accessions(monkeypatch):
+    monkeypatch.setattr(AccessionAdmin, 'list_per_page', 10)
+    accessions = AccessionFactory.create_batch(25, accession_status=Accession.ACCEPTED)
+    # Ties on date_submitted are broken by id
+    Accession.objects.filter(pk__in=[a.pk for a in accessions[8:14]]).update(
+        date_submitted=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    return list(Accession.objects.order_by('-date_submitted', '-id'))
+
+
+def rows(response):
+    return list(response.context['cl'].result_list)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestKeysetPagination:
+    def test_next_pages(self, admin_client, accessions):
+        response = admin_client.get(URL)
+        cl = response.context['cl']
+        assert cl.keyset == (['date_submitted', 'id'], True)
+        assert rows(response) == accessions[:10]
+        assert not cl.has_previous and cl.has_next
+        assert cl.result_count == 25
+        assert 'Older' in response.content.decode()
+
+        second = admin_client.get(URL + cl.next_url)
+        assert rows(second) == accessions[10:20]
+        third = admin_client.get(URL + second.context['cl'].next_url)
+        assert rows(third) == accessions[20:]
+        assert third.context['cl'].has_previous and not third.context['cl'].has_next
+
+    def test_previous_pages(self, admin_client, accessions):
+        cl = admin_client.get(URL).context['cl']
+        cl = admin_client.get(URL + cl.next_url).context['cl']
+        cl = admin_client.get(URL + cl.next_url).context['cl']
+
+        second = admin_client.get(URL + cl.previous_url)
+        assert rows(second) == accessions[10:20]
+        first = admin_client.get(URL + second.context['cl'].previous_url)
+        assert rows(first) == accessions[:10]
+        assert not first.context['cl'].has_previous
+
+    def test_pages_are_sought_not_skipped(self, admin_client, accessions):
+        cl = admin_client.get(URL).context['cl']
+        with CaptureQueriesContext(connection) as queries:
+            admin_client.get(URL + cl.next_url)
+        assert not any('OFFSET' in query['sql'] for query in queries)
+
+    def test_with_filter(self, admin_client, accessions):
+        AccessionFactory.create_batch(5, accession_status=Accession.REJECTED)
+        response = admin_client.get(URL, {'accession_status__exact': Accession.ACCEPTED})
+        assert rows(response) == accessions[:10]
+        # Links keep the filter
+        second = admin_client.get(URL + response.context['cl'].next_url)
+        assert rows(second) == accessions[10:20]
+
+    def test_sorted_by_column_is_numbered(self, admin_client, accessions):
+        response = admin_client.get(URL, {'o': '1', 'p': '2'})
+        cl = response.context['cl']
+        assert cl.keyset is None
+        assert rows(response) == sorted(accessions, key=lambda accession: accession.pk)[10:20]
+
+    @pytest.mark.parametrize('cursor', ['not a cursor', urlsafe_base64_encode(b'["2024-01-01T00:00:00Z"]'),
+                                        urlsafe_base64_encode(b'"ab"')])
+    def test_invalid_cursor(self, admin_client, accessions, cursor):
+        response = admin_client.get(URL, {'after': cursor})
+        assert response.status_code == 302
+        assert response.url.endswith('?e=1')
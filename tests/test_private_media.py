@@ -0,0 +1,60 @@
+import os
+import re
+from urllib.parse import quote
+
+import pytest
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from private_storage.servers import DjangoServer, NginxXAccelRedirectServer
+from private_storage.views import PrivateStorageView
+
+from .factories import FileFactory
+
+
+@pytest.fixture
+def uploaded_file():
+    return FileFactory(file=SimpleUploadedFile("home movie.mp4", b"video content"), content_type='video/mp4')
+
+
+@pytest.mark.django_db(transaction=True)
+class TestXAccelRedirect:
+    @pytest.fixture(autouse=True)
+    def nginx(self, monkeypatch):
+        # The view picks its server class from the setting once, on import
+        monkeypatch.setattr(PrivateStorageView, 'server_class', NginxXAccelRedirectServer)
+
+    def test_staff_download_is_sent_by_nginx(self, admin_client, uploaded_file):
+        response = admin_client.get(uploaded_file.file.url)
+
+        assert response.status_code == 200
+        assert response['X-Accel-Redirect'] == quote(settings.PRIVATE_STORAGE_INTERNAL_URL + uploaded_file.file.name)
+        assert response['Content-Type'] == 'video/mp4'
+        assert 'no-cache' in response['Cache-Control']
+        # Django does not read the file
+        assert response.content == b''
+
+    def test_others_are_refused(self, client, uploaded_file):
+        response = client.get(uploaded_file.file.url)
+
+        assert response.status_code in (401, 403)
+        assert not response.has_header('X-Accel-Redirect')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_django_sends_files_by_default(admin_client, uploaded_file, monkeypatch):
+    monkeypatch.setattr(PrivateStorageView, 'server_class', DjangoServer)
+    response = admin_client.get(uploaded_file.file.url)
+
+    assert not response.has_header('X-Accel-Redirect')
+    assert b"".join(response.streaming_content) == b"video content"
+
+
+def test_nginx_has_the_internal_location():
+    with open(os.path.join(settings.BASE_DIR, 'nginx', 'nginx.conf')) as f:
+        config = f.read()
+
+    location = re.search(r'location {}\s*{{([^}}]*)}}'.format(re.escape(settings.PRIVATE_STORAGE_INTERNAL_URL)), config)
+    assert location is not None
+    assert 'internal;' in location.group(1)
+    # The private media mount used in compose.prod.yml and the Makefile
+    assert 'alias /app/keeper/private-media/;' in location.group(1)
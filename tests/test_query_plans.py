@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from keeper.drafts import abandoned_drafts
+from keeper.models import Accession, File
+
+
+# Large enough that a plan which scans or sorts the table would be chosen over an index only for a reason
+SEEDED_ACCESSIONS = 1000000
+SEEDED_FILES = 100000
+
+
+def seed_sql(table, count, columns, values):
+    # One statement for any number of rows, so seeding takes seconds rather than minutes
+    if connection.vendor == 'postgresql':
+        rows = 'generate_series(1, {}) AS n(i)'.format(count)
+    else:
+        rows = '(WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {}) SELECT i FROM n) AS n'.format(count)
+    return 'INSERT INTO {} ({}) SELECT {} FROM {}'.format(table, ', '.join(columns), ', '.join(values), rows)
+
+
+def minutes_after_2015(column):
+    if connection.vendor == 'postgresql':
+        return "timestamp '2015-01-01' + {} * interval '1 minute'".format(column)
+    return "datetime('2015-01-01', '+' || {} || ' minutes')".format(column)
+
+
+@pytest.fixture(scope='module')
+def seeded(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        with connection.cursor() as cursor:
+            date = minutes_after_2015('i')
+            cursor.execute(seed_sql('keeper_accession', SEEDED_ACCESSIONS, [
+                'id', 'date_submitted', 'date_last_updated', 'description', 'first_name', 'last_name', 'affiliation',
+                'organization_name', 'email_address', 'phone_number', 'admin_notes', 'accession_status',
+            ], [
+                'i', date, date, "''", "'First'", "'Last'", "'OTH'", "''", "'donor' || i || '@example.com'", "''",
+                "''", "CASE i % 100 WHEN 0 THEN 'DRA' WHEN 1 THEN 'NEW' WHEN 2 THEN 'REV' WHEN 3 THEN 'REJ' "
+                "ELSE 'ACC' END",
+            ]))
+            cursor.execute(seed_sql('keeper_file', SEEDED_FILES, [
+                'file', 'accession_id', 'file_description', 'content_type', 'date_file_submitted', 'sha256', 'md5',
+                'crc32',
+            ], [
+                "'uploads/' || i || '/file.txt'", '(i * 7) % {} + 1'.format(SEEDED_ACCESSIONS), "''", "'text/plain'",
+                minutes_after_2015('i'), "''", "''", "''",
+            ]))
+            cursor.execute('ANALYZE')
+    yield
+    with django_db_blocker.unblock():
+        # Deleted without signals, which would reindex every accession on the way
+        for model in (File, Accession):
+            model.objects.all()._raw_delete(connection.alias)
+
+
+def plan(queryset):
+    return queryset.explain()
+
+
+def count_plan(queryset):
+    # QuerySet.explain() cannot explain a count, so the query count() runs is explained instead
+    with CaptureQueriesContext(connection) as queries:
+        queryset.count()
+    with connection.cursor() as cursor:
+        cursor.execute('{} {}'.format(connection.ops.explain_query_prefix(), queries[-1]['sql']))
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+@pytest.mark.django_db
+class TestQueryPlans:
+    def test_date_order(self, seeded):
+        page = plan(Accession.objects.order_by('date_submitted', 'id')[:100])
+        assert 'keeper_acc_submitted' in page
+        # Read in index order, without sorting the table
+        assert 'TEMP B-TREE' not in page and 'Sort' not in page
+
+    def test_status_filter_in_date_order(self, seeded):
+        page = plan(Accession.objects.filter(accession_status=Accession.REVIEW).order_by('-date_submitted', '-id')[:100])
+        assert 'keeper_acc_status_submitted' in page
+        assert 'TEMP B-TREE' not in page and 'Sort' not in page
+
+    def test_stats_count(self, seeded):
+        # Counted from the index alone, without reading the table's rows
+        count = count_plan(Accession.objects.exclude(accession_status=Accession.DRAFT))
+        assert 'keeper_acc_status_submitted' in count
+
+    def test_email_lookup(self, seeded):
+        assert 'keeper_acc_email' in plan(Accession.objects.filter(email_address='donor500@example.com'))
+
+    def test_abandoned_drafts(self, seeded):
+        assert 'keeper_acc_draft_updated' in plan(abandoned_drafts(timezone.now() - timedelta(days=7)))
+
+    def test_accession_files(self, seeded):
+        files = plan(File.objects.filter(accession=500).order_by('pk'))
+        assert 'keeper_file_accession' in files
+        assert 'TEMP B-TREE' not in files and 'Sort' not in files
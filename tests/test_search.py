@@ -0,0 +1,110 @@
+from io import StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from keeper.models import Accession, SearchDocument
+from keeper.search import fts5_query, index_accessions, search
+from .factories import AccessionFactory, FileFactory
+
+
+def found(terms):
+    return list(search(Accession.objects.all(), terms).order_by('-search_rank', 'pk'))
+
+
+@pytest.mark.django_db(transaction=True)
+class TestSearch:
+    def test_accession_is_indexed_on_save(self):
+        accession = AccessionFactory(description='Letters from the Denton county fair', admin_notes='Box 12')
+        assert found('county fair') == [accession]
+        assert found('box') == [accession]
+        # Words are stemmed
+        assert found('letter') == [accession]
+
+        accession.description = 'Photographs of the rodeo'
+        accession.save()
+        assert found('fair') == []
+        assert found('rodeo') == [accession]
+
+    def test_file_descriptions_and_names(self):
+        accession = AccessionFactory(description='')
+        uploaded_file = FileFactory(accession=accession, file_description='Commencement program',
+                                    file=SimpleUploadedFile('yearbook.pdf', b'pdf'))
+        assert found('commencement') == [accession]
+        assert found('yearbook') == [accession]
+
+        uploaded_file.delete()
+        assert found('commencement') == []
+
+    def test_ranked(self):
+        once = AccessionFactory(description='A quilt and a lamp', admin_notes='')
+        twice = AccessionFactory(description='A quilt, quilt patterns and quilting notes', admin_notes='')
+        AccessionFactory(description='Nothing related', admin_notes='')
+        assert found('quilt') == [twice, once]
+
+    def test_terms_are_not_query_syntax(self):
+        accession = AccessionFactory(description='Minutes: "Faculty Senate" 1952-1953 (draft)')
+        assert found('minutes: "faculty') == [accession]
+        assert found('1952-1953 (draft') == [accession]
+        assert found('  ') == []
+        assert fts5_query('say "hi"') == '"say" """hi"""'
+
+    def test_deleted_accession_leaves_index(self):
+        accession = AccessionFactory(description='Glass negatives')
+        FileFactory(accession=accession)
+        accession.delete()
+        assert not SearchDocument.objects.exists()
+        assert found('negatives') == []
+
+    def test_index_accessions_query_count(self):
+        accessions = AccessionFactory.create_batch(20)
+        for accession in accessions:
+            FileFactory(accession=accession)
+        SearchDocument.objects.all().delete()
+
+        # The accessions, their files and one upsert, however many accessions there are
+        with CaptureQueriesContext(connection) as one:
+            index_accessions([accessions[0].pk])
+        with CaptureQueriesContext(connection) as twenty:
+            index_accessions(accession.pk for accession in accessions)
+        assert len(one) == len(twenty)
+        assert SearchDocument.objects.count() == 20
+
+    def test_rebuild_search_index(self):
+        accessions = AccessionFactory.create_batch(3, description='Oral history')
+        SearchDocument.objects.all().delete()
+        assert found('oral history') == []
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        assert 'Indexed 3 accessions' in out.getvalue()
+        assert set(found('oral history')) == set(accessions)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAdminSearch:
+    def test_search_box_is_ranked(self, admin_client):
+        once = AccessionFactory(description='A quilt and a lamp', admin_notes='')
+        twice = AccessionFactory(description='A quilt, quilt patterns and quilting notes', admin_notes='')
+        AccessionFactory(description='Nothing related', admin_notes='')
+        url = reverse('admin:keeper_accession_changelist')
+
+        response = admin_client.get(url, {'q': 'quilt'})
+        assert response.status_code == 200
+        assert list(response.context['cl'].result_list) == [twice, once]
+
+        # Sorting by a column still applies to the matches
+        response = admin_client.get(url, {'q': 'quilt', 'o': '1'})
+        assert list(response.context['cl'].result_list) == sorted([once, twice], key=lambda a: a.pk)
+
+    def test_search_by_file_description(self, admin_client):
+        accession = AccessionFactory()
+        FileFactory(accession=accession, file_description='Scrapbook of the marching band')
+        AccessionFactory()
+
+        response = admin_client.get(reverse('admin:keeper_accession_changelist'), {'q': 'marching band'})
+        assert list(response.context['cl'].result_list) == [accession]
@@ -0,0 +1,105 @@
+import os
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+
+from keeper import jobs
+from keeper.thumbnails import THUMBNAIL_SIZE, make_thumbnail, thumbnail_path
+from .factories import FileFactory
+
+
+def image_file(name='photo.png', size=(800, 600), color='red'):
+    content = BytesIO()
+    Image.new('RGB', size, color).save(content, 'PNG')
+    return FileFactory(file=SimpleUploadedFile(name, content.getvalue()), content_type='image/png')
+
+
+@pytest.mark.django_db(transaction=True)
+class TestMakeThumbnail:
+    def test_make_thumbnail(self):
+        uploaded_file = image_file()
+
+        path = make_thumbnail(uploaded_file)
+
+        assert path == thumbnail_path(uploaded_file)
+        assert os.path.dirname(os.path.dirname(path)) == os.path.dirname(uploaded_file.file.path)
+        with Image.open(path) as thumbnail:
+            assert thumbnail.format == 'JPEG'
+            assert thumbnail.size == (THUMBNAIL_SIZE[0], THUMBNAIL_SIZE[0] * 3 // 4)
+
+    def test_thumbnail_is_reused(self):
+        uploaded_file = image_file()
+        path = make_thumbnail(uploaded_file)
+        mtime = os.stat(path).st_mtime_ns
+
+        make_thumbnail(uploaded_file)
+
+        assert os.stat(path).st_mtime_ns == mtime
+
+    def test_changed_source_invalidates_thumbnail(self):
+        uploaded_file = image_file()
+        path = make_thumbnail(uploaded_file)
+        old_url = uploaded_file.thumbnail_url()
+
+        Image.new('RGB', (100, 400), 'blue').save(uploaded_file.file.path, 'PNG')
+        stat = os.stat(path)
+        os.utime(uploaded_file.file.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        make_thumbnail(uploaded_file)
+        with Image.open(path) as thumbnail:
+            assert thumbnail.size == (50, 200)
+        assert uploaded_file.thumbnail_url() != old_url
+
+    def test_no_thumbnail_for_other_files(self):
+        uploaded_file = FileFactory(content_type='application/pdf')
+        assert make_thumbnail(uploaded_file) is None
+
+    def test_no_thumbnail_for_unreadable_image(self):
+        uploaded_file = FileFactory(file=SimpleUploadedFile('photo.png', b'not an image'), content_type='image/png')
+        assert make_thumbnail(uploaded_file) is None
+
+    def test_deleting_file_removes_thumbnail(self):
+        uploaded_file = image_file()
+        path = make_thumbnail(uploaded_file)
+
+        uploaded_file.delete()
+
+        assert not os.path.exists(path)
+
+    def test_thumbnail_job(self):
+        uploaded_file = image_file()
+
+        jobs.run_pending()
+
+        assert os.path.exists(thumbnail_path(uploaded_file))
+
+
+@pytest.mark.django_db(transaction=True)
+class TestThumbnailView:
+    def test_thumbnail(self, admin_client):
+        uploaded_file = image_file()
+
+        response = admin_client.get(uploaded_file.thumbnail_url())
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'image/jpeg'
+        assert 'max-age=31536000' in response['Cache-Control']
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as thumbnail:
+            assert max(thumbnail.size) == THUMBNAIL_SIZE[0]
+
+    def test_no_thumbnail(self, admin_client):
+        uploaded_file = FileFactory(content_type='application/pdf')
+
+        response = admin_client.get(reverse('keeper:thumbnail', args=[uploaded_file.pk]))
+
+        assert response.status_code == 404
+
+    def test_thumbnail_requires_staff(self, client):
+        uploaded_file = image_file()
+
+        response = client.get(uploaded_file.thumbnail_url())
+
+        assert response.status_code == 302
@@ -0,0 +1,280 @@
+import os
+
+import pytest
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from django.urls import reverse
+
+from keeper import upload_views
+from keeper.models import Accession, ChunkedUpload, File, StatusChange
+
+
+@pytest.fixture
+def content():
+    # Two full chunks and a partial last chunk of plain text
+    return (b"Some file content\n" * 200)[:settings.UPLOAD_CHUNK_SIZE * 2 + 500]
+
+
+@pytest.fixture
+def draft(client, valid_accession_data):
+    response = client.post(reverse('keeper:upload_create'), data=valid_accession_data)
+    return Accession.objects.get(pk=response.json()['accession_id'])
+
+
+@pytest.fixture
+def upload(client, draft, content):
+    response = client.post(reverse('keeper:upload_declare', args=(draft.pk,)), data={
+        'filename': 'file.txt',
+        'size': len(content),
+        'file_description': 'Test file description',
+        'content_type': 'text/plain',
+    })
+    return ChunkedUpload.objects.get(upload_id=response.json()['upload_id'])
+
+
+def put_chunk(client, upload, content, start):
+    end = min(start + settings.UPLOAD_CHUNK_SIZE, len(content)) - 1
+    url = reverse('keeper:upload_chunk', args=(upload.accession_id, upload.upload_id))
+    return client.put(url, data=content[start:end + 1], content_type='application/octet-stream',
+                      HTTP_CONTENT_RANGE='bytes {}-{}/{}'.format(start, end, len(content)))
+
+
+def put_all_chunks(client, upload, content):
+    for start in range(0, len(content), settings.UPLOAD_CHUNK_SIZE):
+        response = put_chunk(client, upload, content, start)
+        assert response.status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+class TestChunkedUpload:
+    def test_create_draft(self, client, valid_accession_data):
+        response = client.post(reverse('keeper:upload_create'), data=valid_accession_data)
+        json_data = response.json()
+        assert json_data['success'] is True
+        assert json_data['chunk_size'] == settings.UPLOAD_CHUNK_SIZE
+        accession = Accession.objects.get(pk=json_data['accession_id'])
+        assert accession.accession_status == Accession.DRAFT
+
+    def test_create_draft_invalid(self, client, valid_accession_data):
+        valid_accession_data.pop('accession-first_name')
+        response = client.post(reverse('keeper:upload_create'), data=valid_accession_data)
+        json_data = response.json()
+        assert json_data['success'] is False
+        assert 'first_name' in json_data['errorsForm']
+        assert Accession.objects.count() == 0
+
+    def test_declare_file_too_large(self, client, draft):
+        response = client.post(reverse('keeper:upload_declare', args=(draft.pk,)), data={
+            'filename': 'large.txt',
+            'size': settings.MAX_UPLOAD_SIZE + 1,
+        })
+        json_data = response.json()
+        assert json_data['success'] is False
+        assert json_data['errorsFile'][0]['file_name'] == 'large.txt'
+        assert ChunkedUpload.objects.count() == 0
+
+    def test_draft_belongs_to_session(self, draft):
+        other_client = Client()
+        response = other_client.post(reverse('keeper:upload_declare', args=(draft.pk,)), data={
+            'filename': 'file.txt',
+            'size': 10,
+        })
+        assert response.status_code == 404
+
+    def test_upload_and_finalize(self, client, draft, upload, content):
+        put_all_chunks(client, upload, content)
+        upload.refresh_from_db()
+        assert upload.is_complete
+
+        response = client.post(reverse('keeper:upload_finalize', args=(draft.pk,)))
+        json_data = response.json()
+        assert json_data['success'] is True
+        assert 'template' in json_data
+
+        draft.refresh_from_db()
+        assert draft.accession_status == Accession.NEW
+        assert StatusChange.objects.filter(accession=draft, old_status=Accession.DRAFT,
+                                           new_status=Accession.NEW, user=None).exists()
+        uploaded_file = File.objects.get(accession=draft)
+        assert uploaded_file.get_filename() == 'file.txt'
+        assert uploaded_file.file_description == 'Test file description'
+        assert uploaded_file.file.read() == content
+        assert ChunkedUpload.objects.count() == 0
+        assert not os.path.exists(upload.partial_path)
+
+    def test_resume_sends_only_missing_chunks(self, client, upload, content):
+        put_chunk(client, upload, content, 0)
+
+        # A dropped connection: the client asks how much the server has
+        url = reverse('keeper:upload_chunk', args=(upload.accession_id, upload.upload_id))
+        response = client.get(url)
+        assert response.json()['offset'] == settings.UPLOAD_CHUNK_SIZE
+        assert response['Upload-Offset'] == str(settings.UPLOAD_CHUNK_SIZE)
+
+        for start in range(response.json()['offset'], len(content), settings.UPLOAD_CHUNK_SIZE):
+            assert put_chunk(client, upload, content, start).status_code == 200
+
+        upload.refresh_from_db()
+        assert upload.is_complete
+        with open(upload.partial_path, 'rb') as f:
+            assert f.read() == content
+
+    def test_resent_chunk_does_not_move_offset(self, client, upload, content):
+        put_chunk(client, upload, content, 0)
+        put_chunk(client, upload, content, settings.UPLOAD_CHUNK_SIZE)
+        response = put_chunk(client, upload, content, 0)
+        assert response.status_code == 200
+        assert response.json()['offset'] == settings.UPLOAD_CHUNK_SIZE * 2
+
+    def test_out_of_order_chunk(self, client, upload, content):
+        response = put_chunk(client, upload, content, settings.UPLOAD_CHUNK_SIZE)
+        assert response.status_code == 409
+        assert response.json()['offset'] == 0
+
+    def test_invalid_content_range(self, client, upload, content):
+        url = reverse('keeper:upload_chunk', args=(upload.accession_id, upload.upload_id))
+        response = client.put(url, data=content[:10], content_type='application/octet-stream')
+        assert response.status_code == 400
+
+        response = client.put(url, data=content[:10], content_type='application/octet-stream',
+                              HTTP_CONTENT_RANGE='bytes 0-9/{}'.format(len(content)))
+        assert response.status_code == 416
+
+    def test_short_chunk_body(self, client, upload, content):
+        url = reverse('keeper:upload_chunk', args=(upload.accession_id, upload.upload_id))
+        response = client.put(url, data=content[:10], content_type='application/octet-stream',
+                              HTTP_CONTENT_RANGE='bytes 0-{}/{}'.format(settings.UPLOAD_CHUNK_SIZE - 1, len(content)))
+        assert response.status_code == 400
+        upload.refresh_from_db()
+        assert upload.offset == 0
+
+    def test_finalize_incomplete(self, client, draft, upload, content):
+        put_chunk(client, upload, content, 0)
+        response = client.post(reverse('keeper:upload_finalize', args=(draft.pk,)))
+        assert response.status_code == 409
+        assert response.json()['incomplete'][0]['offset'] == settings.UPLOAD_CHUNK_SIZE
+        draft.refresh_from_db()
+        assert draft.accession_status == Accession.DRAFT
+
+    def test_finalize_failure_saves_nothing(self, client, draft, monkeypatch):
+        uploads = []
+        for name in ('first.txt', 'second.txt'):
+            response = client.post(reverse('keeper:upload_declare', args=(draft.pk,)), data={
+                'filename': name,
+                'size': len(name),
+                'content_type': 'text/plain',
+            })
+            uploads.append(ChunkedUpload.objects.get(upload_id=response.json()['upload_id']))
+            put_all_chunks(client, uploads[-1], name.encode())
+
+        # The second file fails after the first has been stored
+        ingest_upload = upload_views.ingest_upload
+        ingested = []
+
+        def failing_ingest_upload(*args, **kwargs):
+            if ingested:
+                raise RuntimeError('Ingest failed')
+            ingested.append(ingest_upload(*args, **kwargs))
+            return ingested[-1]
+
+        monkeypatch.setattr(upload_views, 'ingest_upload', failing_ingest_upload)
+        with pytest.raises(RuntimeError):
+            client.post(reverse('keeper:upload_finalize', args=(draft.pk,)))
+
+        assert File.objects.count() == 0
+        assert not os.path.exists(ingested[0].file.path)
+        draft.refresh_from_db()
+        assert draft.accession_status == Accession.DRAFT
+        assert not StatusChange.objects.filter(accession=draft).exists()
+
+        # The uploads are all still there, so finalizing can be retried
+        assert all(os.path.exists(upload.partial_path) for upload in uploads)
+        monkeypatch.undo()
+        response = client.post(reverse('keeper:upload_finalize', args=(draft.pk,)))
+        assert response.json()['success'] is True
+        assert sorted(File.objects.values_list('size', flat=True)) == [9, 10]
+        assert not any(os.path.exists(upload.partial_path) for upload in uploads)
+        assert not ChunkedUpload.objects.exists()
+
+    def test_finalize_invalid_file_type(self, client, draft):
+        content = b"MZ\x90\x00\x03\x00\x00\x00\x04\x00\x00\x00\xff\xff\x00\x00" * 10
+        response = client.post(reverse('keeper:upload_declare', args=(draft.pk,)), data={
+            'filename': 'file.exe',
+            'size': len(content),
+        })
+        upload = ChunkedUpload.objects.get(upload_id=response.json()['upload_id'])
+        put_all_chunks(client, upload, content)
+
+        response = client.post(reverse('keeper:upload_finalize', args=(draft.pk,)))
+        json_data = response.json()
+        assert json_data['success'] is False
+        assert json_data['errorsFile'][0]['file_name'] == 'file.exe'
+        assert File.objects.count() == 0
+        draft.refresh_from_db()
+        assert draft.accession_status == Accession.DRAFT
+
+
+def post_file(client, draft, name, content, description='Test file description'):
+    return client.post(reverse('keeper:upload_file', args=(draft.pk,)), data={
+        'file-file': SimpleUploadedFile(name, content, content_type='text/plain'),
+        'file-file_description': description,
+    })
+
+
+@pytest.mark.django_db(transaction=True)
+class TestPerFileUpload:
+    def test_upload_files_and_finalize(self, client, draft):
+        first = post_file(client, draft, 'file1.txt', b"first file content").json()
+        second = post_file(client, draft, 'file2.txt', b"second file content").json()
+        assert first['success'] is True
+        assert first['file_name'] == 'file1.txt'
+
+        # Files are stored as they arrive, but the accession stays a draft
+        assert File.objects.filter(accession=draft).count() == 2
+        draft.refresh_from_db()
+        assert draft.accession_status == Accession.DRAFT
+
+        response = client.post(reverse('keeper:upload_finalize', args=(draft.pk,)))
+        assert response.json()['success'] is True
+        draft.refresh_from_db()
+        assert draft.accession_status == Accession.NEW
+        assert File.objects.get(pk=second['file_id']).file.read() == b"second file content"
+
+    def test_invalid_file_fails_alone(self, client, draft):
+        post_file(client, draft, 'file1.txt', b"first file content")
+        response = client.post(reverse('keeper:upload_file', args=(draft.pk,)), data={
+            'file-file': SimpleUploadedFile("file.exe", b"MZ\x90\x00\x03\x00\x00\x00\x04\x00\x00\x00\xff\xff"),
+            'file-file_description': 'Invalid file',
+        })
+
+        json_data = response.json()
+        assert json_data['success'] is False
+        assert json_data['errorsFile'][0]['file_name'] == 'file.exe'
+        assert File.objects.filter(accession=draft).count() == 1
+
+    def test_one_file_per_request(self, client, draft):
+        response = client.post(reverse('keeper:upload_file', args=(draft.pk,)), data={
+            'file-file': [SimpleUploadedFile("file1.txt", b"first"), SimpleUploadedFile("file2.txt", b"second")],
+        })
+        assert response.status_code == 400
+
+    def test_upload_file_belongs_to_session(self, draft):
+        response = post_file(Client(), draft, 'file1.txt', b"first file content")
+        assert response.status_code == 404
+
+    def test_delete_file(self, client, draft):
+        file_id = post_file(client, draft, 'file1.txt', b"first file content").json()['file_id']
+        path = File.objects.get(pk=file_id).file.path
+
+        response = client.post(reverse('keeper:upload_delete_file', args=(draft.pk, file_id)))
+
+        assert response.json()['success'] is True
+        assert not File.objects.filter(pk=file_id).exists()
+        assert not os.path.exists(path)
+
+    def test_finalize_without_files(self, client, draft):
+        response = client.post(reverse('keeper:upload_finalize', args=(draft.pk,)))
+        assert response.status_code == 400
+        draft.refresh_from_db()
+        assert draft.accession_status == Accession.DRAFT
@@ -0,0 +1,31 @@
+import hashlib
+import os
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+
+from keeper.models import File
+from keeper.uploadhandler import upload_spool_dir
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+def test_spooled_submit(client, valid_accession_data):
+    content = b"Some file content\n" * 1000
+    post_data = {
+        **valid_accession_data,
+        'file-file': SimpleUploadedFile("file1.txt", content, content_type="text/plain"),
+        'file-file_description': 'Test file description',
+    }
+
+    response = client.post(reverse('keeper:submit'), data=post_data)
+    assert response.json()['success'] is True
+
+    uploaded_file = File.objects.get()
+    assert uploaded_file.get_filename() == 'file1.txt'
+    assert uploaded_file.file.read() == content
+    assert uploaded_file.sha256 == hashlib.sha256(content).hexdigest()
+    # The spool file was moved into place, not left behind
+    assert os.listdir(upload_spool_dir()) == []
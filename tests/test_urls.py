@@ -1,9 +1,10 @@
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.urls import reverse
+from django.urls import resolve, reverse
 from .factories import AccessionFactory, FileFactory
 
 from keeper import urls
+from keeper.admin_views import bag_files, tar_files
 
 
 @pytest.mark.django_db(transaction=True)
@@ -83,3 +84,11 @@ class TestUrls:
 
         response = client.get(url)
         assert response.status_code == 302
+
+    @pytest.mark.parametrize('path,view', [('5_bag', bag_files), ('5_tar', tar_files), ('5_tar_zst', tar_files)])
+    def test_export_urls(self, path, view):
+        assert resolve(f'/admin/keeper/accession/{path}').func is view
+
+    @pytest.mark.parametrize('path', ['5_bagged', '5_tarball', '5_tar_zstd'])
+    def test_export_urls_match_whole_path(self, path):
+        assert resolve(f'/admin/keeper/accession/{path}').func not in (bag_files, tar_files)
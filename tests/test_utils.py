@@ -2,15 +2,14 @@ import pytest
 from django.utils import timezone
 from datetime import timezone as tz
 
-from keeper.utils import generate_data_file, format_datetime
+from keeper.utils import generate_metadata, format_datetime
 from django.core.files.uploadedfile import SimpleUploadedFile
-import os
 
 from tests.factories import AccessionFactory, FileFactory
 
 
 @pytest.mark.django_db(transaction=True)
-def test_generate_data_file(tmpdir):
+def test_generate_metadata():
     # Create an Accession object and related File objects
     accession = AccessionFactory()
     file_content = b"Some file content"
@@ -20,25 +19,19 @@ def test_generate_data_file(tmpdir):
     # Generate filenames
     filenames = [(str(file1.file), file1.file_description), (str(file2.file), file2.file_description)]
 
-    # Generate a data file
-    path = tmpdir.mkdir("subdir")
-    generate_data_file('keeper', 'accession', accession.pk, str(path), filenames)
-
-    # Check that the metadata.txt file exists
-    assert os.path.isfile(os.path.join(str(path), 'metadata.txt'))
-
-    # Check the contents of the metadata.txt file
-    with open(os.path.join(str(path), 'metadata.txt'), 'r') as f:
-        contents = f.read()
-        assert "Accession: {}".format(accession.pk) in contents
-        assert "Date submitted: {}".format(format_datetime(timezone.localtime(accession.date_submitted))) in contents
-        assert "Donor name: {}".format(accession.full_name) in contents
-        assert "Email: {}".format(accession.email_address) in contents
-        assert "Phone: {}".format(accession.phone_number) in contents
-        assert "Accession description: {}".format(accession.description) in contents
-        assert "Included files:" in contents
-        assert str(file1.file) in contents
-        assert str(file2.file) in contents
+    contents = generate_metadata(accession, filenames)
+
+    assert "Accession: {}".format(accession.pk) in contents
+    assert "Date submitted: {}".format(format_datetime(timezone.localtime(accession.date_submitted))) in contents
+    assert "Status: {}".format(accession.get_accession_status_display()) in contents
+    assert "Donor name: {}".format(accession.full_name) in contents
+    assert "Affiliation: {}".format(accession.get_affiliation_display()) in contents
+    assert "Email: {}".format(accession.email_address) in contents
+    assert "Phone: {}".format(accession.phone_number) in contents
+    assert "Accession description: {}".format(accession.description) in contents
+    assert "Included files:" in contents
+    assert str(file1.file) in contents
+    assert str(file2.file) in contents
 
 
 def test_format_datetime():
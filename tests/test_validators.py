@@ -1,8 +1,17 @@
+import fnmatch
+import gzip
+import os
+import tracemalloc
+from io import BytesIO
+
+import magic
 import pytest
 from unittest import mock
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
-from keeper.validators import validate_file_type
+from django.test import override_settings
+from keeper.constants import ACCEPTED_FILE_TYPES
+from keeper.validators import sniff_file_type, validate_file_type
 
 
 def test_validate_file_type():
@@ -35,3 +44,83 @@ def test_validate_file_type_large_file():
     file_content = b"Some file content" * (64 * 1024)  # Make file larger than chunk size
     file_upload = SimpleUploadedFile("large_file.txt", file_content)
     validate_file_type(file_upload)  # Should not raise ValidationError
+
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'corpus')
+
+
+def read_sample(path):
+    # Large, mostly empty samples are stored compressed
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        return f.read()
+
+
+def corpus_samples(kind):
+    directory = os.path.join(CORPUS_DIR, kind)
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory))
+
+
+def legacy_file_type(content):
+    # Type detection as it was before the header window: the whole upload
+    # when it is 64 MB or smaller, otherwise its first 64 KB
+    if len(content) > 64 * 1024 * 1024:
+        content = content[:64 * 1024]
+    return magic.from_buffer(content, mime=True)
+
+
+def is_accepted(file_type):
+    return any(fnmatch.fnmatch(file_type, allowed) for allowed in ACCEPTED_FILE_TYPES)
+
+
+@pytest.mark.parametrize('path', corpus_samples('accept') + corpus_samples('reject'),
+                         ids=os.path.basename)
+def test_validate_file_type_matches_legacy_decision(path):
+    content = read_sample(path)
+    expected = is_accepted(legacy_file_type(content))
+    assert expected == (os.path.basename(os.path.dirname(path)) == 'accept')
+
+    file_upload = SimpleUploadedFile(os.path.basename(path), content)
+    if expected:
+        validate_file_type(file_upload)
+    else:
+        with pytest.raises(ValidationError):
+            validate_file_type(file_upload)
+    assert file_upload.file.tell() == 0
+
+
+@pytest.mark.parametrize('path', corpus_samples('accept'), ids=os.path.basename)
+@override_settings(MIME_SNIFF_BYTES=4 * 1024)
+def test_sniff_file_type_small_window(path):
+    # Samples larger than the window are still identified from their header
+    content = read_sample(path)
+    assert sniff_file_type(BytesIO(content)) == legacy_file_type(content)
+
+
+@override_settings(MIME_SNIFF_BYTES=2 * 1024 * 1024, MIME_SNIFF_MAX_BYTES=1024 * 1024)
+def test_sniff_file_type_window_larger_than_budget():
+    with pytest.raises(ImproperlyConfigured):
+        sniff_file_type(BytesIO(b"Some file content"))
+
+
+@override_settings(MIME_SNIFF_BYTES=64 * 1024, MIME_SNIFF_MAX_BYTES=512 * 1024)
+def test_validate_file_type_memory_budget():
+    # A request's worth of uploads, each much larger than the sniff budget
+    uploads = [SimpleUploadedFile("file{}.txt".format(i), b"Some file content\n" * (128 * 1024))
+               for i in range(20)]
+    doc_content = read_sample(os.path.join(CORPUS_DIR, 'accept', 'document-deep-directory.doc.gz'))
+    uploads.append(SimpleUploadedFile("document.doc", doc_content))
+
+    tracemalloc.start()
+    try:
+        for file_upload in uploads:
+            try:
+                validate_file_type(file_upload)
+            except ValidationError:
+                pass
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Allow a little for libmagic bookkeeping on top of the buffers
+    assert peak < 512 * 1024 + 64 * 1024
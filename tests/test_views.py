@@ -1,21 +1,16 @@
+import hashlib
+import os
+from unittest import mock
+
 import pytest
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from keeper.models import Accession, File
-
-
-@pytest.fixture
-def valid_accession_data():
-    return {
-        'accession-first_name': 'John',
-        'accession-last_name': 'Doe',
-        'accession-email_address': 'johndoe@example.com',
-        'accession-phone_number': '123456789',
-        'accession-description': 'Test description',
-        'accession-affiliation': 'STU',
-    }
+from keeper.ingest import ingest_upload
+from keeper.models import Accession, Blob, File, Job
 
 
 @pytest.fixture
@@ -157,6 +152,7 @@ def test_submit_view_with_multiple_valid_files(client, valid_accession_data, val
         assert file.file.read() == content, "File content does not match"
         with open(file.file.path, 'rb') as f:
             assert f.read() == expected_content
+        assert file.sha256 == hashlib.sha256(content).hexdigest()
 
 
 @pytest.mark.django_db(transaction=True)
@@ -230,6 +226,66 @@ def test_special_characters_in_input_fields(client, valid_file_data):
     assert 'error' not in json_data
 
 
+def multiple_file_data(count):
+    return {
+        'file-file': [SimpleUploadedFile("file{}.txt".format(i), b"file_content", content_type="text/plain")
+                      for i in range(count)],
+        'file-file_description': ['Test file description {}'.format(i) for i in range(count)],
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_submit_view_queries_do_not_grow_with_files(client, valid_accession_data):
+    # Benchmark of database round trips per submission. Saving each File on its
+    # own took 1 + 4 queries per file (41 for 10 files); one transaction with a
+    # bulk insert of the files and of their jobs takes 7 however many there are.
+    url = reverse('keeper:submit')
+    query_counts = []
+    for count in (1, 10):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(url, data={**valid_accession_data, **multiple_file_data(count)})
+        assert response.json()['success'] is True
+        query_counts.append(len(queries))
+
+    assert query_counts[0] == query_counts[1]
+    assert File.objects.count() == 11
+    assert Job.objects.filter(task='keeper.checksum').count() == 11
+
+
+@pytest.mark.django_db(transaction=True)
+def test_submit_view_is_atomic(client, valid_accession_data):
+    ingested = []
+
+    def fail_on_third_file(upload, *args, **kwargs):
+        if len(ingested) == 2:
+            raise OSError('Disk full')
+        uploaded_file = ingest_upload(upload, *args, **kwargs)
+        ingested.append(uploaded_file)
+        return uploaded_file
+
+    with mock.patch('keeper.views.ingest_upload', side_effect=fail_on_third_file):
+        with pytest.raises(OSError):
+            client.post(reverse('keeper:submit'), data={**valid_accession_data, **multiple_file_data(3)})
+
+    assert Accession.objects.count() == 0
+    assert File.objects.count() == 0
+    assert Job.objects.count() == 0
+    # Files already stored before the failure were cleaned up
+    for uploaded_file in ingested:
+        assert not os.path.exists(uploaded_file.file.path)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_submit_view_rollback_removes_new_blobs(client, valid_accession_data, settings):
+    settings.DEDUPLICATE_UPLOADS = True
+
+    with mock.patch('keeper.views.save_files', side_effect=OSError('Database gone')):
+        with pytest.raises(OSError):
+            client.post(reverse('keeper:submit'), data={**valid_accession_data, **multiple_file_data(2)})
+
+    assert not os.path.exists(Blob(sha256=hashlib.sha256(b"file_content").hexdigest()).path)
+
+
 @pytest.mark.django_db(transaction=True)
 def test_stats_view(client):
     response = client.get('/stats/')
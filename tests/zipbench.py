@@ -0,0 +1,94 @@
+"""
+Benchmark of accession zip compression policies on a mixed media corpus.
+
+Builds a corpus shaped like a typical accession, mostly JPEG, MP4 and MP3 with
+some PDFs, Word documents and text, then writes it as a zip under each policy
+and reports throughput and archive size. Media is random data, which deflates
+about as badly as the real thing.
+
+    python -m tests.zipbench --size 200 --level 6 --threads 1,4
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+
+from keeper.archives import StoredZip, StreamingZip, ZipMember, file_crc32, should_deflate
+
+
+# (content type, extension, share of the corpus, compressible fraction of each file)
+CORPUS = [
+    ('image/jpeg', 'jpg', 0.35, 0),
+    ('video/mp4', 'mp4', 0.30, 0),
+    ('audio/mpeg', 'mp3', 0.15, 0),
+    ('application/pdf', 'pdf', 0.10, 0.5),
+    ('application/msword', 'doc', 0.05, 0.9),
+    ('text/plain', 'txt', 0.05, 1),
+]
+FILE_SIZE = 4 * 1024 * 1024  # 4 MB
+WORDS = ('the', 'special', 'collections', 'library', 'letter', 'photograph', 'donor', 'university', 'north',
+         'texas', 'archive', 'box', 'folder', 'series', 'correspondence', 'minutes', '1952', 'Denton')
+
+
+def file_content(size, compressible):
+    text_size = int(size * compressible)
+    text = ' '.join(random.choice(WORDS) for _ in range(text_size // 5)).encode()[:text_size]
+    return text + os.urandom(size - len(text))
+
+
+def build_corpus(directory, total_size):
+    files = []
+    for content_type, extension, share, compressible in CORPUS:
+        for number in range(max(1, int(total_size * share / FILE_SIZE))):
+            path = os.path.join(directory, '{}-{}.{}'.format(extension, number, extension))
+            with open(path, 'wb') as f:
+                f.write(file_content(FILE_SIZE, compressible))
+            files.append((path, content_type))
+    return files
+
+
+def run(files, policy, level, threads):
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    # CRC-32s come from the database when serving, so they are not timed
+    crc32s = [file_crc32(path) for path, _ in files]
+
+    start = time.perf_counter()
+    members = []
+    for (path, content_type), crc32 in zip(files, crc32s):
+        member = ZipMember(os.path.basename(path), date, path=path, crc32=crc32)
+        member.deflate = should_deflate(member, content_type, policy)
+        members.append(member)
+
+    archive = StreamingZip(members, level, threads) if any(member.deflate for member in members) else StoredZip(members)
+    size = sum(len(data) for data in archive)
+    return time.perf_counter() - start, size
+
+
+def main(options):
+    settings.configure(USE_TZ=True, TIME_ZONE='America/Chicago')
+    django.setup()
+    with tempfile.TemporaryDirectory() as directory:
+        files = build_corpus(directory, options.size * 1024 * 1024)
+        total = sum(os.path.getsize(path) for path, _ in files)
+        print('{} files, {:.1f} MB, deflate level {}\n'.format(len(files), total / 1024 / 1024, options.level))
+        print('{:>9} {:>7} {:>10} {:>12} {:>7}'.format('policy', 'threads', 'MB/s', 'archive MB', 'ratio'))
+        for policy in ('store', 'deflate', 'adaptive'):
+            for threads in options.threads:
+                elapsed, size = run(files, policy, options.level, threads)
+                print('{:>9} {:>7} {:>10.1f} {:>12.1f} {:>7.3f}'.format(
+                    policy, threads, total / 1024 / 1024 / elapsed, size / 1024 / 1024, size / total))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--size', type=int, default=200, help='MB of files in the corpus.')
+    parser.add_argument('--level', type=int, default=6, help='zlib compression level for deflated members.')
+    parser.add_argument('--threads', type=lambda value: [int(threads) for threads in value.split(',')],
+                        default=[1], help='Comma separated numbers of compression threads to try.')
+    main(parser.parse_args())